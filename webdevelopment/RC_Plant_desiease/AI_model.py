@@ -1,12 +1,20 @@
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import cv2
-from ultralytics import YOLO
+import numpy as np
 import shutil
+from RC_Plant_desiease.model_manager import model_manager
+from RC_Plant_desiease.evidence_writer import evidence_writer
+from RC_Plant_desiease.thumbnails import queue_thumbnail
+from RC_Plant_desiease.frame_dedup import frame_deduplicator
+from RC_Plant_desiease.inference_cache import inference_cache, content_key, ENABLED as INFERENCE_CACHE_ENABLED
+from data_utils.detections import detection_row, record_detections, forget_images_under, new_cycle_id
 
-model_path = os.path.join(os.path.dirname(__file__), 'best.pt')
-model = YOLO(model_path)
-
-print("[INFO] Model loaded. Classes:", model.names)
+# The YOLO model is loaded on first use (or preloaded in the background), not at import;
+# see model_manager.py
 
 def clear_directory(dir_path):
     if os.path.exists(dir_path):
@@ -20,56 +28,262 @@ def clear_directory(dir_path):
             except Exception as e:
                 print(f"[ERROR] Failed to delete {file_path}: {e}")
 
-def process_frame(frame):
-    results = model(frame)
+def draw_boxes(frame, boxes):
+    """Draw labelled boxes ({"class", "confidence", "box"} dicts) on `frame` in place."""
+    for box in boxes:
+        x1, y1, x2, y2 = box["box"]
+        label = f'{box["class"]} {box["confidence"]:.2f}'
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+        cv2.rectangle(frame, (x1, y1 - h - 5), (x1 + w, y1), (0, 255, 0), -1)
+        cv2.putText(frame, label, (x1, y1), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7, (0, 0, 0), 2, cv2.LINE_AA)
+    return frame
+
+def annotate_result(frame, result, names):
+    """Draw one YOLO result's boxes on `frame`; returns (frame, class_name, conf) of the last box, and all boxes."""
+    class_name = "No detection"
+    conf=0
+    boxes = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        conf = box.conf[0].item()
+        cls = int(box.cls[0].item())
+        class_name = names.get(cls, f'Class {cls}')
+        print(f"[DEBUG] Detected {class_name} with confidence {conf:.2f} at [{x1}, {y1}, {x2}, {y2}]")
+        boxes.append({"class": class_name, "confidence": round(conf, 4), "box": [x1, y1, x2, y2]})
+    return draw_boxes(frame, boxes), class_name, conf, boxes
+
+def _infer_frame(frame, stop_number=None):
+    """
+    (annotated frame, class_name, conf, boxes) for one frame, reusing the stop's last result when unchanged.
+    Frames without a stop are always inferred: they have no reference frame of their own.
+    """
+    reused, frame_signature = frame_deduplicator.check(frame, stop_number) if stop_number is not None else (None, None)
+    if reused is not None:
+        class_name, conf, boxes = reused
+        return draw_boxes(frame, boxes), class_name, conf, boxes
+    results = model_manager.predict(frame)
+    names = model_manager.names
     class_name = "No detection"
     conf=0
+    boxes = []
     for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            conf = box.conf[0].item()
-            cls = int(box.cls[0].item())
-            class_name = model.names.get(cls, f'Class {cls}')
-            print(f"[DEBUG] Detected {class_name} with confidence {conf:.2f} at [{x1}, {y1}, {x2}, {y2}]")
-            label = f'{class_name} {conf:.2f}'
-
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-            cv2.rectangle(frame, (x1, y1 - h - 5), (x1 + w, y1), (0, 255, 0), -1)
-            cv2.putText(frame, label, (x1, y1), cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7, (0, 0, 0), 2, cv2.LINE_AA)
+        frame, result_class, result_conf, result_boxes = annotate_result(frame, result, names)
+        if result_boxes:
+            class_name, conf = result_class, result_conf
+            boxes.extend(result_boxes)
+    if stop_number is not None:
+        frame_deduplicator.remember(stop_number, frame_signature, class_name, conf, boxes)
+    return frame, class_name, conf, boxes
+
+def process_frame(frame, image_path=None, stop_number=None, cycle_id=None):
+    """
+    Run YOLO on one frame and draw the boxes; with image_path, the outcome is recorded in plant_detections.
+    A frame nearly identical to the one last inferred at the same stop reuses that detection (see frame_dedup.py).
+    """
+    frame, class_name, conf, boxes = _infer_frame(frame, stop_number)
+    if image_path is not None:
+        record_detections([detection_row(image_path, class_name, conf, boxes, stop_number, cycle_id)])
     return frame, class_name,conf
 
-def process_images_in_directory(input_dir, output_dir):
+# ──────────────────────────── Directory pipeline ────────────────────────────
+# read + cache lookup + decode (IO pool) → bounded queue → batched inference + drawing → encode/write (IO pool)
+# File IO, cv2 decode/encode and the model all release the GIL, so disk work overlaps inference.
+# Images already in the inference cache skip the model (and, with the annotated output cached, decoding too).
+SUPPORTED_EXT = ('.jpg', '.jpeg', '.png', '.bmp')
+INFERENCE_BATCH_SIZE = max(1, min(8, os.cpu_count() or 1))
+IO_WORKERS = max(2, min(8, (os.cpu_count() or 1)))
+QUEUE_BATCHES = 2          # Batches' worth of frames buffered between stages (decoded, and waiting to be written)
+
+
+def _output_ext(filename):
+    return os.path.splitext(filename)[1].lower().lstrip('.')
+
+
+def _load_image(image_path, model_fingerprint):
+    """(cache key, decoded frame, cached result) for one input; frame is None when the cached output can be reused."""
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None, None, None
+    if not data:
+        return None, None, None
+    key = content_key(data, model_fingerprint) if model_fingerprint else None
+    entry = inference_cache.get(key, _output_ext(image_path)) if key else None
+    if entry is not None and entry["annotated"] is not None:
+        return key, None, entry
+    return key, cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR), entry
+
+
+def _write_image(output_path, frame=None, encoded=None, key=None, result=None):
+    """Write encoded bytes as-is, or encode `frame` (caching the rendering under `key` with `result`)."""
+    if encoded is None:
+        ok, buffer = cv2.imencode(f'.{_output_ext(output_path)}', frame)
+        if not ok:
+            raise IOError(f"Encoding failed for {output_path}")
+        encoded = buffer.tobytes()
+        if key is not None:
+            inference_cache.put(key, *result, annotated=encoded, ext=_output_ext(output_path))
+    with open(output_path, 'wb') as f:
+        f.write(encoded)
+    return output_path
+
+
+def _model_fingerprint():
+    if not INFERENCE_CACHE_ENABLED:
+        return None
+    try:
+        return model_manager.fingerprint()
+    except OSError as e:
+        print(f"[WARNING] Can't fingerprint the model, inference cache off for this run: {e}")
+        return None
+
+
+def process_images_in_directory(input_dir, output_dir, batch_size=INFERENCE_BATCH_SIZE, progress=None,
+                                cancel_event=None, cycle_id=None):
+    """
+    Annotate every image in input_dir into output_dir.
+
+    Frames are decoded on a thread pool, inferred in batches of `batch_size`
+    and written back on the pool, with bounded queues so memory stays flat.
+    Images whose content was inferred before by the same model come from the
+    inference cache instead. `progress(done, total)` is called as images are
+    finished; setting `cancel_event` stops after the current batch. Each batch's
+    outcomes are recorded in plant_detections under `cycle_id` (a new run-... id
+    by default). Returns a summary dict.
+    """
+    cycle_id = cycle_id or new_cycle_id("run")
     clear_directory(output_dir)
+    forget_images_under(output_dir)
     os.makedirs(output_dir, exist_ok=True)
-    supported_ext = ['.jpg', '.jpeg', '.png', '.bmp']
-
-    for filename in os.listdir(input_dir):
-        if any(filename.lower().endswith(ext) for ext in supported_ext):
-            image_path = os.path.join(input_dir, filename)
-            frame = cv2.imread(image_path)
-            if frame is None:
-                print(f"[WARNING] Couldn't read {filename}, skipping.")
-                continue
-
-            processed_frame, result, conf = process_frame(frame)
-            output_path = os.path.join(output_dir, filename)
-            cv2.imwrite(output_path, processed_frame)
-            print(f"[INFO] Processed and saved: {output_path}")
-
-def live_processing(frame, output_dir, filename=None):
-    os.makedirs(output_dir, exist_ok=True)
+    filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(SUPPORTED_EXT))
+    total = len(filenames)
+    summary = {"cycle_id": cycle_id, "total": total, "processed": 0, "skipped": 0, "batches": 0,
+               "cache_hits": 0, "cancelled": False}
+    started = time.perf_counter()
+    counts_lock = threading.Lock()
+    model_fingerprint = _model_fingerprint()
+
+    def count(key):
+        with counts_lock:
+            summary[key] += 1
+            done = summary["processed"] + summary["skipped"]
+        if progress is not None:
+            progress(done, total)
 
-    processed_frame, result, conf = process_frame(frame)
+    depth = QUEUE_BATCHES * batch_size
+    decoded = queue.Queue(maxsize=depth)
+    writes = threading.BoundedSemaphore(depth)
+    pending_writes = []
+    stop = threading.Event()
 
+    with ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="yolo-io") as io_pool:
+        def feed():
+            # Futures go into the bounded queue in file order; put() blocks when inference falls behind
+            for filename in filenames:
+                if stop.is_set():
+                    return
+                decoded.put((filename, io_pool.submit(_load_image, os.path.join(input_dir, filename),
+                                                      model_fingerprint)))
+            decoded.put(None)
+
+        threading.Thread(target=feed, name="yolo-decode", daemon=True).start()
+
+        def write_done(future, filename):
+            writes.release()
+            try:
+                print(f"[INFO] Processed and saved: {future.result()}")
+                queue_thumbnail(future.result())
+                count("processed")
+            except Exception as e:
+                print(f"[ERROR] Failed to save {filename}: {e}")
+                count("skipped")
+
+        def submit_write(filename, **kwargs):
+            writes.acquire()
+            future = io_pool.submit(_write_image, os.path.join(output_dir, filename), **kwargs)
+            future.add_done_callback(lambda f: write_done(f, filename))
+            pending_writes.append(future)
+
+        try:
+            finished = False
+            while not finished:
+                if cancel_event is not None and cancel_event.is_set():
+                    print("[INFO] Directory processing cancelled.")
+                    summary["cancelled"] = True
+                    break
+                batch, rows = [], []
+                while len(batch) < batch_size:
+                    item = decoded.get()
+                    if item is None:
+                        finished = True
+                        break
+                    filename, future = item
+                    key, frame, cached = future.result()
+                    output_path = os.path.join(output_dir, filename)
+                    if cached is not None and (cached["annotated"] is not None or frame is not None):
+                        result = (cached["class_name"], cached["confidence"], cached["boxes"])
+                        if cached["annotated"] is not None:
+                            submit_write(filename, encoded=cached["annotated"])
+                        else:
+                            submit_write(filename, frame=draw_boxes(frame, cached["boxes"]), key=key, result=result)
+                        # Recorded only once its output is on the way, so every row points at a written file
+                        rows.append(detection_row(output_path, *result, cycle_id=cycle_id))
+                        summary["cache_hits"] += 1
+                        continue
+                    if frame is None:
+                        print(f"[WARNING] Couldn't read {filename}, skipping.")
+                        count("skipped")
+                        continue
+                    batch.append((filename, key, frame))
+
+                if batch:
+                    results = model_manager.predict([frame for _, _, frame in batch])
+                    names = model_manager.names
+                    summary["batches"] += 1
+                    for (filename, key, frame), result in zip(batch, results):
+                        processed_frame, class_name, conf, boxes = annotate_result(frame, result, names)
+                        rows.append(detection_row(os.path.join(output_dir, filename), class_name, conf, boxes,
+                                                  cycle_id=cycle_id))
+                        submit_write(filename, frame=processed_frame, key=key, result=(class_name, conf, boxes))
+                record_detections(rows)
+        finally:
+            # On an error, unblock the feeder so it exits instead of waiting on a full queue
+            stop.set()
+            while not finished:
+                try:
+                    finished = decoded.get_nowait() is None
+                except queue.Empty:
+                    break
+            wait(pending_writes)
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    summary["images_per_second"] = round(summary["processed"] / summary["seconds"], 2) if summary["seconds"] else None
+    print(f"[INFO] Processed {summary['processed']}/{total} images in {summary['seconds']}s "
+          f"({summary['images_per_second']} img/s, {summary['batches']} batches of up to {batch_size}, "
+          f"{summary['cache_hits']} from cache)")
+    return summary
+
+def live_processing(frame, output_dir, filename=None, stop_number=None, cycle_id=None):
+    """
+    Annotate `frame` in memory; the annotated copy is saved to output_dir by the background evidence writer.
+    The detection is recorded once the file is on disk, so a dropped or failed save leaves no row behind.
+    """
     if filename is None:
-        import time 
         filename = f"frame_{int(time.time())}.jpg"
 
     output_path = os.path.join(output_dir, filename)
-    cv2.imwrite(output_path, processed_frame)
-    print(f"[INFO] Live frame processed and saved to: {output_path}")
+    processed_frame, result, conf, boxes = _infer_frame(frame, stop_number)
+    row = detection_row(output_path, result, conf, boxes, stop_number, cycle_id)
+
+    def on_saved(path):
+        record_detections([row])
+        queue_thumbnail(path)
+
+    evidence_writer.save(output_path, frame=processed_frame, on_saved=on_saved)
+    print(f"[INFO] Live frame processed; queued save to: {output_path}")
 
     return processed_frame, result, conf
    
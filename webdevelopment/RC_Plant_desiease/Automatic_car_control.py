@@ -1,28 +1,33 @@
 import time
-import cv2
 import os
-import requests
 from RC_Plant_desiease.AI_model import live_processing
+from RC_Plant_desiease.stream_reader import get_stream_reader
+from RC_Plant_desiease.evidence_writer import evidence_writer
+from RC_Plant_desiease.esp_client import EspClient
+from data_utils.detections import forget_images_under, new_cycle_id
 import shutil
 
 ESP_URL = "http://192.168.8.50/action" # Change this if your ESP IP is different
 STREAM_URL = "http://192.168.8.40:5000/video_feed"  # Endpoint that returns an image frame (you must have this on ESP)
 INPUT_DIR = './input'
 PRED_DIR = './static/predictions'
+CAPTURE_TIMEOUT_SECONDS = 5  # How long a stop waits for a frame newer than the moment the car settled
+STOP_SETTLE_SECONDS = 1      # Counted from the ESP's ack of each command
+SPRAY_SECONDS = 4
+TRAVEL_SECONDS = 4
 
 os.makedirs(INPUT_DIR, exist_ok=True)
 os.makedirs(PRED_DIR, exist_ok=True)
 
+esp = EspClient(ESP_URL)  # Keep-alive session, timeouts and bounded retries (see esp_client.py)
+
 def send_command_to_esp(command):
-    try:
-        # url = f"{ESP_URL}/action?cmd={command}"
-        # print("debug: Sending command to ESP:", url)
-        response = requests.post(f"{ESP_URL}/{command}")
-        #Example command: /action?cmd=move");
-        # response = requests.post(ESP_URL, data={"cmd": "{command}"}) 
-        print(f"[INFO] Sent command '{command}' → Status: {response.status_code}")
-    except requests.RequestException as e:
-        print(f"[ERROR] Failed to send '{command}' to ESP: {e}")
+    """Send a command and wait for the ESP's answer; returns its Ack (ack.ok is False on failure)."""
+    return esp.send(command)
+
+def wait_after_ack(ack, seconds):
+    """Sleep until `seconds` after the ESP acknowledged the command (not after we issued it)."""
+    time.sleep(max(0.0, ack.acked_at + seconds - time.time()))
 
 def clear_directory(dir_path):
     if os.path.exists(dir_path):
@@ -36,27 +41,19 @@ def clear_directory(dir_path):
             except Exception as e:
                 print(f"[ERROR] Failed to delete {file_path}: {e}")
 
-def capture_image():
-
+def capture_image(fresh_after=None, timeout=CAPTURE_TIMEOUT_SECONDS):
+    """Newest frame from the persistent stream reader; with fresh_after, one that arrived after that time."""
     try:
-        cap = cv2.VideoCapture(STREAM_URL)
+        frame, jpeg = get_stream_reader(STREAM_URL).read_with_jpeg(fresh_after=fresh_after, timeout=timeout)
 
-        if not cap.isOpened():
-            print("[ERROR] Could not open stream.")
-            return None
-
-        # Read one frame
-        ret, frame = cap.read()
-        cap.release()
-
-        if not ret or frame is None:
+        if frame is None:
             print("[ERROR] Failed to read frame from stream.")
             return None
 
-        # Save image to disk
+        # Keep the camera's own JPEG as evidence; saved in the background, no re-encode
         timestamp = int(time.time())
         image_path = os.path.join(INPUT_DIR, f'current_{timestamp}.jpg')
-        cv2.imwrite(image_path, frame)
+        evidence_writer.save(image_path, jpeg=jpeg)
         print(f"[INFO] Image captured: {image_path}")
 
         return frame
@@ -65,10 +62,11 @@ def capture_image():
         print(f"[ERROR] Error while capturing image from stream: {e}")
         return None
 
-def is_plant_healthy(image):
-    processed_frame, class_name, conf = live_processing(image,PRED_DIR, filename=f'prediction_{int(time.time())}.jpg')
-    output_path = os.path.join(PRED_DIR, f'prediction_{int(time.time())}.jpg')
-    cv2.imwrite(output_path, processed_frame)
+def is_plant_healthy(image, stop_number=None, cycle_id=None):
+    # Stop number in the name keeps two stops within the same second from sharing a file
+    suffix = f'_stop{stop_number}' if stop_number is not None else ''
+    processed_frame, class_name, conf = live_processing(image,PRED_DIR, filename=f'prediction_{int(time.time())}{suffix}.jpg',
+                                                        stop_number=stop_number, cycle_id=cycle_id)
     print(f"[INFO] Classification result: {class_name}")
     if conf > 0.2 and class_name.lower() not in ["healthy", "no detection"]:
         print("[WARNING] Low confidence in classification, assuming plant is healthy.")
@@ -78,38 +76,57 @@ def is_plant_healthy(image):
         return True
 
 
-def run_cycle():
+def run_cycle(progress=None, cancel_event=None):
+    """Drive through the stops; `progress(done, total, message)` is told after each, `cancel_event` ends early."""
     print("[INFO] Starting automatic plant check cycle...")
+    get_stream_reader(STREAM_URL)  # Connect now so the first stop has a live stream
     print("[INFO] Clearing previous input and prediction files...")
+    evidence_writer.flush()  # Don't let a previous cycle's queued images land after the clear
     clear_directory(INPUT_DIR)
     clear_directory(PRED_DIR)
+    forget_images_under(PRED_DIR)
+    cycle_id = new_cycle_id()
     l=8
     for stop_num in range(l):
+        if cancel_event is not None and cancel_event.is_set():
+            print("[INFO] Cycle cancelled.")
+            break
         print(f"\n[INFO] --- Stop {stop_num+1}/{l} ---")
+        if progress is not None:
+            progress(stop_num, l, f"Stop {stop_num+1}/{l}")
 
-        send_command_to_esp("stop")
-        time.sleep(1)  # Let the car settle
+        stop = send_command_to_esp("stop")
+        if not stop.ok:
+            print("[ERROR] ESP did not acknowledge 'stop'; aborting cycle.")
+            break
 
-        image = capture_image()
+        # Settling and waiting for a frame overlap: take the first frame that arrives once the car has settled
+        image = capture_image(fresh_after=stop.acked_at + STOP_SETTLE_SECONDS,
+                              timeout=STOP_SETTLE_SECONDS + CAPTURE_TIMEOUT_SECONDS)
         if image is None:
             print("[WARNING] Skipping due to image capture failure.")
-            send_command_to_esp("move")
-            time.sleep(4)
-            continue
-
-        if is_plant_healthy(image):
+        elif is_plant_healthy(image, stop_num + 1, cycle_id):
             print("[INFO] Plant is healthy. Moving forward.")
-            send_command_to_esp("move")
-            time.sleep(4)
         else:
             print("[INFO] Plant is diseased. Spraying...")
-            send_command_to_esp("spray")
-            time.sleep(4)
-            send_command_to_esp("move")
-            time.sleep(4)
+            spray = send_command_to_esp("spray")
+            if spray.ok:
+                wait_after_ack(spray, SPRAY_SECONDS)
+            else:
+                print("[WARNING] ESP did not acknowledge 'spray'; moving on.")
+
+        move = send_command_to_esp("move")
+        if not move.ok:
+            print("[ERROR] ESP did not acknowledge 'move'; aborting cycle.")
+            break
+        wait_after_ack(move, TRAVEL_SECONDS)
+        if progress is not None:
+            progress(stop_num + 1, l)
 
     send_command_to_esp("stop")
-    print("[INFO] Cycle completed. Car stopped.")
+    evidence_writer.flush()
+    print(f"[INFO] Cycle completed. Car stopped. ESP: {esp.stats()}")
+    return {"cycle_id": cycle_id}
 
 if __name__ == "__main__":
     run_cycle()
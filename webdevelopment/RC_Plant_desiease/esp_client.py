@@ -0,0 +1,106 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# HTTP client for the inspection car's ESP.
+#
+# One requests.Session keeps a keep-alive connection to the ESP, so a command
+# costs one round trip instead of a TCP handshake each time. Every command has
+# connect/read timeouts, so a dead ESP fails the command instead of hanging
+# the cycle. Commands are retried a bounded number of times: always when the
+# connection could not be made (nothing reached the ESP), and after a read
+# timeout or 5xx only for commands that are safe to repeat ("stop").
+#
+# Each Ack carries the time the ESP answered, which the cycle uses to time
+# settling/spraying/travel instead of sleeping from when a command was issued.
+
+CONNECT_TIMEOUT_SECONDS = 1.5
+READ_TIMEOUT_SECONDS = 3
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.3
+IDEMPOTENT_COMMANDS = {"stop"}
+
+
+def _never_reached(error):
+    """True when the request failed while connecting, i.e. the ESP cannot have acted on it."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class Ack:
+    __slots__ = ("command", "ok", "status", "attempts", "sent_at", "acked_at", "error")
+
+    def __init__(self, command, ok, status, attempts, sent_at, acked_at, error=None):
+        self.command = command
+        self.ok = ok
+        self.status = status
+        self.attempts = attempts
+        self.sent_at = sent_at
+        self.acked_at = acked_at
+        self.error = error
+
+    @property
+    def latency_ms(self):
+        return round((self.acked_at - self.sent_at) * 1000, 1)
+
+    def __repr__(self):
+        return f"Ack({self.command!r}, ok={self.ok}, status={self.status}, {self.latency_ms} ms, attempts={self.attempts})"
+
+
+class EspClient:
+    def __init__(self, base_url, connect_timeout=CONNECT_TIMEOUT_SECONDS, read_timeout=READ_TIMEOUT_SECONDS,
+                 max_retries=MAX_RETRIES):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def send(self, command):
+        """POST {base_url}/{command}, retrying within the limits above; returns an Ack (never raises)."""
+        url = f"{self.base_url}/{command}"
+        sent_at = time.time()
+        error, status = None, None
+        for attempt in range(1, self.max_retries + 2):
+            if attempt > 1:
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(RETRY_BACKOFF_SECONDS * (attempt - 1))
+            try:
+                response = self.session.post(url, timeout=self.timeout)
+                status = response.status_code
+                if response.ok:
+                    ack = Ack(command, True, status, attempt, sent_at, time.time())
+                    print(f"[INFO] Sent command '{command}' → Status: {status} ({ack.latency_ms} ms)")
+                    with self._stats_lock:
+                        self.sent += 1
+                    return ack
+                error = f"HTTP {status}"
+                if status < 500 or command not in IDEMPOTENT_COMMANDS:
+                    break
+            except requests.RequestException as e:
+                error = str(e)
+                # Retry what never reached the ESP; after that, only commands that are harmless to repeat
+                if not (_never_reached(e) or command in IDEMPOTENT_COMMANDS):
+                    break
+
+        print(f"[ERROR] Failed to send '{command}' to ESP after {attempt} attempt(s): {error}")
+        with self._stats_lock:
+            self.failed += 1
+        return Ack(command, False, status, attempt, sent_at, time.time(), error)
+
+    def stats(self):
+        with self._stats_lock:
+            return {"base_url": self.base_url, "sent": self.sent, "failed": self.failed, "retries": self.retries}
+
+    def close(self):
+        self.session.close()
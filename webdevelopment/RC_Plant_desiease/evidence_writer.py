@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+
+import cv2
+
+# Background persistence of inspection-cycle images.
+#
+# The cycle hands frames over in memory and carries on; one writer thread
+# encodes them (or writes JPEG bytes straight from the camera stream without
+# re-encoding) and saves each file with a temp-file + rename, so the gallery
+# never shows a half-written image. A single sequential writer keeps SD-card
+# writes few and in order on the Pi. The queue is bounded; when it stays full
+# for QUEUE_PUT_TIMEOUT_SECONDS the image is dropped with a warning rather
+# than stalling the car.
+
+JPEG_QUALITY = 85                   # cv2 JPEG quality (0-100) for encoded evidence frames
+QUEUE_SIZE = 32
+QUEUE_PUT_TIMEOUT_SECONDS = 2
+
+
+class EvidenceWriter:
+    def __init__(self, jpeg_quality=JPEG_QUALITY, queue_size=QUEUE_SIZE):
+        self.jpeg_quality = jpeg_quality
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+                self._thread.start()
+
+    def save(self, path, frame=None, jpeg=None, on_saved=None):
+        """
+        Queue `frame` (BGR array, encoded here) or `jpeg` (bytes, written as-is) to be saved at `path`;
+        `on_saved(path)` runs on the writer thread once the file is in place.
+        """
+        if (frame is None) == (jpeg is None):
+            raise ValueError("Pass exactly one of frame or jpeg")
+        self._ensure_started()
+        try:
+            self._queue.put((path, frame, jpeg, on_saved), timeout=QUEUE_PUT_TIMEOUT_SECONDS)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"[WARNING] Evidence writer backlog full; dropping {path}")
+            return False
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is on disk (or `timeout` passes); True when drained."""
+        done = threading.Event()
+        self._ensure_started()
+        self._queue.put((None, done, None, None))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            path, frame, jpeg, on_saved = self._queue.get()
+            try:
+                if path is None:                # flush marker
+                    frame.set()
+                    continue
+                self._write(path, frame, jpeg)
+                self.written += 1
+                if on_saved is not None:
+                    on_saved(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"[ERROR] Failed to save {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, frame, jpeg):
+        if jpeg is None:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise IOError("JPEG encoding failed")
+            jpeg = encoded.tobytes()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(jpeg)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "jpeg_quality": self.jpeg_quality,
+        }
+
+
+evidence_writer = EvidenceWriter()
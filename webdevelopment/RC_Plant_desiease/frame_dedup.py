@@ -0,0 +1,89 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Near-duplicate frame skipping in front of YOLO (AI_model.process_frame).
+#
+# The car stops at the same plant positions every cycle, and a stalled stream
+# hands back the same picture, so many frames are practically identical to the
+# one last inferred at that stop. Each frame is reduced to a 9x8 difference hash
+# and a mean-centred 32x32 grayscale thumbnail (both indifferent to small
+# exposure changes, sensitive to anything moving or appearing); when both
+# the hash distance and the mean pixel difference against the stop's reference
+# frame are within threshold, the reference's detection is reused instead of
+# running the model. The reference is always the last *inferred* frame, so slow
+# drift still triggers inference once it adds up, and a result older than
+# MAX_AGE_SECONDS is never reused. Frames that don't come from a stop are not
+# deduplicated (AI_model skips the check), as unrelated images would share a reference.
+
+ENABLED = True
+HASH_THRESHOLD = 4                  # Max differing bits of the 64-bit dHash
+DIFF_THRESHOLD = 6.0                # Max mean absolute difference of the centred 32x32 grayscale (0-255 scale)
+MAX_AGE_SECONDS = 48 * 3600
+DIFF_SIZE = 32
+
+
+def signature(frame):
+    """(dHash as int, mean-centred 32x32 grayscale) of a BGR frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    dhash = int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    thumb = cv2.resize(gray, (DIFF_SIZE, DIFF_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return dhash, thumb - thumb.mean()
+
+
+class FrameDeduplicator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._references = {}           # stop_number -> (signature, (class_name, conf, boxes), inferred_at)
+        self.checked = 0
+        self.skipped = 0
+
+    def check(self, frame, stop_number=None):
+        """
+        (reused result, signature) for `frame` at `stop_number`. The result is
+        (class_name, conf, boxes) when the frame matches the stop's last inferred
+        one, else None; pass the signature to remember() after inferring.
+        """
+        frame_signature = signature(frame)
+        with self._lock:
+            self.checked += 1
+            reference = self._references.get(stop_number)
+        if not ENABLED or reference is None or time.time() - reference[2] > MAX_AGE_SECONDS:
+            return None, frame_signature
+
+        (ref_hash, ref_small), result, _ = reference
+        hash_distance = bin(frame_signature[0] ^ ref_hash).count('1')
+        mean_diff = float(np.abs(frame_signature[1] - ref_small).mean())
+        if hash_distance > HASH_THRESHOLD or mean_diff > DIFF_THRESHOLD:
+            return None, frame_signature
+        with self._lock:
+            self.skipped += 1
+        print(f"[DEBUG] Frame at stop {stop_number} unchanged (hash distance {hash_distance}, "
+              f"diff {mean_diff:.1f}); reusing detection.")
+        return result, frame_signature
+
+    def remember(self, stop_number, frame_signature, class_name, conf, boxes):
+        """Make this inferred frame the reference for its stop."""
+        with self._lock:
+            self._references[stop_number] = (frame_signature, (class_name, conf, boxes), time.time())
+
+    def reset(self):
+        with self._lock:
+            self._references.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": ENABLED,
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checked, 4) if self.checked else None,
+                "stops": len(self._references),
+            }
+
+
+frame_deduplicator = FrameDeduplicator()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+
+# On-disk cache of YOLO results for the directory pipeline.
+#
+# Entries are keyed by SHA-1 of the image bytes plus a fingerprint of the model
+# weights, so re-running /run on an unchanged ./input skips inference (and, with
+# the annotated output stored, decoding, drawing and encoding too), while a new
+# best.pt misses every old entry automatically. Each entry is <key>.json
+# (class, confidence, boxes) and optionally <key>.<ext> (annotated image), under
+# a two-character fan-out directory. Hits refresh the files' mtime; when the
+# cache grows past MAX_BYTES the least recently used files are deleted down to
+# LOW_WATER of it.
+
+CACHE_DIR = './inference_cache'
+ENABLED = True
+STORE_ANNOTATED = True
+MAX_BYTES = 512 * 1024 * 1024
+LOW_WATER = 0.9
+
+
+def content_key(data, model_fingerprint):
+    return f"{hashlib.sha1(data).hexdigest()}-{model_fingerprint[:16]}"
+
+
+class InferenceCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None        # Lazily measured on first put
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def get(self, key, ext=None):
+        """
+        Cached result for `key` as {"class_name", "confidence", "boxes", "annotated"}, or None.
+        "annotated" holds the stored output image bytes for `ext`, or None when there aren't any.
+        """
+        meta_path = self._path(key, "json")
+        try:
+            with open(meta_path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        entry["annotated"] = None
+        touched = [meta_path]
+        if ext is not None and STORE_ANNOTATED:
+            image_path = self._path(key, ext)
+            try:
+                with open(image_path, 'rb') as f:
+                    entry["annotated"] = f.read()
+                touched.append(image_path)
+            except OSError:
+                pass
+        for path in touched:                # mtime is the LRU clock
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, class_name, confidence, boxes, annotated=None, ext=None):
+        """Store a result (and the annotated image bytes, when given and STORE_ANNOTATED is on)."""
+        written = 0
+        files = [(self._path(key, "json"), json.dumps(
+            {"class_name": class_name, "confidence": confidence, "boxes": boxes}).encode())]
+        if annotated is not None and ext is not None and STORE_ANNOTATED:
+            files.append((self._path(key, ext), annotated))
+        try:
+            os.makedirs(os.path.dirname(files[0][0]), exist_ok=True)
+            for path, data in files:
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                written += len(data)
+        except OSError as e:
+            print(f"[WARNING] Inference cache write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._measure()
+            else:
+                self._total_bytes += written
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _measure(self):
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def evict(self):
+        """Delete least recently used files until the cache is under LOW_WATER × max_bytes."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * LOW_WATER
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._total_bytes = total
+            self.evicted += removed
+        if removed:
+            print(f"[INFO] Inference cache evicted {removed} file(s); {total / 1e6:.1f} MB left.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted_files": self.evicted,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+inference_cache = InferenceCache()
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+# Lazy owner of the YOLO plant-disease model.
+#
+# Importing ultralytics (and torch behind it) and reading best.pt takes seconds
+# and hundreds of MB, so nothing happens at import: the model is built on the
+# first predict() call, or ahead of time by preload() on a background thread
+# (MODEL_PRELOAD in network_utils/constants.py). After loading, one inference
+# on a blank frame primes the backend so the first real image isn't the slow
+# one. Load, warm-up and inference latencies are kept in stats().
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best.pt')
+WARMUP_SHAPE = (640, 640, 3)
+
+
+class ModelManager:
+    def __init__(self, model_path=MODEL_PATH):
+        self.model_path = model_path
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._predict_lock = threading.Lock()      # One inference at a time on the shared model
+        self._fingerprint = (None, None)           # ((mtime_ns, size), sha1) of the weights file
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.load_error = None
+        self.inferences = 0
+        self.frames = 0
+        self.avg_inference_ms = 0.0
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        """The YOLO model, loading and warming it up on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._load()
+        return self._model
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            from ultralytics import YOLO
+            model = YOLO(self.model_path)
+        except Exception as e:
+            self.load_error = str(e)
+            raise
+        self.load_seconds = time.perf_counter() - started
+        print(f"[INFO] Model loaded in {self.load_seconds:.2f}s. Classes:", model.names)
+
+        started = time.perf_counter()
+        model(np.zeros(WARMUP_SHAPE, dtype=np.uint8), verbose=False)
+        self.warmup_seconds = time.perf_counter() - started
+        print(f"[INFO] Model warm-up inference took {self.warmup_seconds:.2f}s")
+        self.load_error = None
+        self._model = model
+
+    def fingerprint(self):
+        """SHA-1 of the weights file (re-hashed only when its mtime or size changes); keys cached results."""
+        stat = os.stat(self.model_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._fingerprint[0] != signature:
+            digest = hashlib.sha1()
+            with open(self.model_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            self._fingerprint = (signature, digest.hexdigest())
+        return self._fingerprint[1]
+
+    @property
+    def names(self):
+        return self.get().names
+
+    def predict(self, frames):
+        """Run the model on one frame or a list of frames; returns ultralytics Results."""
+        model = self.get()
+        count = len(frames) if isinstance(frames, list) else 1
+        with self._predict_lock:
+            started = time.perf_counter()
+            results = model(frames, verbose=False)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.inferences += 1
+            self.frames += count
+            self.avg_inference_ms = elapsed_ms if self.inferences == 1 else \
+                0.8 * self.avg_inference_ms + 0.2 * elapsed_ms
+        return results
+
+    def preload(self):
+        """Load and warm the model on a daemon thread so the first request doesn't wait for it."""
+        def _preload():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"[ERROR] Model preload failed: {e}")
+
+        thread = threading.Thread(target=_preload, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "model_path": self.model_path,
+            "load_seconds": None if self.load_seconds is None else round(self.load_seconds, 3),
+            "warmup_seconds": None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            "load_error": self.load_error,
+            "inferences": self.inferences,
+            "frames": self.frames,
+            "avg_inference_ms": round(self.avg_inference_ms, 1),
+        }
+
+
+model_manager = ModelManager()
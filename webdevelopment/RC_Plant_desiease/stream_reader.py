@@ -0,0 +1,253 @@
+import argparse
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import requests
+
+# Persistent reader for the car camera's MJPEG stream.
+#
+# One background thread keeps a single HTTP connection to the Pi's /video_feed
+# open and scans the bytes for JPEG start/end markers (as in
+# trials/capturingImagesFromRasCam.py), keeping only the newest complete JPEG.
+# Decoding happens when a frame is asked for and is cached per frame, so an
+# idle stream costs no decode time. read(fresh_after=t) waits for a frame that
+# arrived after t, e.g. after the car has settled at a stop, so a stale
+# buffered frame is never used. Dropped connections reconnect with backoff.
+#
+# For local testing, serve a directory of JPEGs as a stand-in stream:
+#   python -m RC_Plant_desiease.stream_reader --serve ./input --port 5055
+#   python -m RC_Plant_desiease.stream_reader --url http://127.0.0.1:5055/video_feed
+
+CONNECT_TIMEOUT_SECONDS = 3
+READ_TIMEOUT_SECONDS = 5            # No bytes for this long → reconnect
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 10
+CHUNK_SIZE = 16 * 1024
+MAX_BUFFER_BYTES = 4 * 1024 * 1024  # Drop a runaway buffer with no end-of-image marker
+
+SOI, EOI = b'\xff\xd8', b'\xff\xd9'
+
+
+class StreamReader:
+    def __init__(self, url):
+        self.url = url
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._jpeg = None
+        self._seq = 0
+        self._received_at = None
+        self._decoded = (0, None)       # (seq, frame) of the last decode
+        self.connected = False
+        self.reconnects = 0
+        self.last_error = None
+        self._fps = 0.0
+
+    # ──────────────────────────── Lifecycle ────────────────────────────
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mjpeg-reader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=READ_TIMEOUT_SECONDS + 1)
+
+    def _run(self):
+        backoff = RECONNECT_MIN_SECONDS
+        while not self._stop.is_set():
+            try:
+                with requests.get(self.url, stream=True,
+                                  timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    self.last_error = None
+                    print(f"[INFO] Connected to camera stream {self.url}")
+                    backoff = RECONNECT_MIN_SECONDS
+                    self._consume(response.iter_content(chunk_size=CHUNK_SIZE))
+            except requests.RequestException as e:
+                self.last_error = str(e)
+                print(f"[WARNING] Camera stream error: {e}")
+            finally:
+                self.connected = False
+            if self._stop.wait(backoff):
+                break
+            self.reconnects += 1
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    def _consume(self, chunks):
+        buffer = bytearray()
+        scan_from = 0
+        for chunk in chunks:
+            if self._stop.is_set():
+                return
+            buffer += chunk
+            while True:
+                start = buffer.find(SOI)
+                if start == -1:
+                    del buffer[:max(len(buffer) - 1, 0)]    # Keep a byte in case a marker is split
+                    scan_from = 0
+                    break
+                if start:
+                    del buffer[:start]
+                    scan_from = 0
+                end = buffer.find(EOI, max(scan_from, 2))
+                if end == -1:
+                    scan_from = max(len(buffer) - 1, 2)     # Resume the search where this one stopped
+                    if len(buffer) > MAX_BUFFER_BYTES:
+                        buffer.clear()
+                        scan_from = 0
+                    break
+                self._publish(bytes(buffer[:end + 2]))
+                del buffer[:end + 2]
+                scan_from = 0
+
+    def _publish(self, jpeg):
+        now = time.time()
+        with self._cond:
+            if self._received_at is not None:
+                interval = now - self._received_at
+                if interval > 0:
+                    self._fps = 1 / interval if self._fps == 0 else 0.9 * self._fps + 0.1 / interval
+            self._jpeg = jpeg
+            self._seq += 1
+            self._received_at = now
+            self._cond.notify_all()
+
+    # ──────────────────────────── Frames ────────────────────────────
+    def _wait_for_frame(self, fresh_after, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._jpeg is None or (fresh_after is not None and self._received_at <= fresh_after):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None, None
+                self._cond.wait(remaining)
+            return self._jpeg, self._received_at, self._seq
+
+    def latest_jpeg(self, fresh_after=None, timeout=5.0):
+        """(jpeg bytes, received_at) of the newest frame, waiting up to `timeout` for one newer than `fresh_after`."""
+        jpeg, received_at, _ = self._wait_for_frame(fresh_after, timeout)
+        return jpeg, received_at
+
+    def read(self, fresh_after=None, timeout=5.0):
+        """Newest decoded BGR frame (see latest_jpeg), or None when none arrived in time."""
+        frame, _ = self.read_with_jpeg(fresh_after, timeout)
+        return frame
+
+    def read_with_jpeg(self, fresh_after=None, timeout=5.0):
+        """(frame, jpeg bytes) for the same newest frame, so it can be saved without re-encoding."""
+        jpeg, _, seq = self._wait_for_frame(fresh_after, timeout)
+        if jpeg is None:
+            return None, None
+        cached_seq, cached = self._decoded
+        if cached_seq == seq:
+            return cached.copy(), jpeg
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            print("[WARNING] Could not decode frame from camera stream.")
+            return None, None
+        self._decoded = (seq, frame)
+        return frame.copy(), jpeg
+
+    def stats(self):
+        with self._cond:
+            age = None if self._received_at is None else round(time.time() - self._received_at, 3)
+            return {
+                "url": self.url,
+                "connected": self.connected,
+                "frames": self._seq,
+                "fps": round(self._fps, 1),
+                "last_frame_age_seconds": age,
+                "reconnects": self.reconnects,
+                "last_error": self.last_error,
+            }
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_stream_reader(url):
+    """The running reader for `url`, started on first use and shared afterwards."""
+    with _readers_lock:
+        reader = _readers.get(url)
+        if reader is None:
+            reader = _readers[url] = StreamReader(url)
+        return reader.start()
+
+
+# ──────────────────────────── Stand-in stream ────────────────────────────
+def serve_test_stream(image_dir, host="127.0.0.1", port=5055, fps=10):
+    """Serve the JPEGs in image_dir in a loop as multipart/x-mixed-replace at /video_feed, like the Pi."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    paths = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir) if f.lower().endswith(('.jpg', '.jpeg')))
+    if not paths:
+        raise ValueError(f"No JPEGs in {image_dir}")
+    jpegs = [open(p, 'rb').read() for p in paths]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/video_feed':
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+            self.end_headers()
+            i = 0
+            try:
+                while True:
+                    jpeg = jpegs[i % len(jpegs)]
+                    self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+                    i += 1
+                    time.sleep(1 / fps)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"[INFO] Serving {len(jpegs)} JPEGs at http://{host}:{port}/video_feed ({fps} fps)")
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read the car's MJPEG stream, or serve a stand-in one.")
+    parser.add_argument("--url", help="Stream to read and report on")
+    parser.add_argument("--serve", metavar="DIR", help="Serve the JPEGs in DIR as a stand-in stream")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve_test_stream(args.serve, port=args.port, fps=args.fps)
+        return
+    if not args.url:
+        parser.error("--url or --serve is required")
+
+    reader = get_stream_reader(args.url)
+    started = time.time()
+    while time.time() - started < args.seconds:
+        requested = time.time()
+        frame = reader.read(fresh_after=requested)
+        if frame is None:
+            print("[WARNING] No fresh frame.")
+        else:
+            print(f"[INFO] Fresh {frame.shape[1]}x{frame.shape[0]} frame after {time.time() - requested:.3f}s")
+        time.sleep(1)
+    print(reader.stats())
+    reader.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+from flask import Blueprint, Response, abort, request, send_file, url_for
+from werkzeug.utils import safe_join
+
+# Small previews for the results gallery.
+#
+# Thumbnails are made once per image by a background thread, either right after
+# a prediction is saved (queue_thumbnail) or when a gallery request misses. They
+# are stored in THUMB_CACHE_DIR under the SHA-1 of the source file's bytes, so an
+# image that is re-saved with the same content reuses its thumbnail and a changed
+# one gets a new one. Gallery URLs carry that hash (?v=...), which lets browsers
+# keep them for a year; the hash is also the ETag for revalidation. WebP is sent
+# to browsers that accept it (when OpenCV can encode it), JPEG otherwise.
+
+STATIC_DIR = './static'
+THUMB_CACHE_DIR = './thumb_cache'
+THUMB_MAX_SIZE = 320                # Longest side, px
+WEBP_QUALITY = 70
+JPEG_QUALITY = 75
+THUMB_CACHE_MAX_FILES = 5000        # Oldest thumbnails are pruned beyond this
+MISS_WAIT_SECONDS = 0.5             # How long a request waits for a missing thumbnail before falling back
+LONG_CACHE = "public, max-age=31536000, immutable"
+HASH_CHUNK = 1024 * 1024
+
+thumbnails_bp = Blueprint('thumbnails', __name__)
+
+_hashes = {}                        # path -> ((mtime_ns, size), sha1)
+_hashes_lock = threading.Lock()
+
+
+def content_hash(path):
+    """SHA-1 of the file, remembered until its mtime or size changes."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _hashes_lock:
+        cached = _hashes.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(block)
+    with _hashes_lock:
+        _hashes[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _webp_supported():
+    try:
+        ok, _ = cv2.imencode('.webp', np.zeros((2, 2, 3), dtype=np.uint8), [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY])
+        return bool(ok)
+    except cv2.error:
+        return False
+
+
+WEBP_SUPPORTED = _webp_supported()
+
+
+def thumb_path(digest, ext):
+    return os.path.join(THUMB_CACHE_DIR, f"{digest}_{THUMB_MAX_SIZE}.{ext}")
+
+
+def make_thumbnail(source_path, ext="webp"):
+    """Write the thumbnail for source_path (if it isn't cached yet) and return its path."""
+    digest = content_hash(source_path)
+    target = thumb_path(digest, ext)
+    if os.path.exists(target):
+        return target
+
+    with open(source_path, 'rb') as f:
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+    # Decoding at half size is much cheaper than a full decode followed by a resize
+    frame = cv2.imdecode(data, cv2.IMREAD_REDUCED_COLOR_2)
+    if frame is None:
+        raise ValueError(f"Cannot decode {source_path}")
+    height, width = frame.shape[:2]
+    scale = THUMB_MAX_SIZE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    params = [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY] if ext == "webp" else [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+    ok, encoded = cv2.imencode(f'.{ext}', frame, params)
+    if not ok:
+        raise IOError(f"Thumbnail encoding failed for {source_path}")
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    tmp_path = target + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded.tobytes())
+    os.replace(tmp_path, target)
+    return target
+
+
+def prune_cache(max_files=THUMB_CACHE_MAX_FILES):
+    """Delete the least recently written thumbnails beyond max_files."""
+    try:
+        entries = [e for e in os.scandir(THUMB_CACHE_DIR) if e.is_file() and not e.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return 0
+    if len(entries) <= max_files:
+        return 0
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return len(entries) - max_files
+
+
+# ──────────────────────────── Background worker ────────────────────────────
+class ThumbnailWorker:
+    PRUNE_EVERY = 200
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._pending = {}              # (path, ext) -> Event set when done
+        self._pending_lock = threading.Lock()
+        self.generated = 0
+        self.failed = 0
+
+    def submit(self, source_path, ext="webp"):
+        """Queue a thumbnail; returns an Event that is set once it exists (or failed)."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="thumbnailer", daemon=True)
+                self._thread.start()
+        key = (source_path, ext)
+        with self._pending_lock:
+            event = self._pending.get(key)
+            if event is None:
+                event = self._pending[key] = threading.Event()
+                self._queue.put(key)
+        return event
+
+    def _run(self):
+        while True:
+            source_path, ext = key = self._queue.get()
+            try:
+                make_thumbnail(source_path, ext)
+                self.generated += 1
+                if self.generated % self.PRUNE_EVERY == 0:
+                    prune_cache()
+            except Exception as e:
+                self.failed += 1
+                print(f"[WARNING] Thumbnail for {source_path} failed: {e}")
+            finally:
+                with self._pending_lock:
+                    self._pending.pop(key).set()
+
+
+worker = ThumbnailWorker()
+
+
+def queue_thumbnail(source_path):
+    """Generate the default-format thumbnail for a freshly saved image in the background."""
+    worker.submit(source_path, "webp" if WEBP_SUPPORTED else "jpg")
+
+
+# ──────────────────────────── Serving ────────────────────────────
+def thumbnail_url(image):
+    """Versioned URL for the thumbnail of a static-relative image path ('predictions/x.jpg')."""
+    source = safe_join(STATIC_DIR, image)
+    try:
+        version = content_hash(source)[:16]
+    except (OSError, TypeError):
+        version = None
+    return url_for('thumbnails.thumbnail', image=image, v=version)
+
+
+@thumbnails_bp.route("/thumbs/<path:image>")
+def thumbnail(image):
+    source = safe_join(STATIC_DIR, image)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+
+    ext = "webp" if WEBP_SUPPORTED and "image/webp" in request.headers.get("Accept", "") else "jpg"
+    digest = content_hash(source)
+    etag = f"{digest[:16]}-{THUMB_MAX_SIZE}-{ext}"
+    # A URL carrying the current content hash never changes meaning; others must revalidate
+    cache_control = LONG_CACHE if request.args.get("v") == digest[:16] else "no-cache"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        target = thumb_path(digest, ext)
+        if not os.path.exists(target):
+            worker.submit(source, ext).wait(MISS_WAIT_SECONDS)
+        if not os.path.exists(target):
+            # Still being made (or undecodable): send the full image once, uncached
+            response = send_file(os.path.abspath(source), max_age=0)
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        response = send_file(os.path.abspath(target), mimetype=f"image/{'jpeg' if ext == 'jpg' else ext}",
+                             conditional=False, etag=False)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept"
+    return response
@@ -1,5 +1,5 @@
 from flask import Flask, render_template, request, jsonify, url_for, redirect, session
-from database_setup import Base, engine
+from database_setup import Base, engine, SessionLocal
 from dashboard import dashboard_bp
 from network_utils.status import status_bp
 from network import receive_sensor_data 
@@ -7,10 +7,22 @@ import os
 import json
 from RC_Plant_desiease.Automatic_car_control import run_cycle
 from RC_Plant_desiease.AI_model import  process_images_in_directory
-import threading
+from RC_Plant_desiease.model_manager import model_manager
+from RC_Plant_desiease.inference_cache import inference_cache
+from RC_Plant_desiease.frame_dedup import frame_deduplicator
+from RC_Plant_desiease.thumbnails import thumbnails_bp, thumbnail_url
 from network_utils.config_handler import load_config, save_config
 from network_utils.user_control import handle_manual_control
 from network_utils.auth import auth_bp
+from data_utils.export import export_bp
+from data_utils.detections import (
+    detections_bp, query_detections, detection_dict, parse_page_args, backfill_detections
+)
+from data_utils.retention import start_retention_scheduler
+from data_utils.snapshot import start_snapshot_scheduler
+from network_utils.admission import install_admission_control
+from network_utils.jobs import jobs_bp, job_manager, JobQueueFull
+from network_utils.constants import MODEL_PRELOAD
 
 # ──────────────────────────── Flask Setup ────────────────────────────
 app = Flask(__name__)
@@ -22,11 +34,29 @@ Base.metadata.create_all(bind=engine)
 app.register_blueprint(auth_bp)
 app.register_blueprint(dashboard_bp)
 app.register_blueprint(status_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(detections_bp)
+app.register_blueprint(thumbnails_bp)
+
+# Bounded slots + waiting lines for /receive and the UI; overload gets 429/503 with Retry-After
+install_admission_control(app)
+
+# Keep a point-in-time copy of the DB fresh for analytics scripts; under several
+# workers only the first to take the scheduler's flock runs it (see data_utils/snapshot.py)
+start_snapshot_scheduler()
+
+# YOLO loads lazily on the first /run or cycle; optionally warm it up off the request path now
+if MODEL_PRELOAD:
+    model_manager.preload()
 
 # ──────────────────────────── Paths ────────────────────────────
 INPUT_DIR = './input'
 OUTPUT_DIR = './static/predictions'
 
+# The gallery lists plant_detections; index images saved before it existed (idempotent)
+backfill_detections(OUTPUT_DIR)
+
 # ──────────────────────────── Routes ────────────────────────────
 @app.route('/')
 def index():
@@ -36,31 +66,47 @@ def index():
     return render_template('index.html')
 
 
+def _job_response(key, func):
+    """Submit a single-flight job; forms get redirected to the results page, API clients get the job."""
+    try:
+        job, created = job_manager.submit(key, func)
+    except JobQueueFull as e:
+        print(f"[WARNING] Refusing {key} job: {e}")
+        return jsonify({"error": str(e)}), 429
+    if not created:
+        print(f"[INFO] {key} already {job.state} as job {job.id}; not starting another.")
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(job.to_dict()), 202 if created else 200
+    return redirect(url_for('ai_model'))
+
 @app.route('/run', methods=['POST'])
 def run_yolo():
-    process_images_in_directory(INPUT_DIR, OUTPUT_DIR)
-    return redirect(url_for('ai_model'))
+    return _job_response("run", lambda job: process_images_in_directory(
+        INPUT_DIR, OUTPUT_DIR, progress=job.progress, cancel_event=job.cancel_event))
 
 @app.route('/start-cycle', methods=['POST'])
 def start_cycle():
-    try:
-        def background_cycle():
-            print("[INFO] Cycle started in background.")
-            run_cycle()
+    return _job_response("cycle", lambda job: run_cycle(progress=job.progress, cancel_event=job.cancel_event))
 
-        threading.Thread(target=background_cycle).start()
-        return redirect(url_for('ai_model'))
-    except Exception as e:
-        print(f"[ERROR] Failed to start cycle: {e}")
-        return jsonify({"error": str(e)}), 500
+@app.route('/api/model-status')
+def model_status():
+    return jsonify({**model_manager.stats(), "inference_cache": inference_cache.stats(),
+                    "frame_dedup": frame_deduplicator.stats()})
 
 @app.route('/results')
 def ai_model():
-    images = [
-        f for f in os.listdir(OUTPUT_DIR)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))
-    ]
-    return render_template('ai_model.html', images=images)
+    page, per_page = parse_page_args(request.args)
+    # Active filters, carried over by the page links
+    filters = {key: request.args[key] for key in ('cycle_id', 'per_page') if key in request.args}
+    with SessionLocal() as db_session:
+        rows, total = query_detections(db_session, page, per_page, cycle_id=filters.get('cycle_id'),
+                                       with_image=True)
+        detections = [detection_dict(row) for row in rows]
+    for d in detections:
+        d["thumb_url"] = thumbnail_url(d["image"])
+    pages = max(1, (total + per_page - 1) // per_page)
+    return render_template('ai_model.html', detections=detections, page=page, pages=pages, filters=filters,
+                           jobs=job_manager.active())
 
 
 @app.route('/receive', methods=['POST'])
@@ -196,4 +242,7 @@ def get_latest_readings():
 
 # ──────────────────────────── Main ────────────────────────────
 if __name__ == '__main__':
+    # Roll up and trim old sensor history in the background (see data_utils/retention.py).
+    # Started here rather than at import; under a WSGI server run 'python -m data_utils.retention' from cron.
+    start_retention_scheduler()
     app.run(host='0.0.0.0', port=5000)
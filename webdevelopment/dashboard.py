@@ -1,6 +1,13 @@
-from flask import Blueprint, render_template, jsonify
-from database_setup import SessionLocal, SensorData, KalmanFilterFusionData, WeightedAverageFusionData
+from flask import Blueprint, render_template, jsonify, request
+from database_setup import engine
+from data_utils.encoding import (
+    FORMAT_JSON, FORMAT_BINARY, SUPPORTED_FORMATS, BINARY_MIMETYPE,
+    columnar_series, encode_binary, build_response
+)
+from data_utils.queries import SOURCES, fetch_series_rows, fetch_series_arrays, fetch_buckets
+from data_utils.alignment import parse_duration
 from collections import defaultdict
+from datetime import datetime, timedelta
 import json
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -18,74 +25,121 @@ sensor_labels = {
     3005: "Soil Moisture - Plant 2"
 }
 
+MAX_BUCKETS = 10000             # Refuse ranges that would return more rows than this per series
+DEFAULT_SERIES_WINDOW = timedelta(days=7)    # Shortened to MAX_BUCKETS buckets for fine bucket sizes
+
 @dashboard_bp.route("/dashboard")
 def dashboard():
     return render_template("dashboard.html")
 
 
+def _legacy_series(rows):
+    """Group (key, timestamp, value) rows into parallel ISO-timestamp/value lists."""
+    grouped = defaultdict(lambda: ([], []))
+    for key, timestamp, value in rows:
+        timestamps, values = grouped[key]
+        timestamps.append(timestamp.isoformat())
+        values.append(value)
+    return grouped.items()
+
+
+def _sensor_meta(sensor_id):
+    return {
+        "label": sensor_labels.get(sensor_id, f"Sensor {sensor_id}"),
+        "sensor_id": sensor_id
+    }
+
+
 @dashboard_bp.route("/api/dashboard-data")
 def dashboard_data():
-    session = SessionLocal()
-    try:
-        # --- RAW SENSOR DATA ---
-        raw_data = session.query(SensorData).order_by(SensorData.Timestamp).all()
-        grouped_raw = defaultdict(list)
-        for entry in raw_data:
-            grouped_raw[entry.SensorID].append({
-                "timestamp": entry.Timestamp.isoformat(),
-                "value": entry.Value
-            })
+    # ?format=json (default, ISO strings) | columnar (epoch-ms + float32) | binary (packed arrays)
+    fmt = request.args.get("format", FORMAT_JSON).lower()
+    if fmt not in SUPPORTED_FORMATS:
+        return jsonify({"error": f"Unsupported format '{fmt}'"}), 400
 
-        raw_plot_data = [
-            {
-                "label": sensor_labels.get(sensor_id, f"Sensor {sensor_id}"),
-                "sensor_id": sensor_id,
-                "timestamps": [d["timestamp"] for d in data],
-                "values": [d["value"] for d in data]
-            }
-            for sensor_id, data in grouped_raw.items()
-        ]
-
-        # --- KALMAN FILTER FUSION DATA ---
-        kalman_data = session.query(KalmanFilterFusionData).order_by(KalmanFilterFusionData.Timestamp).all()
-        grouped_kalman = defaultdict(list)
-        for entry in kalman_data:
-            grouped_kalman[entry.SensorID].append({
-                "timestamp": entry.Timestamp.isoformat(),
-                "value": entry.FusedValue
-            })
-        kalman_plot_data = [
-            {
-                "label": sensor_labels.get(sensor_id, f"Sensor {sensor_id}"),
-                "sensor_id": sensor_id,
-                "timestamps": [d["timestamp"] for d in data],
-                "values": [d["value"] for d in data]
-            }
-            for sensor_id, data in grouped_kalman.items()
-        ]
-
-        # --- WEIGHTED AVERAGE FUSION DATA ---
-        weighted_data = session.query(WeightedAverageFusionData).order_by(WeightedAverageFusionData.Timestamp).all()
-        grouped_weighted = defaultdict(list)
-        for entry in weighted_data:
-            grouped_weighted[entry.SensorType].append({
-                "timestamp": entry.Timestamp.isoformat(),
-                "value": entry.FusedValue
+    with engine.connect() as conn:
+        if fmt == FORMAT_JSON:
+            return jsonify({
+                "raw": [
+                    {**_sensor_meta(sensor_id), "timestamps": timestamps, "values": values}
+                    for sensor_id, (timestamps, values) in _legacy_series(fetch_series_rows(conn, "raw", epoch=False))
+                ],
+                "kalman": [
+                    {**_sensor_meta(sensor_id), "timestamps": timestamps, "values": values}
+                    for sensor_id, (timestamps, values) in _legacy_series(fetch_series_rows(conn, "kalman", epoch=False))
+                ],
+                "weighted": [
+                    {"sensor_type": sensor_type, "timestamps": timestamps, "values": values}
+                    for sensor_type, (timestamps, values) in _legacy_series(fetch_series_rows(conn, "weighted", epoch=False))
+                ]
             })
-        weighted_plot_data = [
-            {
-                "sensor_type": sensor_type,
-                "timestamps": [d["timestamp"] for d in data],
-                "values": [d["value"] for d in data]
-            }
-            for sensor_type, data in grouped_weighted.items()
-        ]
-
-        return jsonify({
-            "raw": raw_plot_data,
-            "kalman": kalman_plot_data,
-            "weighted": weighted_plot_data
-        })
-
-    finally:
-        session.close()
+
+        # --- COLUMNAR / BINARY: epoch-ms computed in SQL, rows packed straight into typed arrays ---
+        # Live data only, like the JSON format; archived history is charted through /api/series
+        sections = {
+            "raw": [(_sensor_meta(key), ts, vals)
+                    for key, ts, vals in fetch_series_arrays(conn, "raw", include_archive=False)],
+            "kalman": [(_sensor_meta(key), ts, vals)
+                       for key, ts, vals in fetch_series_arrays(conn, "kalman", include_archive=False)],
+            "weighted": [({"sensor_type": key}, ts, vals)
+                         for key, ts, vals in fetch_series_arrays(conn, "weighted", include_archive=False)]
+        }
+
+    if fmt == FORMAT_BINARY:
+        body = encode_binary(sections)
+        mimetype = BINARY_MIMETYPE
+    else:
+        payload = {
+            section: [columnar_series((ts, vals), **meta) for meta, ts, vals in series_list]
+            for section, series_list in sections.items()
+        }
+        payload["format"] = fmt
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        mimetype = "application/json"
+
+    return build_response(body, mimetype, request.headers.get("Accept-Encoding"))
+
+
+@dashboard_bp.route("/api/series")
+def series_data():
+    """
+    GET /api/series?source=kalman&sensor=2001,2003&start=...&end=...&bucket=1h
+
+    Avg/min/max/count per time bucket, aggregated in SQL. "sensor" holds sensor
+    IDs for raw/kalman and fused types (temperature, humidity) for weighted.
+    """
+    try:
+        source = request.args.get("source", "weighted")
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source '{source}'")
+
+        bucket_seconds = parse_duration(request.args.get("bucket"), default="1h")
+        end = datetime.fromisoformat(request.args["end"]) if "end" in request.args else datetime.utcnow()
+        if "start" in request.args:
+            start = datetime.fromisoformat(request.args["start"])
+        else:
+            start = end - min(DEFAULT_SERIES_WINDOW, timedelta(seconds=MAX_BUCKETS * bucket_seconds))
+        if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+            raise ValueError(f"Range too large for bucket size (max {MAX_BUCKETS} buckets)")
+
+        keys = [k.strip() for k in request.args.get("sensor", "").split(",") if k.strip()]
+        if source != "weighted":
+            keys = [int(k) for k in keys]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with engine.connect() as conn:
+        buckets = fetch_buckets(conn, source, int(bucket_seconds * 1000), start, end, keys or None)
+
+    series = []
+    for key, entry in buckets.items():
+        meta = {"sensor_type": key} if source == "weighted" else _sensor_meta(key)
+        series.append({**meta, **entry})
+
+    return jsonify({
+        "source": source,
+        "bucket_seconds": bucket_seconds,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": series
+    })
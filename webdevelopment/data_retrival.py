@@ -1,47 +1,26 @@
-from sqlalchemy.orm import sessionmaker
-from database_setup import engine, Actuator, UserInteraction
+from sqlalchemy import select
+from database_setup import Actuator, UserInteraction
+from data_utils.snapshot import snapshot_connect
 import pandas as pd
 
-# Create session
-Session = sessionmaker(bind=engine)
-session = Session()
+actuators = Actuator.__table__
+interactions = UserInteraction.__table__
 
-# === Fetch last row from Actuator table ===
-last_actuator = (
-    session.query(Actuator)
-    .order_by(Actuator.LastUpdated.desc())
-    .first()
-)
+# Core selects return plain row mappings, so no ORM objects or manual dict building.
+# Reads go to the analytics snapshot, never the live DB the ESP boards write to.
+with snapshot_connect() as conn:
+    # === Fetch last row from Actuator table ===
+    last_actuator = conn.execute(
+        select(actuators).order_by(actuators.c.LastUpdated.desc()).limit(1)
+    ).mappings().first()
 
-# Convert to dict
-actuator_data = {
-    "ActuatorID": last_actuator.ActuatorID,
-    "ActuatorName": last_actuator.ActuatorName,
-    "Status": last_actuator.Status,
-    "LastUpdated": last_actuator.LastUpdated,
-    "UserID": last_actuator.UserID,
-    "DeviceID": last_actuator.DeviceID
-} if last_actuator else {}
+    # === Fetch last row from UserInteraction table ===
+    last_interaction = conn.execute(
+        select(interactions).order_by(interactions.c.Timestamp.desc()).limit(1)
+    ).mappings().first()
 
-# === Fetch last row from UserInteraction table ===
-last_interaction = (
-    session.query(UserInteraction)
-    .order_by(UserInteraction.Timestamp.desc())
-    .first()
-)
-
-# Convert to dict
-interaction_data = {
-    "InteractionID": last_interaction.InteractionID,
-    "UserID": last_interaction.UserID,
-    "DeviceID": last_interaction.DeviceID,
-    "ActuatorID": last_interaction.ActuatorID,
-    "Action": last_interaction.Action,
-    "Timestamp": last_interaction.Timestamp
-} if last_interaction else {}
-
-# Close session
-session.close()
+actuator_data = dict(last_actuator) if last_actuator else {}
+interaction_data = dict(last_interaction) if last_interaction else {}
 
 # Print output
 print("\n=== Last Actuator Entry ===")
@@ -0,0 +1,151 @@
+import numpy as np
+
+from data_utils.queries import fetch_series_arrays, fetch_keys
+
+# Puts independent sensor series onto one shared time grid. Each board posts its
+# sensors with one timestamp, but different boards drift by milliseconds, so an
+# exact-timestamp pivot leaves rows full of NaNs. Everything here is vectorised
+# with np.searchsorted and works on epoch-ms int64 / float arrays.
+
+METHODS = ("ffill", "linear")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+# ──────────────────────────── Time helpers ────────────────────────────
+def parse_duration(value, default="1h"):
+    """Parse "500ms", "30s", "15m", "1h", "1d" or a plain number of seconds into seconds."""
+    value = (value or "").strip().lower() or default
+    for unit in sorted(DURATION_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            seconds = float(value[:-len(unit)]) * DURATION_UNITS[unit]
+            break
+    else:
+        seconds = float(value)
+    if seconds <= 0:
+        raise ValueError("Duration must be positive")
+    return seconds
+
+
+def datetime_to_ms(dt):
+    return int(np.datetime64(dt, "ms").astype(np.int64))
+
+
+def ms_to_datetimes(ms):
+    """int64 epoch-ms array → list of naive UTC datetimes."""
+    return np.asarray(ms, dtype="int64").astype("datetime64[ms]").tolist()
+
+
+def make_grid(start_ms, end_ms, step_ms):
+    """Grid points every step_ms, snapped down to a multiple of step_ms, covering [start, end]."""
+    first = (start_ms // step_ms) * step_ms
+    return np.arange(first, end_ms + 1, step_ms, dtype=np.int64)
+
+
+# ──────────────────────────── Alignment ────────────────────────────
+def align_series(grid, ts, values, method="ffill", tolerance_ms=None):
+    """
+    Sample one series (sorted ts) at every grid point.
+
+    ffill:  last value at or before the grid point, if it is no older than tolerance.
+    linear: interpolate between the samples either side of the grid point, if both
+            are within tolerance (an exact hit just takes the sample).
+    Grid points with no usable sample are NaN.
+    """
+    out = np.full(len(grid), np.nan)
+    if len(ts) == 0:
+        return out
+    ts = np.asarray(ts, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    tol = np.iinfo(np.int64).max if tolerance_ms is None else int(tolerance_ms)
+
+    # Index of the last sample <= grid point (-1 when the grid point precedes all samples)
+    left = np.searchsorted(ts, grid, side="right") - 1
+    has_left = left >= 0
+    left_c = np.clip(left, 0, len(ts) - 1)
+    left_age = grid - ts[left_c]
+    left_ok = has_left & (left_age <= tol)
+
+    if method == "ffill":
+        out[left_ok] = values[left_c[left_ok]]
+        return out
+    if method != "linear":
+        raise ValueError(f"Unknown alignment method '{method}'")
+
+    right = left + 1
+    has_right = right < len(ts)
+    right_c = np.clip(right, 0, len(ts) - 1)
+    right_gap = ts[right_c] - grid
+    exact = left_ok & (left_age == 0)
+    both = left_ok & has_right & (right_gap <= tol) & ~exact
+
+    out[exact] = values[left_c[exact]]
+    l, r = left_c[both], right_c[both]
+    frac = (grid[both] - ts[l]) / (ts[r] - ts[l])
+    out[both] = values[l] + frac * (values[r] - values[l])
+    return out
+
+
+def align_many(grid, series, method="ffill", tolerance_ms=None):
+    """
+    Align several series onto one grid.
+
+    series is an iterable of (key, ts, values); returns (keys, matrix) where
+    matrix has shape (len(grid), len(keys)) and NaN marks missing samples.
+    """
+    keys = []
+    columns = []
+    for key, ts, values in series:
+        keys.append(key)
+        columns.append(align_series(grid, ts, values, method, tolerance_ms))
+    matrix = np.column_stack(columns) if columns else np.empty((len(grid), 0))
+    return keys, matrix
+
+
+def as_dataframe(grid, keys, matrix):
+    """Aligned matrix → pandas DataFrame indexed by UTC timestamp (pandas loaded on demand)."""
+    import pandas as pd
+
+    index = pd.to_datetime(grid, unit="ms")
+    index.name = "Timestamp"
+    return pd.DataFrame(matrix, index=index, columns=[str(k) for k in keys])
+
+
+# ──────────────────────────── Database sources ────────────────────────────
+def iter_aligned(conn, source, start, end, step_ms, keys=None, method="ffill",
+                 tolerance_ms=None, window_points=5000):
+    """
+    Yield (grid_chunk, keys, matrix_chunk) for a source over [start, end].
+
+    The grid is processed window_points at a time, and each window only fetches
+    readings from [window_start - tolerance, window_end + tolerance], so memory
+    stays bounded however long the range is. Without a tolerance it falls back to
+    one step, which is what a regular grid can meaningfully carry forward.
+    """
+    tolerance_ms = step_ms if tolerance_ms is None else tolerance_ms
+    grid = make_grid(datetime_to_ms(start), datetime_to_ms(end), step_ms)
+    keys = list(keys) if keys else fetch_keys(conn, source, start, end)
+    empty = np.empty(0, dtype=np.int64)
+
+    for offset in range(0, len(grid), window_points):
+        window = grid[offset:offset + window_points]
+        fetch_start = ms_to_datetimes([window[0] - tolerance_ms])[0]
+        fetch_end = ms_to_datetimes([window[-1] + tolerance_ms])[0]
+        fetched = fetch_series_arrays(conn, source, fetch_start, fetch_end, keys, value_dtype=np.float64)
+        series = {key: (ts, vals) for key, ts, vals in fetched}
+        _, matrix = align_many(
+            window,
+            ((key, *series.get(key, (empty, empty))) for key in keys),
+            method, tolerance_ms
+        )
+        yield window, keys, matrix
+
+
+def align_source(conn, source, start, end, step_ms, keys=None, method="ffill", tolerance_ms=None):
+    """Whole-range convenience wrapper around iter_aligned → (grid, keys, matrix)."""
+    grids, matrices = [], []
+    for grid, keys, matrix in iter_aligned(conn, source, start, end, step_ms, keys, method, tolerance_ms):
+        grids.append(grid)
+        matrices.append(matrix)
+    if not grids:
+        return np.empty(0, dtype=np.int64), list(keys or []), np.empty((0, len(keys or [])))
+    return np.concatenate(grids), keys, np.vstack(matrices)
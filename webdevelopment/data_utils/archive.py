@@ -0,0 +1,248 @@
+import argparse
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from network_utils.constants import COLD_ARCHIVE_DIR
+
+# Compressed cold storage for history past the retention horizon.
+#
+#   <root>/<source>/<series key>/<YYYY-MM-DD>.npz
+#
+# Each file holds one series for one UTC day: the first timestamp, the
+# delta-encoded timestamps (uint32 ms gaps, int64 if a gap ever overflows)
+# and float32 values, zlib-compressed by np.savez_compressed. Sensors post at a
+# steady rate, so the deltas are nearly constant and compress to almost nothing.
+# Blocks are immutable once written; archiving into an existing day merges and
+# rewrites that one file. A sample is identified by (timestamp, value): exact
+# repeats are stored once whether they arrive in one write or across several,
+# while different values logged in the same millisecond are all kept, as in
+# the database.
+
+TS_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+MS_PER_DAY = 86400000
+
+_write_lock = threading.Lock()
+
+
+# ──────────────────────────── Encoding ────────────────────────────
+def encode_block(ts_ms, values):
+    """Sorted epoch-ms + values → dict of arrays ready for np.savez_compressed."""
+    deltas = np.diff(ts_ms)
+    delta_dtype = np.uint32 if len(deltas) == 0 or deltas.max() <= np.iinfo(np.uint32).max else TS_DTYPE
+    return {
+        "t0": np.asarray(ts_ms[:1], dtype=TS_DTYPE),
+        "dt": deltas.astype(delta_dtype),
+        "values": np.asarray(values, dtype=VALUE_DTYPE),
+    }
+
+
+def decode_block(arrays):
+    if len(arrays["t0"]) == 0:
+        return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+    ts = np.empty(len(arrays["dt"]) + 1, dtype=TS_DTYPE)
+    ts[0] = arrays["t0"][0]
+    np.cumsum(arrays["dt"], dtype=TS_DTYPE, out=ts[1:])
+    ts[1:] += ts[0]
+    return ts, arrays["values"]
+
+
+def _dedup(ts, vals):
+    """Sort by (timestamp, value) and drop exact repeats; values are compared at archive precision."""
+    stored = vals.astype(VALUE_DTYPE)
+    order = np.lexsort((stored, ts))
+    ts, vals, stored = ts[order], vals[order], stored[order]
+    keep = np.ones(len(ts), dtype=bool)
+    keep[1:] = (ts[1:] != ts[:-1]) | (stored[1:] != stored[:-1])
+    return ts[keep], vals[keep]
+
+
+def _merge(ts_a, vals_a, ts_b, vals_b):
+    """Sorted union of two series under the (timestamp, value) identity rule."""
+    return _dedup(np.concatenate((ts_a, ts_b)), np.concatenate((vals_a, vals_b)))
+
+
+# ──────────────────────────── Layout ────────────────────────────
+def _day(ts_ms):
+    return datetime.utcfromtimestamp(ts_ms // 1000).strftime("%Y-%m-%d")
+
+
+def _day_start_ms(day):
+    return int((datetime.strptime(day, "%Y-%m-%d") - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _series_dir(source, key, root=None):
+    return os.path.join(root or COLD_ARCHIVE_DIR, source, str(key))
+
+
+def _days(source, key, start_ms=None, end_ms=None, root=None):
+    """[(day, path)] for the archived days of one series overlapping [start_ms, end_ms]."""
+    directory = _series_dir(source, key, root)
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".npz"):
+            continue
+        day = name[:-4]
+        day_start = _day_start_ms(day)
+        if (end_ms is None or day_start <= end_ms) and (start_ms is None or day_start + MS_PER_DAY > start_ms):
+            days.append((day, os.path.join(directory, name)))
+    return days
+
+
+def _parse_key(source, name):
+    return name if source == "weighted" else int(name)
+
+
+def archived_keys(source, start_ms=None, end_ms=None, root=None):
+    """Series keys with at least one archived day overlapping the range."""
+    directory = os.path.join(root or COLD_ARCHIVE_DIR, source)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        _parse_key(source, name) for name in os.listdir(directory)
+        if _days(source, name, start_ms, end_ms, root)
+    )
+
+
+def has_archive(source, root=None):
+    return os.path.isdir(os.path.join(root or COLD_ARCHIVE_DIR, source))
+
+
+# ──────────────────────────── Writes ────────────────────────────
+def _load(path):
+    with np.load(path) as arrays:
+        return decode_block(arrays)
+
+
+def write_series(source, key, ts_ms, values, root=None):
+    """
+    Archive one series (any time span); returns the number of day files written.
+
+    Samples are split on UTC day boundaries and merged with anything already
+    archived for that day. Files are written to a temp name and renamed, so a
+    reader never sees a half-written block.
+    """
+    ts_ms = np.asarray(ts_ms, dtype=TS_DTYPE)
+    values = np.asarray(values, dtype=VALUE_DTYPE)
+    if len(ts_ms) == 0:
+        return 0
+    order = np.argsort(ts_ms, kind="stable")
+    ts_ms, values = ts_ms[order], values[order]
+
+    directory = _series_dir(source, key, root)
+    day_ids = ts_ms // MS_PER_DAY
+    bounds = np.flatnonzero(day_ids[1:] != day_ids[:-1]) + 1
+    written = 0
+    with _write_lock:
+        os.makedirs(directory, exist_ok=True)
+        for block_ts, block_vals in zip(np.split(ts_ms, bounds), np.split(values, bounds)):
+            path = os.path.join(directory, _day(int(block_ts[0])) + ".npz")
+            if os.path.exists(path):
+                block_ts, block_vals = _merge(*_load(path), block_ts, block_vals)
+            else:
+                block_ts, block_vals = _dedup(block_ts, block_vals)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, **encode_block(block_ts, block_vals))
+            os.replace(tmp, path)
+            written += 1
+    return written
+
+
+# ──────────────────────────── Reads ────────────────────────────
+def _clip(ts, vals, start_ms, end_ms):
+    lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+    hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side="right"))
+    return ts[lo:hi], vals[lo:hi]
+
+
+def iter_range(source, key, start_ms=None, end_ms=None, root=None):
+    """(ts, values) archived for one series in [start_ms, end_ms], one day file at a time."""
+    for _, path in _days(source, key, start_ms, end_ms, root):
+        ts, vals = _clip(*_load(path), start_ms, end_ms)
+        if len(ts):
+            yield ts, vals
+
+
+def iter_days(source, keys, start_ms=None, end_ms=None, root=None):
+    """
+    Archived samples of several series one UTC day at a time, as ([key per
+    sample], ts, values) sorted by (timestamp, key); only one day is loaded at once.
+    """
+    by_day = {}
+    for key in sorted(keys):
+        for day, path in _days(source, key, start_ms, end_ms, root):
+            by_day.setdefault(day, []).append((key, path))
+    for day in sorted(by_day):
+        parts = [(key, *_clip(*_load(path), start_ms, end_ms)) for key, path in by_day[day]]
+        parts = [part for part in parts if len(part[1])]
+        if not parts:
+            continue
+        key_index = np.concatenate([np.full(len(ts), i) for i, (_, ts, _) in enumerate(parts)])
+        ts = np.concatenate([ts for _, ts, _ in parts])
+        vals = np.concatenate([vals for _, _, vals in parts])
+        order = np.lexsort((key_index, ts))
+        names = [key for key, _, _ in parts]
+        yield [names[i] for i in key_index[order].tolist()], ts[order], vals[order]
+
+
+def read_range(source, key, start_ms=None, end_ms=None, root=None):
+    """(int64 epoch-ms, float32 values) archived for one series with start_ms <= ts <= end_ms."""
+    parts = list(iter_range(source, key, start_ms, end_ms, root))
+    if not parts:
+        return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def merge_series(source, live, start_ms=None, end_ms=None, keys=None, value_dtype=VALUE_DTYPE, root=None):
+    """
+    Combine live [(key, ts, values)] with the archived samples of the same range.
+
+    Keys that only exist in the archive are included; a sample in both (a
+    crash between archiving and deleting leaves it twice) is returned once.
+    """
+    if not has_archive(source, root):
+        return live
+    live_by_key = {key: (ts, vals) for key, ts, vals in live}
+    all_keys = sorted(set(live_by_key) | set(keys or archived_keys(source, start_ms, end_ms, root)))
+    merged = []
+    for key in all_keys:
+        ts, vals = read_range(source, key, start_ms, end_ms, root)
+        if key in live_by_key:
+            if len(ts):
+                ts, vals = _merge(ts, vals.astype(value_dtype), *live_by_key[key])
+            else:
+                ts, vals = live_by_key[key]
+        if len(ts):
+            merged.append((key, ts, vals.astype(value_dtype, copy=False)))
+    return merged
+
+
+# ──────────────────────────── CLI ────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the compressed cold archive.")
+    parser.add_argument("--root", default=COLD_ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"⚠️ No archive at {args.root}")
+        return
+    for source in sorted(os.listdir(args.root)):
+        files, size, rows = 0, 0, 0
+        for key in os.listdir(os.path.join(args.root, source)):
+            for _, path in _days(source, key, root=args.root):
+                files += 1
+                size += os.path.getsize(path)
+                with np.load(path) as arrays:
+                    rows += len(arrays["values"])
+        print(f"{source:10s} {files:6d} day files  {rows:10d} rows  {size / 1024:10.1f} KB"
+              f"  ({size / max(rows, 1):.2f} B/row)")
+
+
+if __name__ == "__main__":
+    main()
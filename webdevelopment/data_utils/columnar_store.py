@@ -0,0 +1,287 @@
+import fcntl
+import os
+import threading
+
+import numpy as np
+
+from network_utils.constants import COLUMNAR_STORE_DIR
+
+# Append-only columnar storage for raw sensor samples.
+#
+#   <root>/<sensor_id>/<first_ts_ms>.ts    int64 epoch-ms, little-endian
+#   <root>/<sensor_id>/<first_ts_ms>.val   float32 values, same row order
+#   <root>/<sensor_id>/<first_ts_ms>.idx   int64 timestamp of every INDEX_STRIDE-th row
+#
+# Segments are only ever appended to, and a new one is started when the current
+# one is full or a sample arrives out of order, so every segment is sorted.
+# Reads memory-map the files and return NumPy views; a range inside a single
+# segment costs no copy at all.
+#
+# Several processes may append (Flask /receive and ingest_server.py both do when
+# SENSOR_STORAGE_BACKEND is "columnar"), so every append to a sensor happens
+# under an flock on <root>/<sensor_id>/.lock. Holding it, a writer first catches
+# up with whatever other processes appended or rolled over since its last
+# write, and only then touches the files.
+#
+# Retention removes whole segments whose newest sample is past the cutoff
+# (drop_before), under the same flock; a writer whose segment is gone starts
+# over from the files that are left.
+
+TS_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+SEGMENT_ROWS = 1 << 20          # ~12 MB per segment (8 B ts + 4 B value per row)
+INDEX_STRIDE = 4096             # One sparse index entry per 4096 rows (~one ts page)
+LOCK_NAME = ".lock"
+
+
+class _Segment:
+    def __init__(self, base):
+        self.base = base
+        self.first_ts = int(os.path.basename(base))
+
+    @property
+    def rows(self):
+        path = self.base + ".ts"
+        return os.path.getsize(path) // TS_DTYPE.itemsize if os.path.exists(path) else 0
+
+    def _map(self, suffix, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.base + suffix, dtype=dtype, mode="r", shape=(rows,))
+
+    def last_ts(self):
+        rows = self.rows
+        return int(self._map(".ts", TS_DTYPE, rows)[-1]) if rows else None
+
+    def read(self, start_ms, end_ms):
+        """Views of the rows with start_ms <= ts <= end_ms."""
+        rows = self.rows
+        ts = self._map(".ts", TS_DTYPE, rows)
+        if rows == 0 or ts[0] > end_ms or ts[-1] < start_ms:
+            return ts[:0], self._map(".val", VALUE_DTYPE, rows)[:0]
+
+        # Narrow the binary search to the index blocks that can hold the range,
+        # so only a couple of pages of the ts column are touched.
+        idx_rows = os.path.getsize(self.base + ".idx") // TS_DTYPE.itemsize
+        index = self._map(".idx", TS_DTYPE, idx_rows)
+        lo_block = max(int(np.searchsorted(index, start_ms, side="left")) - 1, 0)
+        hi_block = int(np.searchsorted(index, end_ms, side="right"))
+        lo = lo_block * INDEX_STRIDE
+        hi = min(hi_block * INDEX_STRIDE, rows)
+
+        window = ts[lo:hi]
+        first = lo + int(np.searchsorted(window, start_ms, side="left"))
+        last = lo + int(np.searchsorted(window, end_ms, side="right"))
+        vals = self._map(".val", VALUE_DTYPE, rows)
+        return ts[first:last], vals[first:last]
+
+
+class _Writer:
+    """Open append handles for a sensor's active segment. Only used under the sensor's flock."""
+
+    def __init__(self, segment, last_ts, rows):
+        self.segment = segment
+        self.last_ts = last_ts
+        self.rows = rows
+        if rows:
+            # .ts is written last, so it defines the row count; drop any half-written tail
+            # (left by a crash; nobody else can be mid-append while we hold the flock)
+            os.truncate(segment.base + ".val", rows * VALUE_DTYPE.itemsize)
+            os.truncate(segment.base + ".idx", -(-rows // INDEX_STRIDE) * TS_DTYPE.itemsize)
+        self.files = {suffix: open(segment.base + suffix, "ab") for suffix in (".ts", ".val", ".idx")}
+
+    def accepts(self, ts_ms):
+        return self.rows < SEGMENT_ROWS and (self.last_ts is None or ts_ms >= self.last_ts)
+
+    def refresh(self):
+        """Pick up rows appended to this segment by other processes."""
+        rows = os.fstat(self.files[".ts"].fileno()).st_size // TS_DTYPE.itemsize
+        if rows != self.rows:
+            self.rows = rows
+            self.last_ts = self.segment.last_ts()
+
+    def write(self, ts_ms, value):
+        if self.rows % INDEX_STRIDE == 0:
+            self.files[".idx"].write(np.array([ts_ms], dtype=TS_DTYPE).tobytes())
+        self.files[".val"].write(np.array([value], dtype=VALUE_DTYPE).tobytes())
+        self.files[".ts"].write(np.array([ts_ms], dtype=TS_DTYPE).tobytes())
+        for f in self.files.values():
+            f.flush()
+        self.last_ts = ts_ms
+        self.rows += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class ColumnarStore:
+    """
+    Per-sensor segment files. Threads are serialised by a lock and processes by
+    a per-sensor flock, so any number of processes may append to the same root.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._writers = {}      # sensor_id → _Writer for the active segment
+        self._lock_files = {}   # sensor_id → open lock file for that sensor's directory
+
+    # ──────────────────────────── Layout ────────────────────────────
+    def _sensor_dir(self, sensor_id):
+        return os.path.join(self.root, str(sensor_id))
+
+    def _segments(self, sensor_id):
+        directory = self._sensor_dir(sensor_id)
+        if not os.path.isdir(directory):
+            return []
+        bases = {os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith(".ts")}
+        return [_Segment(os.path.join(directory, base)) for base in sorted(bases, key=int)]
+
+    def sensor_ids(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+
+    # ──────────────────────────── Writes ────────────────────────────
+    def _new_segment(self, sensor_id, ts_ms):
+        directory = self._sensor_dir(sensor_id)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, str(ts_ms))
+        while os.path.exists(base + ".ts"):     # Same first timestamp as an older segment
+            ts_ms += 1
+            base = os.path.join(directory, str(ts_ms))
+        return _Segment(base)
+
+    def _lock_file(self, sensor_id):
+        lock_file = self._lock_files.get(sensor_id)
+        if lock_file is None:
+            directory = self._sensor_dir(sensor_id)
+            os.makedirs(directory, exist_ok=True)
+            lock_file = self._lock_files[sensor_id] = open(os.path.join(directory, LOCK_NAME), "a")
+        return lock_file
+
+    def _writer(self, sensor_id, ts_ms):
+        """The writer for ts_ms, in sync with the files on disk. Call with the sensor's flock held."""
+        writer = self._writers.get(sensor_id)
+        if writer is not None and not os.path.exists(writer.segment.base + ".ts"):
+            writer.close()              # Dropped by retention
+            writer = None
+        if writer is not None:
+            writer.refresh()
+        if writer is None or not writer.accepts(ts_ms):
+            # Try the newest segment first: another process may have started one that fits
+            segments = self._segments(sensor_id)
+            if segments and (writer is None or writer.segment.base != segments[-1].base):
+                if writer is not None:
+                    writer.close()
+                segment = segments[-1]
+                writer = _Writer(segment, segment.last_ts(), segment.rows)
+
+        # Roll over when full or when the sample would break the segment's ordering
+        if writer is None or not writer.accepts(ts_ms):
+            if writer is not None:
+                writer.close()
+            writer = _Writer(self._new_segment(sensor_id, ts_ms), None, 0)
+        self._writers[sensor_id] = writer
+        return writer
+
+    def append(self, sensor_id, timestamp, value):
+        """Append one sample; timestamp may be a datetime or epoch-ms int."""
+        ts_ms = timestamp if isinstance(timestamp, int) else int(np.datetime64(timestamp, "ms").astype(np.int64))
+        with self._lock:
+            lock_file = self._lock_file(sensor_id)
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._writer(sensor_id, ts_ms).write(ts_ms, value)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _expired(self, sensor_id, cutoff_ms):
+        for segment in self._segments(sensor_id):
+            last_ts = segment.last_ts()
+            if segment.first_ts < cutoff_ms and (last_ts is None or last_ts < cutoff_ms):
+                yield segment
+
+    def expired_rows(self, sensor_id, cutoff_ms):
+        """How many rows drop_before(sensor_id, cutoff_ms) would delete."""
+        return sum(segment.rows for segment in self._expired(sensor_id, cutoff_ms))
+
+    def drop_before(self, sensor_id, cutoff_ms, before_drop=None):
+        """
+        Delete the sensor's segments whose samples are all older than cutoff_ms;
+        returns the number of rows removed. before_drop(ts, values) is called with
+        each segment's rows first (e.g. to archive them); if it raises, that segment is kept.
+        """
+        with self._lock:
+            lock_file = self._lock_file(sensor_id)
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                dropped = 0
+                for segment in self._expired(sensor_id, cutoff_ms):
+                    rows = segment.rows
+                    if before_drop is not None and rows:
+                        before_drop(segment._map(".ts", TS_DTYPE, rows), segment._map(".val", VALUE_DTYPE, rows))
+                    writer = self._writers.get(sensor_id)
+                    if writer is not None and writer.segment.base == segment.base:
+                        writer.close()
+                        del self._writers[sensor_id]
+                    for suffix in (".ts", ".val", ".idx"):      # .ts first: it's what lists the segment
+                        if os.path.exists(segment.base + suffix):
+                            os.remove(segment.base + suffix)
+                    dropped += rows
+                return dropped
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+            for lock_file in self._lock_files.values():
+                lock_file.close()
+            self._lock_files.clear()
+
+    # ──────────────────────────── Reads ────────────────────────────
+    def read_range(self, sensor_id, start_ms=None, end_ms=None):
+        """
+        (int64 ts, float32 values) for start_ms <= ts <= end_ms.
+
+        A range that falls inside one segment comes back as read-only views
+        on the memory-mapped files; spanning segments concatenates them.
+        """
+        start_ms = np.iinfo(np.int64).min if start_ms is None else int(start_ms)
+        end_ms = np.iinfo(np.int64).max if end_ms is None else int(end_ms)
+
+        parts = []
+        for segment in self._segments(sensor_id):
+            if segment.first_ts > end_ms:
+                break               # Segments are sorted by first timestamp
+            ts, vals = segment.read(start_ms, end_ms)
+            if len(ts):
+                parts.append((ts, vals))
+
+        if not parts:
+            return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        ts = np.concatenate([p[0] for p in parts])
+        vals = np.concatenate([p[1] for p in parts])
+        if np.any(ts[1:] < ts[:-1]):     # Segments opened by out-of-order samples overlap
+            order = np.argsort(ts, kind="stable")
+            ts, vals = ts[order], vals[order]
+        return ts, vals
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(root=None):
+    """Process-wide store rooted at COLUMNAR_STORE_DIR (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ColumnarStore(root or COLUMNAR_STORE_DIR)
+        return _store
@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import DateTime, event
+
+from database_setup import engine, SessionLocal, Base
+from network_utils.constants import DB_WRITER_MODE, DB_WRITER_SOCKET
+from data_utils.partitions import partitioning_enabled, insert_rows
+
+# Single-writer mode for multi-process deployments.
+#
+# With DB_WRITER_MODE = "service", one process runs WriterService and is the
+# only one that writes time-series rows. Every other worker queues its rows
+# on the session (add_series_row). When the session commits, they are sent
+# over a Unix socket. The service commits whatever requests from all workers
+# are waiting in one transaction, so throughput grows with batching instead of
+# collapsing under SQLite's file lock.
+# Reads stay direct.
+#
+# Every request carries a unique id and the service remembers the outcome of
+# the last RECENT_IDS of them, so a client that lost an ack can resend the
+# same request without its rows being written twice. If a group commit fails,
+# its requests are retried one transaction each, so one bad row only fails
+# the request it came in.
+#
+# Wire format: 4-byte big-endian length + JSON
+#   request  {"id": "<uuid hex>", "rows": {table: [row, ...]}, "ack": true}
+#   response {"id": "<uuid hex>", "ok": true, "error": null}          (only when ack)
+
+BATCH_WAIT_SECONDS = 0          # Extra time to gather requests before committing (0 = group commit only)
+BATCH_MAX_ROWS = 5000           # Commit early once this many rows are waiting
+CONNECT_TIMEOUT_SECONDS = 2
+ACK_TIMEOUT_SECONDS = 10
+RECENT_IDS = 10000              # Request outcomes remembered for deduplicating resends
+
+WRITABLE_TABLES = ("sensor_data", "kalman_filter_fusion", "weighted_average_fusion")
+_header = struct.Struct(">I")
+
+
+def writer_service_enabled():
+    return DB_WRITER_MODE == "service"
+
+
+# ──────────────────────────── Framing ────────────────────────────
+def _send(sock, message):
+    body = json.dumps(message, default=_encode_value).encode()
+    sock.sendall(_header.pack(len(body)) + body)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Writer socket closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock):
+    (length,) = _header.unpack(_recv_exact(sock, _header.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot send {type(value).__name__} to the writer")
+
+
+def _decode_rows(table_name, rows):
+    """ISO strings back to datetimes for the table's DateTime columns."""
+    table = Base.metadata.tables[table_name]
+    date_columns = [c.name for c in table.columns if isinstance(c.type, DateTime)]
+    for row in rows:
+        for name in date_columns:
+            if isinstance(row.get(name), str):
+                row[name] = datetime.fromisoformat(row[name])
+    return rows
+
+
+# ──────────────────────────── Writing ────────────────────────────
+def write_batch(rows_by_table):
+    """Insert {table: [row dicts]} in one transaction (or route them to their partitions)."""
+    if partitioning_enabled():
+        for table_name, rows in rows_by_table.items():
+            insert_rows(table_name, rows)
+        return
+    with engine.begin() as conn:
+        for table_name, rows in rows_by_table.items():
+            conn.execute(Base.metadata.tables[table_name].insert(), rows)
+
+
+class WriterService:
+    """Owns the database writes; accepts batches from any number of worker processes."""
+
+    def __init__(self, path=DB_WRITER_SOCKET):
+        self.path = path
+        self.requests = queue.Queue()
+        self.outcomes = OrderedDict()   # request id -> error (None when committed), most recent last
+        self.stats = {"requests": 0, "rows": 0, "commits": 0, "duplicates": 0, "failed": 0}
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        threading.Thread(target=self._write_loop, name="db-writer", daemon=True).start()
+        print(f"[INFO] DB writer listening on {self.path}")
+        while True:
+            client, _ = server.accept()
+            threading.Thread(target=self._read_loop, args=(client,), daemon=True).start()
+
+    def _read_loop(self, client):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                message = _recv(client)
+                if not isinstance(message, dict) or "id" not in message or not isinstance(message.get("rows"), dict):
+                    raise ValueError("Malformed writer request")
+                self.requests.put((client, send_lock, message))
+        except (ConnectionError, OSError, ValueError):
+            client.close()
+
+    def _next_batch(self):
+        """
+        Group commit: take everything already queued. Requests that arrive while
+        a batch is being written form the next one, so batches grow with load.
+        """
+        batch = [self.requests.get()]
+        rows = sum(len(r) for r in batch[0][2]["rows"].values())
+        deadline = time.monotonic() + BATCH_WAIT_SECONDS
+        while rows < BATCH_MAX_ROWS:
+            try:
+                item = self.requests.get(timeout=max(deadline - time.monotonic(), 0)) \
+                    if BATCH_WAIT_SECONDS else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += sum(len(r) for r in item[2]["rows"].values())
+        return batch, rows
+
+    def _commit(self, messages):
+        """
+        Write `messages` in one transaction; if that fails, write each in its own
+        so only the offending request fails. Returns {request id: error or None}.
+        """
+        merged = {}
+        for message in messages:
+            for table_name, table_rows in message["rows"].items():
+                merged.setdefault(table_name, []).extend(table_rows)
+        try:
+            write_batch(merged)
+            self.stats["commits"] += 1
+            return {message["id"]: None for message in messages}
+        except Exception as e:
+            if len(messages) == 1:
+                print(f"[ERROR] DB writer request {messages[0]['id']} failed: {e}")
+                return {messages[0]["id"]: str(e)}
+            print(f"[WARNING] Group commit of {len(messages)} requests failed ({e}); writing them one by one.")
+        outcomes = {}
+        for message in messages:
+            outcomes.update(self._commit([message]))
+        return outcomes
+
+    def _write_loop(self):
+        while True:
+            batch, _ = self._next_batch()
+            fresh, outcomes = {}, {}
+            for _, _, message in batch:
+                if message["id"] in self.outcomes or message["id"] in fresh or message["id"] in outcomes:
+                    self.stats["duplicates"] += 1
+                    continue
+                try:
+                    message["rows"] = {
+                        table_name: _decode_rows(table_name, table_rows)
+                        for table_name, table_rows in message["rows"].items() if table_name in WRITABLE_TABLES
+                    }
+                    fresh[message["id"]] = message
+                except (AttributeError, TypeError, ValueError) as e:
+                    outcomes[message["id"]] = f"Malformed rows: {e}"
+
+            if fresh:
+                outcomes.update(self._commit(list(fresh.values())))
+            for request_id, error in outcomes.items():
+                self.outcomes[request_id] = error
+                if error is None:
+                    self.stats["requests"] += 1
+                    self.stats["rows"] += sum(len(r) for r in fresh[request_id]["rows"].values())
+                else:
+                    self.stats["failed"] += 1
+            while len(self.outcomes) > RECENT_IDS:
+                self.outcomes.popitem(last=False)
+
+            for client, send_lock, message in batch:
+                if message.get("ack"):
+                    error = self.outcomes.get(message["id"])
+                    try:
+                        with send_lock:
+                            _send(client, {"id": message["id"], "ok": error is None, "error": error})
+                    except OSError:
+                        pass
+
+
+# ──────────────────────────── Client ────────────────────────────
+class WriterUnavailable(ConnectionError):
+    """The request never reached the writer service, so nothing from it was written."""
+
+
+class WriterClient:
+    """Per-thread connection to the writer service."""
+
+    def __init__(self, path=DB_WRITER_SOCKET):
+        self.path = path
+        self._local = threading.local()
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+            sock.connect(self.path)
+            sock.settimeout(ACK_TIMEOUT_SECONDS)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def submit(self, rows_by_table, wait=True):
+        """
+        Send {table: [rows]}; with wait=True, block until the service has committed them.
+
+        Raises WriterUnavailable when the request was never delivered. Once it
+        has been sent, a lost ack is retried with the same id (the service acks
+        a duplicate without writing it again); if that fails too, ConnectionError
+        is raised and whether the rows were stored is unknown.
+        """
+        message = {"id": uuid.uuid4().hex, "rows": rows_by_table, "ack": wait}
+        sent = False
+        for attempt in (1, 2):              # One reconnect, e.g. after the service restarted
+            try:
+                sock = self._socket()
+                _send(sock, message)
+                sent = True
+                if not wait:
+                    return
+                reply = _recv(sock)
+            except (ConnectionError, OSError) as e:
+                self._reset()
+                if attempt == 2:
+                    if sent:
+                        raise ConnectionError(f"No ack from DB writer at {self.path} for request {message['id']}: {e}")
+                    raise WriterUnavailable(f"DB writer unreachable at {self.path}: {e}")
+                continue
+            if not reply["ok"]:
+                raise RuntimeError(f"DB writer rejected batch: {reply['error']}")
+            return
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = WriterClient()
+    return _client
+
+
+# ──────────────────────────── Session integration ────────────────────────────
+def add_series_row(session, table_name, row):
+    """
+    Add one time-series row as part of `session`'s unit of work.
+
+    service mode: queued on the session and sent to the writer when it commits.
+    partitioned:  queued on the session and written to its partition file when it commits.
+    otherwise:    inserted through the session's own transaction.
+
+    Queued rows are dropped by a rollback, so every mode rolls back the same way.
+    """
+    if writer_service_enabled() or partitioning_enabled():
+        if not session.in_transaction():
+            session.connection()            # Begin one now, or a rollback() before any query would go unnoticed
+        session.info.setdefault("writer_rows", {}).setdefault(table_name, []).append(row)
+    else:
+        session.execute(Base.metadata.tables[table_name].insert().values(**row))
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _flush_writer_rows(session):
+    rows = session.info.pop("writer_rows", None)
+    if not rows:
+        return
+    if not writer_service_enabled():
+        write_batch(rows)                   # Partition files, just before the main database commits
+        return
+    try:
+        get_client().submit(rows, wait=True)
+    except WriterUnavailable as e:
+        # Nothing was delivered, so writing here can't duplicate: better a contended write than a lost reading.
+        # Any other failure leaves the outcome unknown and fails the commit instead.
+        print(f"[WARNING] {e}; writing {sum(len(r) for r in rows.values())} rows directly.")
+        write_batch(rows)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _drop_writer_rows(session, previous_transaction):
+    session.info.pop("writer_rows", None)
+
+
+# ──────────────────────────── CLI ────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the single DB writer process for multi-worker deployments.")
+    parser.add_argument("--socket", default=DB_WRITER_SOCKET)
+    args = parser.parse_args(argv)
+    WriterService(args.socket).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import json
+import os
+import re
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request, url_for
+from sqlalchemy import exists, func, insert, literal, select, update
+
+from database_setup import SessionLocal, PlantDetection
+
+# Index of YOLO results (plant_detections). Each classified image gets one row
+# with the class the cycle acted on and every box as JSON, so /results and the
+# JSON API page through an indexed table instead of listing ./static/predictions,
+# and outcomes can be summed per cycle. When an output folder is cleared the
+# rows stay as history; only their ImagePath is dropped. Images saved before the
+# table existed are indexed once by backfill_detections, with an unknown class.
+
+STATIC_DIR = './static'
+DEFAULT_PER_PAGE = 24
+MAX_PER_PAGE = 200
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+BACKFILL_CLASS = "Unknown"
+BACKFILL_CYCLE_ID = "backfill"
+_SAVED_NAME = re.compile(r"_(\d{9,11})(?:_stop(\d+))?\.\w+$")     # prediction_<epoch>[_stop<n>].jpg
+
+detections_bp = Blueprint('detections', __name__)
+
+
+def new_cycle_id(prefix="cycle"):
+    return f"{prefix}-{datetime.utcnow():%Y%m%d-%H%M%S}"
+
+
+def static_relative(path):
+    """'./static/predictions/x.jpg' → 'predictions/x.jpg' (what url_for('static') takes); other paths as-is."""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(STATIC_DIR))
+    return path if relative.startswith('..') else relative.replace(os.sep, '/')
+
+
+# ──────────────────────────── Writes ────────────────────────────
+def detection_row(image_path, class_name, confidence, boxes, stop_number=None, cycle_id=None, detected_at=None):
+    """Row dict for plant_detections; `boxes` is a list of {"class", "confidence", "box"} dicts."""
+    return {
+        "CycleID": cycle_id,
+        "StopNumber": stop_number,
+        "ImagePath": static_relative(image_path) if image_path else None,
+        "ClassName": class_name,
+        "Confidence": float(confidence or 0),
+        "BoxCount": len(boxes),
+        "Boxes": json.dumps(boxes),
+        "DetectedAt": detected_at or datetime.utcnow(),
+    }
+
+
+def record_detections(rows):
+    """Insert detection rows in one transaction. Failures are logged, never raised into inference."""
+    if not rows:
+        return
+    try:
+        with SessionLocal() as session:
+            session.execute(PlantDetection.__table__.insert(), rows)
+            session.commit()
+    except Exception as e:
+        print(f"[ERROR] Failed to record {len(rows)} detection(s): {e}")
+
+
+def _path_prefix_like(directory):
+    prefix = static_relative(directory).rstrip('/') + '/'
+    return PlantDetection.ImagePath.like(prefix.replace('%', r'\%') + '%', escape='\\')
+
+
+def backfill_detections(directory):
+    """
+    Add a row for every image in `directory` that has none (saved before
+    plant_detections existed), so the gallery keeps listing it. The class is
+    unknown; time and stop come from the file name, else from its mtime.
+    Each insert is skipped if the path got a row meanwhile, so concurrent
+    workers can't add it twice. Returns the number of rows added.
+    """
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+    except FileNotFoundError:
+        return 0
+    table = PlantDetection.__table__
+    added = 0
+    try:
+        with SessionLocal() as session:
+            known = set(session.scalars(select(PlantDetection.ImagePath).where(_path_prefix_like(directory))))
+            for name in names:
+                path = os.path.join(directory, name)
+                if static_relative(path) in known:
+                    continue
+                match = _SAVED_NAME.search(name)
+                try:
+                    saved_at = int(match.group(1)) if match else os.path.getmtime(path)
+                    row = detection_row(path, BACKFILL_CLASS, 0, [],
+                                        stop_number=int(match.group(2)) if match and match.group(2) else None,
+                                        cycle_id=BACKFILL_CYCLE_ID, detected_at=datetime.utcfromtimestamp(saved_at))
+                except (OSError, ValueError, OverflowError):
+                    continue
+                added += session.execute(
+                    insert(table).from_select(
+                        list(row), select(*[literal(value) for value in row.values()])
+                        .where(~exists().where(table.c.ImagePath == row["ImagePath"]))
+                    )
+                ).rowcount
+            session.commit()
+    except Exception as e:
+        print(f"[ERROR] Failed to backfill detections for {directory}: {e}")
+        return 0
+    if added:
+        print(f"[INFO] Indexed {added} existing image(s) from {directory} in plant_detections.")
+    return added
+
+
+def forget_images_under(directory):
+    """Drop ImagePath for rows whose file lived in `directory` (called after the folder is cleared)."""
+    try:
+        with SessionLocal() as session:
+            session.execute(
+                update(PlantDetection)
+                .where(_path_prefix_like(directory))
+                .values(ImagePath=None)
+            )
+            session.commit()
+    except Exception as e:
+        print(f"[ERROR] Failed to unlink detections under {directory}: {e}")
+
+
+# ──────────────────────────── Queries ────────────────────────────
+def detection_dict(row):
+    return {
+        "id": row.DetectionID,
+        "cycle_id": row.CycleID,
+        "stop": row.StopNumber,
+        "image": row.ImagePath,
+        "image_url": url_for('static', filename=row.ImagePath) if row.ImagePath else None,
+        "class_name": row.ClassName,
+        "confidence": round(row.Confidence, 4),
+        "box_count": row.BoxCount,
+        "boxes": json.loads(row.Boxes),
+        "detected_at": row.DetectedAt.isoformat(),
+    }
+
+
+def query_detections(session, page=1, per_page=DEFAULT_PER_PAGE, cycle_id=None, class_name=None,
+                     with_image=False):
+    """(rows, total) for one page of detections, newest first."""
+    conditions = []
+    if cycle_id:
+        conditions.append(PlantDetection.CycleID == cycle_id)
+    if class_name:
+        conditions.append(PlantDetection.ClassName == class_name)
+    if with_image:
+        conditions.append(PlantDetection.ImagePath.isnot(None))
+
+    total = session.scalar(select(func.count()).select_from(PlantDetection).where(*conditions))
+    rows = session.scalars(
+        select(PlantDetection)
+        .where(*conditions)
+        .order_by(PlantDetection.DetectedAt.desc(), PlantDetection.DetectionID.desc())
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+    return rows, total
+
+
+def cycle_summaries(session, limit=20):
+    """Per-cycle totals for the most recent cycles: images, per-class counts, mean confidence, time span."""
+    recent = (
+        select(PlantDetection.CycleID, func.max(PlantDetection.DetectedAt).label("last"))
+        .where(PlantDetection.CycleID.isnot(None))
+        .group_by(PlantDetection.CycleID)
+        .order_by(func.max(PlantDetection.DetectedAt).desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = session.execute(
+        select(
+            PlantDetection.CycleID, PlantDetection.ClassName, func.count(),
+            func.avg(PlantDetection.Confidence), func.min(PlantDetection.DetectedAt), func.max(PlantDetection.DetectedAt),
+        )
+        .join(recent, recent.c.CycleID == PlantDetection.CycleID)
+        .group_by(PlantDetection.CycleID, PlantDetection.ClassName)
+        .order_by(recent.c.last.desc())
+    ).all()
+
+    cycles = {}
+    for cycle_id, class_name, count, avg_conf, first, last in rows:
+        cycle = cycles.setdefault(cycle_id, {
+            "cycle_id": cycle_id, "images": 0, "classes": {}, "started_at": first, "finished_at": last,
+        })
+        cycle["images"] += count
+        cycle["classes"][class_name] = {"count": count, "avg_confidence": round(avg_conf or 0, 4)}
+        cycle["started_at"] = min(cycle["started_at"], first)
+        cycle["finished_at"] = max(cycle["finished_at"], last)
+    for cycle in cycles.values():
+        cycle["started_at"] = cycle["started_at"].isoformat()
+        cycle["finished_at"] = cycle["finished_at"].isoformat()
+    return list(cycles.values())
+
+
+def parse_page_args(args, default_per_page=DEFAULT_PER_PAGE):
+    """(page, per_page) from request args, clamped to sane bounds."""
+    try:
+        page = max(1, int(args.get("page", 1)))
+        per_page = min(MAX_PER_PAGE, max(1, int(args.get("per_page", default_per_page))))
+    except ValueError:
+        page, per_page = 1, default_per_page
+    return page, per_page
+
+
+# ──────────────────────────── API ────────────────────────────
+@detections_bp.route("/api/detections")
+def list_detections():
+    page, per_page = parse_page_args(request.args)
+    with SessionLocal() as session:
+        rows, total = query_detections(
+            session, page, per_page,
+            cycle_id=request.args.get("cycle_id"), class_name=request.args.get("class_name"),
+        )
+        items = [detection_dict(row) for row in rows]
+    return jsonify({"items": items, "page": page, "per_page": per_page, "total": total,
+                    "pages": (total + per_page - 1) // per_page})
+
+
+@detections_bp.route("/api/detections/cycles")
+def list_cycles():
+    try:
+        limit = min(200, max(1, int(request.args.get("limit", 20))))
+    except ValueError:
+        limit = 20
+    with SessionLocal() as session:
+        return jsonify(cycle_summaries(session, limit))
@@ -0,0 +1,129 @@
+import gzip
+import json
+import struct
+
+import numpy as np
+from flask import Response
+
+try:
+    import brotli  # Optional: only used when the client accepts "br"
+except ImportError:
+    brotli = None
+
+# ──────────────────────────── Formats ────────────────────────────
+FORMAT_JSON = "json"            # Legacy: ISO timestamps, one list per field
+FORMAT_COLUMNAR = "columnar"    # Epoch-ms integers + float32 values as JSON arrays
+FORMAT_BINARY = "binary"        # Packed little-endian typed arrays (see encode_binary)
+SUPPORTED_FORMATS = (FORMAT_JSON, FORMAT_COLUMNAR, FORMAT_BINARY)
+
+BINARY_MAGIC = b"GHC1"
+BINARY_MIMETYPE = "application/vnd.greenhouse.columnar"
+JSON_VALUE_DECIMALS = 3         # float32 → JSON without the float64 noise digits
+MIN_COMPRESS_BYTES = 1024       # Smaller bodies are not worth the CPU
+
+
+# ──────────────────────────── Encoders ────────────────────────────
+def columnar_series(columns, **meta):
+    """JSON-ready dict for one series; extra keyword args become metadata fields."""
+    ts_ms, vals = columns
+    series = dict(meta)
+    series["timestamps"] = ts_ms.tolist()
+    series["values"] = np.round(vals.astype(np.float64), JSON_VALUE_DECIMALS).tolist()
+    return series
+
+
+def encode_binary(sections):
+    """
+    Pack {section: [(meta_dict, ts_ms, values), ...]} into one binary blob.
+
+    Layout (little-endian):
+        4 bytes   magic "GHC1"
+        uint32    header length N
+        N bytes   UTF-8 JSON header, padded with spaces to a multiple of 8
+        ...       for each series: int64[count] timestamps, float32[count] values
+
+    The header maps each section to a list of series metadata with "count",
+    "ts_offset" and "value_offset" (byte offsets from the start of the blob),
+    so a browser can wrap the payload in BigInt64Array/Float32Array views
+    without copying.
+    """
+    header = {}
+    blocks = []
+    for section, series_list in sections.items():
+        header[section] = []
+        for meta, ts_ms, vals in series_list:
+            entry = dict(meta)
+            entry["count"] = int(len(ts_ms))
+            header[section].append(entry)
+            blocks.append((entry, np.ascontiguousarray(ts_ms, dtype="<i8"),
+                           np.ascontiguousarray(vals, dtype="<f4")))
+
+    # Offsets depend on the header size, which depends on the offsets' digits;
+    # iterate until the padded header length stops changing.
+    header_len = 0
+    while True:
+        offset = 8 + header_len
+        for entry, ts_ms, vals in blocks:
+            entry["ts_offset"] = offset
+            offset += ts_ms.nbytes
+            entry["value_offset"] = offset
+            offset += vals.nbytes
+            offset += -offset % 8   # keep the next int64 block aligned
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        padded_len = len(header_bytes) + (-len(header_bytes) % 8)
+        if padded_len == header_len:
+            break
+        header_len = padded_len
+
+    parts = [BINARY_MAGIC, struct.pack("<I", header_len), header_bytes.ljust(header_len, b" ")]
+    for _, ts_ms, vals in blocks:
+        parts.append(ts_ms.tobytes())
+        parts.append(vals.tobytes())
+        pad = -(ts_ms.nbytes + vals.nbytes) % 8
+        if pad:
+            parts.append(b"\0" * pad)
+    return b"".join(parts)
+
+
+# ──────────────────────────── Content-Encoding ────────────────────────────
+def negotiate_encoding(accept_encoding):
+    """Pick "br", "gzip" or None from an Accept-Encoding header value."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def build_response(body, mimetype, accept_encoding):
+    """Wrap an encoded body in a Flask response, compressing it when the client allows."""
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    response = Response(compress_body(body, encoding), mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import io
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from database_setup import engine
+from data_utils.queries import SOURCES, fetch_keys, iter_series_chunks
+from data_utils.alignment import METHODS, parse_duration, iter_aligned, ms_to_datetimes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional; CSV always works
+    pa = None
+    pq = None
+
+export_bp = Blueprint('export', __name__)
+
+EXPORT_FORMATS = ("csv", "parquet")
+CHUNK_SIZE = 5000               # Rows fetched per cursor batch / rows per output chunk
+DEFAULT_WINDOW = timedelta(hours=24)
+
+
+def parse_keys(source, raw_keys):
+    """Turn "2001,2003" into [2001, 2003] (or sensor type strings for "weighted")."""
+    if not raw_keys:
+        return None
+    keys = [k.strip() for k in raw_keys.split(",") if k.strip()]
+    return keys if source == "weighted" else [int(k) for k in keys]
+
+
+def iter_rows(conn, source, start, end, keys, chunk_size=CHUNK_SIZE):
+    """Stream (key, timestamp, value) rows in time order using a server-side cursor."""
+    for chunk in iter_series_chunks(conn, source, chunk_size, start=start, end=end,
+                                    keys=keys, epoch=False, order_by="time"):
+        yield from chunk
+
+
+def iter_pivoted(rows, keys):
+    """
+    Pivot time-ordered (key, timestamp, value) rows into (timestamp, [value per key]).
+
+    Equivalent to pivot_table(index="Timestamp", aggfunc="first") but holds only
+    the row currently being assembled in memory.
+    """
+    position = {key: i for i, key in enumerate(keys)}
+    current_ts, current = None, None
+    for key, timestamp, value in rows:
+        if timestamp != current_ts:
+            if current_ts is not None:
+                yield current_ts, current
+            current_ts, current = timestamp, [None] * len(keys)
+        i = position.get(key)
+        if i is not None and current[i] is None:
+            current[i] = value
+    if current_ts is not None:
+        yield current_ts, current
+
+
+def iter_aligned_rows(conn, source, start, end, keys, step_ms, method="ffill",
+                      tolerance_ms=None, chunk_size=CHUNK_SIZE):
+    """Same (timestamp, [value per key]) rows as iter_pivoted, but on a regular time grid."""
+    for grid, _, matrix in iter_aligned(conn, source, start, end, step_ms, keys, method,
+                                        tolerance_ms, window_points=chunk_size):
+        for timestamp, values in zip(ms_to_datetimes(grid), matrix.tolist()):
+            yield timestamp, [None if v != v else v for v in values]   # NaN → empty cell
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ──────────────────────────── Writers ────────────────────────────
+def stream_csv(pivoted, keys, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Timestamp", *keys])
+    for batch in _batched(pivoted, chunk_size):
+        for timestamp, values in batch:
+            writer.writerow([timestamp.isoformat(sep=" "), *("" if v is None else v for v in values)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands Parquet bytes back to the generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(pivoted, keys, chunk_size=CHUNK_SIZE):
+    """Write one Parquet row group per chunk, yielding bytes as each group is flushed."""
+    if pq is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow).")
+
+    schema = pa.schema([("Timestamp", pa.timestamp("ms"))] + [(str(k), pa.float32()) for k in keys])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in _batched(pivoted, chunk_size):
+            stamps = [timestamp for timestamp, _ in batch]
+            arrays = [pa.array(stamps, type=pa.timestamp("ms"))]
+            for i in range(len(keys)):
+                arrays.append(pa.array([values[i] for _, values in batch], type=pa.float32()))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+WRITERS = {"csv": stream_csv, "parquet": stream_parquet}
+
+
+def generate_export(source, start, end, keys=None, fmt="csv", chunk_size=CHUNK_SIZE,
+                    step_ms=None, method="ffill", tolerance_ms=None):
+    """
+    Yield the pivoted export as bytes/str chunks; memory stays bounded by chunk_size.
+
+    With step_ms the series are aligned onto a common grid (see data_utils.alignment)
+    instead of being pivoted on exact timestamps.
+    """
+    with engine.connect() as conn:
+        if not keys:
+            keys = fetch_keys(conn, source, start, end)
+        if step_ms:
+            pivoted = iter_aligned_rows(conn, source, start, end, keys, step_ms, method, tolerance_ms, chunk_size)
+        else:
+            pivoted = iter_pivoted(iter_rows(conn, source, start, end, keys, chunk_size), keys)
+        for chunk in WRITERS[fmt](pivoted, keys, chunk_size):
+            yield chunk
+
+
+# ──────────────────────────── Endpoint ────────────────────────────
+def _parse_alignment(grid, method, tolerance):
+    """Keyword arguments for generate_export's grid alignment ({} when no grid is requested)."""
+    if not grid:
+        return {}
+    method = method or "ffill"
+    if method not in METHODS:
+        raise ValueError(f"Unknown alignment method '{method}'")
+    return {
+        "step_ms": int(parse_duration(grid) * 1000),
+        "method": method,
+        "tolerance_ms": int(parse_duration(tolerance) * 1000) if tolerance else None
+    }
+
+
+@export_bp.route("/api/export")
+def export_data():
+    """
+    GET /api/export?source=kalman&start=2025-07-01T00:00&end=2025-07-02T00:00&sensors=2001,2003&format=csv
+
+    Optional grid alignment: &grid=30s&method=ffill|linear&tolerance=45s
+    """
+    try:
+        source = request.args.get("source", "kalman")
+        fmt = request.args.get("format", "csv").lower()
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source '{source}'")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'")
+        if fmt == "parquet" and pq is None:
+            raise ValueError("Parquet export is not available on this server.")
+
+        end = datetime.fromisoformat(request.args["end"]) if "end" in request.args else datetime.utcnow()
+        start = datetime.fromisoformat(request.args["start"]) if "start" in request.args else end - DEFAULT_WINDOW
+        keys = parse_keys(source, request.args.get("sensors"))
+
+        align = _parse_alignment(request.args.get("grid"), request.args.get("method"), request.args.get("tolerance"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filename = f"{source}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{fmt}"
+    mimetype = "text/csv" if fmt == "csv" else "application/vnd.apache.parquet"
+    return Response(
+        stream_with_context(generate_export(source, start, end, keys, fmt, **align)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+# ──────────────────────────── CLI ────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export pivoted greenhouse history as CSV or Parquet.")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="kalman")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ISO start time (UTC), default: end - 24h")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ISO end time (UTC), default: now")
+    parser.add_argument("--sensors", help="Comma-separated sensor IDs (or sensor types for 'weighted')")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--grid", help="Align onto a common time grid, e.g. 30s or 5m (default: exact timestamps)")
+    parser.add_argument("--method", choices=METHODS, default="ffill", help="Grid alignment method")
+    parser.add_argument("--tolerance", help="Max distance to a usable sample, e.g. 45s (default: one grid step)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="Output file, default: <source>_export.<format>")
+    args = parser.parse_args(argv)
+
+    end = args.end or datetime.utcnow()
+    start = args.start or end - DEFAULT_WINDOW
+    output = args.output or f"{args.source}_export.{args.format}"
+    keys = parse_keys(args.source, args.sensors)
+    align = _parse_alignment(args.grid, args.method, args.tolerance)
+
+    mode = "w" if args.format == "csv" else "wb"
+    with open(output, mode, newline="" if mode == "w" else None) as f:
+        for chunk in generate_export(args.source, start, end, keys, args.format, args.chunk_size, **align):
+            f.write(chunk)
+    print(f"✅ Exported {args.source} data {start} → {end} to '{output}'.")
+
+
+if __name__ == "__main__":
+    main()
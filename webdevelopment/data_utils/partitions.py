@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, MetaData, Table, Column, Index, select, func
+from sqlalchemy.pool import NullPool
+
+from database_setup import engine, SensorData, KalmanFilterFusionData, WeightedAverageFusionData
+from network_utils.constants import DB_PARTITION_MODE, PARTITION_DIR
+
+# Optional time partitioning of the time-series tables. With DB_PARTITION_MODE set
+# to "day" or "week", rows for sensor_data, kalman_filter_fusion and
+# weighted_average_fusion go to PARTITION_DIR/greenhouse_<key>.db instead of
+# greenhouse.db, so ingestion always writes to a small file and expiring a
+# period is just deleting a file.
+#
+# Reads stay transparent: a connection ATTACHes the partitions it needs and
+# creates TEMP views named like the real tables. SQLite resolves unqualified
+# names in the temp schema first, so existing Core/ORM SELECTs work unchanged.
+
+MAX_ATTACHED = 8                # SQLite's default limit is 10 attached databases
+HOT_PARTITIONS = 2              # Current + previous partition stay attached on app connections
+ARCHIVE_DIR = os.path.join(PARTITION_DIR, "archive")
+FILE_PATTERN = re.compile(r"^greenhouse_(\d{4}-\d{2}-\d{2}|\d{4}-W\d{2})\.db$")
+
+# ──────────────────────────── Partition schema ────────────────────────────
+# Same columns and indexes as the main tables, minus the foreign keys (the
+# referenced sensors table lives in greenhouse.db).
+partition_metadata = MetaData()
+
+
+def _copy_table(table):
+    columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in table.columns]
+    copy = Table(table.name, partition_metadata, *columns)
+    for index in table.indexes:
+        Index(index.name, *[copy.c[c.name] for c in index.columns])
+    return copy
+
+
+PARTITIONED_TABLES = {
+    model.__tablename__: _copy_table(model.__table__)
+    for model in (SensorData, KalmanFilterFusionData, WeightedAverageFusionData)
+}
+
+
+def partitioning_enabled():
+    return DB_PARTITION_MODE in ("day", "week")
+
+
+# ──────────────────────────── Keys & files ────────────────────────────
+def partition_key(timestamp, mode=None):
+    mode = mode or DB_PARTITION_MODE
+    if mode == "week":
+        year, week, _ = timestamp.isocalendar()
+        return f"{year}-W{week:02d}"
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def partition_bounds(key):
+    """[start, end) covered by a partition key."""
+    if "-W" in key:
+        start = datetime.strptime(key + "-1", "%G-W%V-%u")
+        return start, start + timedelta(weeks=1)
+    start = datetime.strptime(key, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
+
+
+def partition_path(key):
+    return os.path.join(PARTITION_DIR, f"greenhouse_{key}.db")
+
+
+def list_partitions():
+    """[(key, start, end, path)] for every partition file, oldest first."""
+    if not os.path.isdir(PARTITION_DIR):
+        return []
+    parts = []
+    for name in os.listdir(PARTITION_DIR):
+        match = FILE_PATTERN.match(name)
+        if match:
+            key = match.group(1)
+            parts.append((key, *partition_bounds(key), os.path.join(PARTITION_DIR, name)))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def partitions_for_range(start=None, end=None):
+    return [
+        p for p in list_partitions()
+        if (end is None or p[1] <= end) and (start is None or p[2] > start)
+    ]
+
+
+# ──────────────────────────── Writes ────────────────────────────
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def partition_engine(key):
+    """Engine for one partition file, creating the file and its tables on first use."""
+    with _engines_lock:
+        part_engine = _engines.get(key)
+        if part_engine is None:
+            os.makedirs(PARTITION_DIR, exist_ok=True)
+            part_engine = create_engine(
+                f"sqlite:///{partition_path(key)}",
+                connect_args={"check_same_thread": False}
+            )
+            partition_metadata.create_all(part_engine)
+            _engines[key] = part_engine
+        return part_engine
+
+
+def insert_rows(table_name, rows):
+    """Insert row dicts (each with a Timestamp) into the partitions their timestamps fall in."""
+    by_key = {}
+    for row in rows:
+        by_key.setdefault(partition_key(row["Timestamp"]), []).append(row)
+    table = PARTITIONED_TABLES[table_name]
+    for key, key_rows in by_key.items():
+        with partition_engine(key).begin() as conn:
+            conn.execute(table.insert(), key_rows)
+
+
+# ──────────────────────────── Reads ────────────────────────────
+def _detach(cursor, prefix):
+    for table_name in PARTITIONED_TABLES:
+        cursor.execute(f"DROP VIEW IF EXISTS temp.{table_name}")
+    attached = [row[1] for row in cursor.execute("PRAGMA database_list")]
+    for alias in attached:
+        if alias.startswith(prefix) and alias[len(prefix):].isdigit():
+            cursor.execute(f"DETACH DATABASE {alias}")
+
+
+def attach_partitions(dbapi_conn, parts, prefix="p"):
+    """ATTACH the given partitions and (re)create TEMP views unioning them."""
+    cursor = dbapi_conn.cursor()
+    _detach(cursor, prefix)
+
+    aliases = []
+    for i, (key, _, _, path) in enumerate(parts):
+        alias = f"{prefix}{i}"
+        cursor.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        aliases.append(alias)
+
+    for table_name in PARTITIONED_TABLES:
+        if aliases:
+            body = " UNION ALL ".join(f"SELECT * FROM {alias}.{table_name}" for alias in aliases)
+        else:   # No partitions yet: an empty view with the right columns
+            columns = ", ".join(f"NULL AS {c.name}" for c in PARTITIONED_TABLES[table_name].columns)
+            body = f"SELECT {columns} WHERE 0"
+        cursor.execute(f"CREATE TEMP VIEW {table_name} AS {body}")
+    cursor.close()
+
+
+_reader_engine = create_engine("sqlite://", poolclass=NullPool)
+
+
+def iter_attached(start=None, end=None):
+    """
+    Yield connections that each see a chronological batch of the partitions
+    overlapping [start, end] through the shadowing TEMP views.
+    """
+    parts = partitions_for_range(start, end)
+    batches = [parts[i:i + MAX_ATTACHED] for i in range(0, len(parts), MAX_ATTACHED)] or [[]]
+    for batch in batches:
+        with _reader_engine.connect() as conn:
+            attach_partitions(conn.connection.dbapi_connection, batch)
+            yield conn
+
+
+def hot_keys(now=None):
+    """Keys of the partitions ingestion and latest-value lookups touch."""
+    now = now or datetime.utcnow()
+    step = timedelta(weeks=1) if DB_PARTITION_MODE == "week" else timedelta(days=1)
+    return [partition_key(now - step * i) for i in reversed(range(HOT_PARTITIONS))]
+
+
+def sync_hot_views(dbapi_conn, connection_record):
+    """
+    Give a pooled main-engine connection views over the hot partitions, so ORM
+    reads keep working in every entry point (database_setup calls this on each
+    checkout). Re-attaches when the day/week rolls over; with partitioning off,
+    removes views a connection still has.
+    """
+    if not partitioning_enabled():
+        if connection_record.info.pop("hot_paths", None) is not None:
+            cursor = dbapi_conn.cursor()
+            _detach(cursor, "hot")
+            cursor.close()
+        return
+    parts = [(key, None, None, partition_path(key)) for key in hot_keys()]
+    paths = [path for *_, path in parts]
+    if connection_record.info.get("hot_paths") == paths:
+        return
+    for key, *_ in parts:
+        partition_engine(key)       # Make sure the file exists before attaching it
+    attach_partitions(dbapi_conn, parts, prefix="hot")
+    connection_record.info["hot_paths"] = paths
+
+
+# ──────────────────────────── Expiry ────────────────────────────
+def drop_partition(key, archive=False):
+    """Delete a partition file, or move it to ARCHIVE_DIR when archive=True."""
+    with _engines_lock:
+        part_engine = _engines.pop(key, None)
+    if part_engine is not None:
+        part_engine.dispose()
+    path = partition_path(key)
+    if not os.path.exists(path):
+        return False
+    if archive:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        shutil.move(path, os.path.join(ARCHIVE_DIR, os.path.basename(path)))
+    else:
+        os.remove(path)
+    print(f"[INFO] Partition {key} {'archived' if archive else 'dropped'}.")
+    return True
+
+
+def drop_partitions_before(cutoff, archive=False):
+    """Drop every partition that ends at or before cutoff; the hot partitions are never dropped."""
+    hot = set(hot_keys())
+    return [key for key, _, end, _ in list_partitions()
+            if end <= cutoff and key not in hot and drop_partition(key, archive)]
+
+
+# ──────────────────────────── Migration / CLI ────────────────────────────
+def migrate_existing(chunk_size=5000):
+    """Copy time-series rows already in greenhouse.db into their partitions."""
+    for table_name, part_table in PARTITIONED_TABLES.items():
+        # Qualified with "main": the unqualified name resolves to the hot-partition view
+        main_table = SensorData.metadata.tables[table_name].to_metadata(MetaData(), schema="main")
+        columns = [c.name for c in part_table.columns if not c.primary_key]
+        copied = 0
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                select(*[main_table.c[name] for name in columns])
+                .where(main_table.c.Timestamp.isnot(None))
+                .order_by(main_table.c.Timestamp)
+            )
+            for partition in result.partitions(chunk_size):
+                insert_rows(table_name, [dict(zip(columns, row)) for row in partition])
+                copied += len(partition)
+        print(f"[INFO] Migrated {copied} rows from {table_name}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage day/week partitions of the time-series tables.")
+    parser.add_argument("--list", action="store_true", help="List partition files and row counts")
+    parser.add_argument("--migrate", action="store_true", help="Copy existing greenhouse.db rows into partitions")
+    parser.add_argument("--drop-before", type=datetime.fromisoformat, help="Drop partitions ending before this date")
+    parser.add_argument("--archive", action="store_true", help="Move dropped partitions to the archive dir")
+    args = parser.parse_args(argv)
+
+    if not partitioning_enabled():
+        parser.error("Set DB_PARTITION_MODE to 'day' or 'week' in network_utils/constants.py first.")
+    if args.migrate:
+        migrate_existing()
+    if args.drop_before:
+        drop_partitions_before(args.drop_before, archive=args.archive)
+    if args.list:
+        for key, start, end, path in list_partitions():
+            with partition_engine(key).connect() as conn:
+                counts = {name: conn.execute(select(func.count()).select_from(table)).scalar()
+                          for name, table in PARTITIONED_TABLES.items()}
+            print(f"{key}  {os.path.getsize(path) / 1024:8.1f} KB  {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import heapq
+import itertools
+
+from sqlalchemy import select, func, cast, Integer
+import numpy as np
+
+from database_setup import SensorData, KalmanFilterFusionData, WeightedAverageFusionData
+from network_utils.constants import SENSOR_STORAGE_BACKEND
+from data_utils.columnar_store import get_store
+from data_utils.partitions import partitioning_enabled, iter_attached
+from data_utils import archive
+
+# Read-side helpers built on SQLAlchemy Core: rows come back as plain tuples or
+# NumPy arrays, never as ORM instances with identity-map/relationship overhead.
+
+# ──────────────────────────── Tables ────────────────────────────
+sensor_data = SensorData.__table__
+kalman_fusion = KalmanFilterFusionData.__table__
+weighted_fusion = WeightedAverageFusionData.__table__
+
+# source name → (table, series key column, value column)
+SOURCES = {
+    "raw": (sensor_data, sensor_data.c.SensorID, sensor_data.c.Value),
+    "kalman": (kalman_fusion, kalman_fusion.c.SensorID, kalman_fusion.c.FusedValue),
+    "weighted": (weighted_fusion, weighted_fusion.c.SensorType, weighted_fusion.c.FusedValue),
+}
+
+JULIAN_UNIX_EPOCH = 2440587.5   # julianday('1970-01-01')
+MS_PER_DAY = 86400000.0
+
+
+def epoch_ms(column):
+    """SQLite expression turning a DateTime column into integer epoch milliseconds (UTC)."""
+    return cast(func.round((func.julianday(column) - JULIAN_UNIX_EPOCH) * MS_PER_DAY), Integer)
+
+
+# ──────────────────────────── Statements ────────────────────────────
+def series_select(source, start=None, end=None, keys=None, epoch=True, order_by="key"):
+    """
+    SELECT key, timestamp, value for one source.
+
+    epoch=True returns the timestamp as epoch-ms computed in SQL, otherwise as a
+    datetime. order_by="key" matches the (SensorID, Timestamp) index and groups
+    each series together; order_by="time" interleaves series in time order.
+    """
+    table, key_col, value_col = SOURCES[source]
+    ts_col = table.c.Timestamp
+
+    stmt = select(key_col, epoch_ms(ts_col) if epoch else ts_col, value_col).where(ts_col.isnot(None))
+    if start is not None:
+        stmt = stmt.where(ts_col >= start)
+    if end is not None:
+        stmt = stmt.where(ts_col <= end)
+    if keys:
+        stmt = stmt.where(key_col.in_(keys))
+
+    if order_by == "time":
+        return stmt.order_by(ts_col, key_col)
+    return stmt.order_by(key_col, ts_col)
+
+
+def bucketed_select(source, bucket_ms, start=None, end=None, keys=None):
+    """
+    SELECT key, bucket_start_ms, AVG, MIN, MAX, COUNT grouped per key and time bucket.
+
+    The bucket is epoch-ms truncated to a multiple of bucket_ms, so the grouping
+    happens inside SQLite and only one row per bucket crosses into Python.
+    """
+    table, key_col, value_col = SOURCES[source]
+    ts_col = table.c.Timestamp
+    bucket = (cast(epoch_ms(ts_col) / bucket_ms, Integer) * bucket_ms).label("bucket")
+
+    stmt = select(
+        key_col, bucket,
+        func.avg(value_col), func.min(value_col), func.max(value_col), func.count(value_col)
+    ).where(ts_col.isnot(None))
+    if start is not None:
+        stmt = stmt.where(ts_col >= start)
+    if end is not None:
+        stmt = stmt.where(ts_col <= end)
+    if keys:
+        stmt = stmt.where(key_col.in_(keys))
+    return stmt.group_by(key_col, bucket).order_by(key_col, bucket)
+
+
+def keys_select(source, start=None, end=None):
+    """SELECT DISTINCT series keys with at least one reading in the range."""
+    table, key_col, _ = SOURCES[source]
+    stmt = select(key_col).distinct()
+    if start is not None:
+        stmt = stmt.where(table.c.Timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.Timestamp <= end)
+    return stmt.order_by(key_col)
+
+
+# ──────────────────────────── Fetchers ────────────────────────────
+def _ms(dt):
+    return int(np.datetime64(dt, "ms").astype(np.int64)) if dt is not None else None
+
+
+def _execute_all(conn, stmt, start=None, end=None):
+    """
+    All rows of a time-series statement.
+
+    With DB partitioning on, the statement runs once per batch of attached
+    partitions (oldest first) and the rows are concatenated, so callers that
+    need a key-grouped order must re-sort.
+    """
+    if not partitioning_enabled():
+        return conn.execute(stmt).all()
+    rows = []
+    for part_conn in iter_attached(start, end):
+        rows.extend(part_conn.execute(stmt).all())
+    return rows
+
+
+def _key_sorted(rows, order_by="key"):
+    """Restore key grouping after concatenating partition batches (stable, so time order holds)."""
+    if partitioning_enabled() and order_by == "key":
+        rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def fetch_series_rows(conn, source, start=None, end=None, keys=None, epoch=True, order_by="key"):
+    """List of (key, timestamp, value) tuples; see series_select for filters."""
+    rows = _execute_all(conn, series_select(source, start, end, keys, epoch, order_by), start, end)
+    return [tuple(row) for row in _key_sorted(rows, order_by)]
+
+
+def fetch_series_arrays(conn, source, start=None, end=None, keys=None, value_dtype=np.float32,
+                        include_archive=True):
+    """
+    Per-series typed arrays: [(key, int64 epoch-ms array, float32 value array), ...].
+
+    The timestamp conversion runs inside SQLite, so the Python side only packs
+    numbers into arrays and splits them on key boundaries. float32 is plenty for
+    charts; analytics can ask for value_dtype=np.float64. With
+    SENSOR_STORAGE_BACKEND = "columnar", raw series come from the segment store.
+    Samples already moved to the cold archive are merged in unless
+    include_archive=False.
+    """
+    if source == "raw" and SENSOR_STORAGE_BACKEND == "columnar":
+        series = _store_series_arrays(start, end, keys, value_dtype)
+    else:
+        series = _db_series_arrays(conn, source, start, end, keys, value_dtype)
+    if include_archive:
+        series = archive.merge_series(source, series, _ms(start), _ms(end), keys, value_dtype)
+    return series
+
+
+def _db_series_arrays(conn, source, start, end, keys, value_dtype):
+    rows = _key_sorted(_execute_all(conn, series_select(source, start, end, keys, epoch=True), start, end))
+    if not rows:
+        return []
+
+    keys_col, stamps, values = zip(*rows)
+    ts_ms = np.fromiter(stamps, dtype=np.int64, count=len(rows))
+    vals = np.fromiter(values, dtype=value_dtype, count=len(rows))
+    keys_arr = np.asarray(keys_col)
+
+    bounds = np.flatnonzero(keys_arr[1:] != keys_arr[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(rows)]))
+    return [(keys_arr[s].item(), ts_ms[s:e], vals[s:e]) for s, e in zip(starts, ends)]
+
+
+def _store_series_arrays(start, end, keys, value_dtype):
+    store = get_store()
+    series = []
+    for sensor_id in sorted(keys or store.sensor_ids()):
+        ts, vals = store.read_range(sensor_id, _ms(start), _ms(end))
+        if len(ts):
+            series.append((sensor_id, ts, vals if vals.dtype == value_dtype else vals.astype(value_dtype)))
+    return series
+
+
+def fetch_buckets(conn, source, bucket_ms, start=None, end=None, keys=None):
+    """{key: {"timestamps", "avg", "min", "max", "count"}} with one entry per non-empty bucket."""
+    # (key, bucket) → [sum, min, max, count]; a bucket can straddle two partitions
+    merged = {}
+    for key, bucket, avg, min_, max_, count in _execute_all(
+            conn, bucketed_select(source, bucket_ms, start, end, keys), start, end):
+        acc = merged.get((key, bucket))
+        if acc is None:
+            merged[(key, bucket)] = [avg * count, min_, max_, count]
+        else:
+            acc[0] += avg * count
+            acc[1] = min(acc[1], min_)
+            acc[2] = max(acc[2], max_)
+            acc[3] += count
+    _merge_archive_buckets(merged, source, bucket_ms, start, end, keys)
+
+    series = {}
+    for (key, bucket), (total, min_, max_, count) in sorted(merged.items()):
+        entry = series.setdefault(key, {"timestamps": [], "avg": [], "min": [], "max": [], "count": []})
+        entry["timestamps"].append(bucket)
+        entry["avg"].append(total / count)
+        entry["min"].append(min_)
+        entry["max"].append(max_)
+        entry["count"].append(count)
+    return series
+
+
+def _merge_archive_buckets(merged, source, bucket_ms, start, end, keys):
+    """Fold archived samples into the (key, bucket) → [sum, min, max, count] map, bucketing in NumPy."""
+    if not archive.has_archive(source):
+        return
+    for key in keys or archive.archived_keys(source, _ms(start), _ms(end)):
+        ts, vals = archive.read_range(source, key, _ms(start), _ms(end))
+        if not len(ts):
+            continue
+        vals = vals.astype(np.float64)
+        buckets, first = np.unique(ts // bucket_ms * bucket_ms, return_index=True)
+        sums = np.add.reduceat(vals, first)
+        mins = np.minimum.reduceat(vals, first)
+        maxs = np.maximum.reduceat(vals, first)
+        counts = np.diff(np.append(first, len(ts)))
+        for bucket, total, min_, max_, count in zip(buckets.tolist(), sums.tolist(), mins.tolist(),
+                                                    maxs.tolist(), counts.tolist()):
+            acc = merged.get((key, bucket))
+            if acc is None:
+                merged[(key, bucket)] = [total, min_, max_, count]
+            else:
+                acc[0] += total
+                acc[1] = min(acc[1], min_)
+                acc[2] = max(acc[2], max_)
+                acc[3] += count
+
+
+def fetch_keys(conn, source, start=None, end=None):
+    live = {row[0] for row in _execute_all(conn, keys_select(source, start, end), start, end)}
+    return sorted(live | set(archive.archived_keys(source, _ms(start), _ms(end))))
+
+
+def fetch_latest_timestamp(conn, source):
+    table, _, _ = SOURCES[source]
+    stamps = [row[0] for row in _execute_all(conn, select(func.max(table.c.Timestamp))) if row[0] is not None]
+    return max(stamps) if stamps else None
+
+
+def iter_series_chunks(conn, source, chunk_size, start=None, end=None, keys=None, epoch=True, order_by="key"):
+    """
+    Stream lists of up to chunk_size (key, timestamp, value) tuples in constant memory.
+
+    Database rows come from server-side cursors (partitioned databases one batch
+    of partitions at a time) and archived samples are read one day file at a
+    time, merged in by timestamp. order_by="key" streams one series after the
+    other; order_by="time" interleaves all of them by (timestamp, key). A sample
+    that is both archived and still in the database (a crash between archiving
+    and deleting) is emitted once.
+    """
+    filters = {"start": start, "end": end, "epoch": epoch}
+    if order_by == "time":
+        rows = _dedup_rows(heapq.merge(
+            _archive_day_rows(source, keys, start, end, epoch),
+            _db_rows(conn, source, chunk_size, keys=keys, order_by="time", **filters),
+            key=lambda row: (row[1], row[0]),
+        ))
+    else:
+        rows = itertools.chain.from_iterable(
+            _dedup_rows(heapq.merge(
+                _archive_rows(source, key, start, end, epoch),
+                _db_rows(conn, source, chunk_size, keys=[key], order_by="key", **filters),
+                key=lambda row: row[1],
+            ))
+            for key in (sorted(keys) if keys else fetch_keys(conn, source, start, end))
+        )
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _db_rows(conn, source, chunk_size, **filters):
+    stmt = series_select(source, **filters)
+    connections = iter_attached(filters.get("start"), filters.get("end")) if partitioning_enabled() else [conn]
+    for read_conn in connections:
+        result = read_conn.execution_options(stream_results=True).execute(stmt)
+        for partition in result.partitions(chunk_size):
+            yield from (tuple(row) for row in partition)
+
+
+def _archive_values(vals):
+    # Shortest float32 repr → float64, so 33.8 is exported as 33.8 rather than 33.79999923706055
+    return vals.astype(str).astype(np.float64).tolist()
+
+
+def _archive_stamps(ts, epoch):
+    return ts.tolist() if epoch else ts.astype("datetime64[ms]").tolist()
+
+
+def _archive_rows(source, key, start, end, epoch):
+    for ts, vals in archive.iter_range(source, key, _ms(start), _ms(end)):
+        yield from zip(itertools.repeat(key), _archive_stamps(ts, epoch), _archive_values(vals))
+
+
+def _archive_day_rows(source, keys, start, end, epoch):
+    if not archive.has_archive(source):
+        return
+    day_keys = keys or archive.archived_keys(source, _ms(start), _ms(end))
+    for names, ts, vals in archive.iter_days(source, day_keys, _ms(start), _ms(end)):
+        yield from zip(names, _archive_stamps(ts, epoch), _archive_values(vals))
+
+
+def _dedup_rows(rows):
+    """Drop repeats of a (key, timestamp, value) sample; values are compared at archive (float32) precision."""
+    current, seen = None, ()
+    for row in rows:
+        if row[:2] != current:
+            current, seen = row[:2], set()
+        value = float(np.float32(row[2]))
+        if value in seen:
+            continue
+        seen.add(value)
+        yield row
@@ -0,0 +1,333 @@
+import argparse
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.sqlite import insert
+
+from database_setup import engine, SensorRollup, RetentionWatermark
+from data_utils.queries import SOURCES, bucketed_select, series_select
+from network_utils.constants import SENSOR_STORAGE_BACKEND
+from data_utils import archive
+from data_utils.columnar_store import get_store
+from data_utils.alignment import datetime_to_ms, ms_to_datetimes
+from data_utils.partitions import (
+    partitioning_enabled, list_partitions, hot_keys, partition_engine, drop_partition, PARTITIONED_TABLES
+)
+
+# ──────────────────────────── Policies ────────────────────────────
+# source → how long raw rows are kept. Before rows are deleted they are rolled up
+# into sensor_rollups (count/sum/min/max per ROLLUP_BUCKET), which are kept forever.
+# retention_watermarks records per source how far the rollups reach; a window is
+# only added if it lies past the watermark, and the watermark moves in the same
+# transaction as the rollup, so a crash or a second process can't count it twice.
+RETENTION_POLICIES = {
+    "raw": timedelta(days=14),
+    "kalman": timedelta(days=30),
+    "weighted": timedelta(days=90),
+}
+ROLLUP_BUCKET = timedelta(hours=1)
+WINDOW = timedelta(hours=6)         # Time range rolled up and deleted per transaction; keeps write locks short
+BATCH_PAUSE_SECONDS = 0.05          # Lets /receive writers in between windows
+VACUUM_PAGES = 500                  # Pages returned to the OS per run (incremental auto_vacuum only)
+RUN_INTERVAL_SECONDS = 6 * 3600
+SCHEDULER_LOCK_PATH = os.path.join(tempfile.gettempdir(), "greenhouse_retention.lock")
+ARCHIVE_EXPIRED = True              # Copy expired rows to the cold archive before deleting them
+
+rollups = SensorRollup.__table__
+watermarks = RetentionWatermark.__table__
+
+
+# ──────────────────────────── Rollups ────────────────────────────
+def claim_window(conn, source, start, end):
+    """
+    Start of the part of [start, end) not yet in sensor_rollups, or None when all of it is.
+
+    The first statement is a write, so the transaction holds SQLite's write lock
+    before anything is read: a second retention run waits here and then sees the
+    watermark this one leaves behind.
+    """
+    conn.execute(insert(watermarks).values(Source=source, RolledUpTo=datetime.min)
+                 .on_conflict_do_nothing(index_elements=["Source"]))
+    rolled_up_to = conn.execute(select(watermarks.c.RolledUpTo).where(watermarks.c.Source == source)).scalar()
+    return None if rolled_up_to >= end else max(start, rolled_up_to)
+
+
+def rollup_window(conn, source, start, end, read_conn=None):
+    """
+    Aggregate the not yet rolled-up part of [start, end) into sensor_rollups,
+    merging with any existing bucket row, and advance the source's watermark to end.
+    Must run inside the transaction that commits (or, for a partition, precedes)
+    the delete of those rows.
+
+    read_conn lets the rows come from a different database (a partition file)
+    than the one holding sensor_rollups.
+    """
+    start = claim_window(conn, source, start, end)
+    if start is None:
+        return 0
+    conn.execute(watermarks.update().where(watermarks.c.Source == source).values(RolledUpTo=end))
+    bucket_seconds = int(ROLLUP_BUCKET.total_seconds())
+    stmt = bucketed_select(source, bucket_seconds * 1000, start=start)
+    table, _, _ = SOURCES[source]
+    stmt = stmt.where(table.c.Timestamp < end)
+
+    rows = [
+        {
+            "Source": source,
+            "SeriesKey": str(key),
+            "BucketStart": ms_to_datetimes([bucket])[0],
+            "BucketSeconds": bucket_seconds,
+            "Count": count,
+            "SumValue": avg * count,
+            "MinValue": min_,
+            "MaxValue": max_,
+        }
+        for key, bucket, avg, min_, max_, count in (read_conn or conn).execute(stmt)
+    ]
+    if not rows:
+        return 0
+
+    upsert = insert(rollups).values(rows)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["Source", "SeriesKey", "BucketSeconds", "BucketStart"],
+        set_={
+            "Count": rollups.c.Count + upsert.excluded.Count,
+            "SumValue": rollups.c.SumValue + upsert.excluded.SumValue,
+            "MinValue": func.min(rollups.c.MinValue, upsert.excluded.MinValue),
+            "MaxValue": func.max(rollups.c.MaxValue, upsert.excluded.MaxValue),
+        }
+    )
+    conn.execute(upsert)
+    return len(rows)
+
+
+def archive_window(conn, source, start, end):
+    """Copy [start, end) of every series into the cold archive; returns the number of rows archived."""
+    table, _, _ = SOURCES[source]
+    rows = conn.execute(series_select(source, start=start).where(table.c.Timestamp < end)).all()
+    if not rows:
+        return 0
+    keys_col, stamps, values = zip(*rows)
+    keys_arr = np.asarray(keys_col)
+    ts_ms = np.fromiter(stamps, dtype=np.int64, count=len(rows))
+    vals = np.fromiter(values, dtype=np.float32, count=len(rows))
+    bounds = np.flatnonzero(keys_arr[1:] != keys_arr[:-1]) + 1
+    for key_rows in np.split(np.arange(len(rows)), bounds):
+        archive.write_series(source, keys_arr[key_rows[0]].item(), ts_ms[key_rows], vals[key_rows])
+    return len(rows)
+
+
+def delete_window(conn, source, start, end):
+    """Delete [start, end); runs in the rollup's transaction so the two commit together."""
+    table, _, _ = SOURCES[source]
+    return conn.execute(table.delete().where(table.c.Timestamp >= start, table.c.Timestamp < end)).rowcount
+
+
+# ──────────────────────────── Job ────────────────────────────
+def retention_cutoff(keep_for, now=None):
+    bucket_ms = int(ROLLUP_BUCKET.total_seconds() * 1000)
+    now = now or datetime.utcnow()
+    return ms_to_datetimes([(datetime_to_ms(now - keep_for) // bucket_ms) * bucket_ms])[0]
+
+
+def apply_policy(source, keep_for, now=None, dry_run=False):
+    """
+    Roll up, archive and delete everything in `source` older than now - keep_for.
+
+    The cutoff is snapped down to a rollup bucket boundary so every bucket is
+    rolled up exactly once, from complete data. Each window is archived first
+    (archive writes are idempotent), then rolled up and deleted in one transaction.
+    """
+    table, _, _ = SOURCES[source]
+    cutoff = retention_cutoff(keep_for, now)
+    bucket_ms = int(ROLLUP_BUCKET.total_seconds() * 1000)
+
+    stats = {"source": source, "cutoff": cutoff.isoformat(), "buckets": 0, "deleted": 0}
+    window_end = datetime.min
+    while True:
+        # Jump to the bucket of the next remaining row, skipping empty stretches of history
+        with engine.connect() as conn:
+            oldest = conn.execute(select(func.min(table.c.Timestamp)).where(table.c.Timestamp >= window_end)).scalar()
+        if oldest is None or oldest >= cutoff:
+            return stats
+        window_start = ms_to_datetimes([(datetime_to_ms(oldest) // bucket_ms) * bucket_ms])[0]
+        window_end = min(window_start + WINDOW, cutoff)
+        if dry_run:
+            with engine.connect() as conn:
+                stats["deleted"] += conn.execute(
+                    select(func.count()).select_from(table)
+                    .where(table.c.Timestamp >= window_start, table.c.Timestamp < window_end)
+                ).scalar()
+        else:
+            if ARCHIVE_EXPIRED:
+                with engine.connect() as conn:
+                    archive_window(conn, source, window_start, window_end)
+            with engine.begin() as conn:
+                stats["buckets"] += rollup_window(conn, source, window_start, window_end)
+                stats["deleted"] += delete_window(conn, source, window_start, window_end)
+            time.sleep(BATCH_PAUSE_SECONDS)
+
+
+def apply_partition_policies(policies, now=None, dry_run=False):
+    """
+    Partitioned variant: a table inside a partition that is past its source's
+    cutoff is rolled up and emptied; once every table in a partition has
+    expired the whole file is dropped. The rollup and the partition delete are in
+    different databases, so a crash in between is covered by the watermark: the
+    retry skips the rollup and only deletes.
+    """
+    cutoffs = {source: retention_cutoff(keep_for, now) for source, keep_for in policies.items()}
+    hot = set(hot_keys(now))
+    results = []
+    for key, start, end, _ in list_partitions():
+        expired = [source for source, cutoff in cutoffs.items() if end <= cutoff]
+        if key in hot or not expired:
+            continue
+        drop = len(expired) == len(PARTITIONED_TABLES)
+        stats = {"partition": key, "expired": expired, "buckets": 0, "dropped": False}
+        if not dry_run:
+            try:
+                part_engine = partition_engine(key)
+                for source in expired:
+                    if ARCHIVE_EXPIRED:
+                        with part_engine.connect() as read_conn:
+                            archive_window(read_conn, source, start, end)
+                    with part_engine.connect() as read_conn, engine.begin() as conn:
+                        stats["buckets"] += rollup_window(conn, source, start, end, read_conn=read_conn)
+                    with part_engine.begin() as part_conn:
+                        part_conn.execute(PARTITIONED_TABLES[SOURCES[source][0].name].delete())
+                if drop:
+                    stats["dropped"] = drop_partition(key)
+            except Exception as e:
+                print(f"[ERROR] Retention failed for partition {key}: {e}")
+                continue
+        results.append(stats)
+        print(f"[INFO] Retention partition {key}: expired={','.join(expired)} buckets={stats['buckets']} "
+              f"{'would drop' if dry_run else 'dropped'}={drop}")
+    return results
+
+
+def prune_columnar(keep_for, now=None, dry_run=False):
+    """
+    Raw samples in the columnar store follow the "raw" policy too: every segment
+    whose samples are all past the cutoff is archived and deleted. A segment that
+    straddles the cutoff is kept until its newest sample expires.
+    """
+    cutoff_ms = datetime_to_ms(retention_cutoff(keep_for, now))
+    store = get_store()
+    stats = {"source": "columnar", "cutoff": ms_to_datetimes([cutoff_ms])[0].isoformat(), "deleted": 0}
+    for sensor_id in store.sensor_ids():
+        if dry_run:
+            stats["deleted"] += store.expired_rows(sensor_id, cutoff_ms)
+            continue
+        before_drop = None
+        if ARCHIVE_EXPIRED:
+            def before_drop(ts, vals, sensor_id=sensor_id):
+                archive.write_series("raw", sensor_id, ts, vals)
+        stats["deleted"] += store.drop_before(sensor_id, cutoff_ms, before_drop)
+    return stats
+
+
+def reclaim_space(pages=VACUUM_PAGES):
+    """Hand up to `pages` free pages back to the filesystem if incremental auto_vacuum is on."""
+    with engine.connect() as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            return False
+        conn.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+        conn.commit()
+    return True
+
+
+def enable_incremental_vacuum():
+    """One-off: switch the database to auto_vacuum=INCREMENTAL (needs a full VACUUM once)."""
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+
+def run_retention(policies=None, dry_run=False, now=None):
+    policies = policies or RETENTION_POLICIES
+    results = []
+    if SENSOR_STORAGE_BACKEND in ("columnar", "both") and "raw" in policies:
+        try:
+            stats = prune_columnar(policies["raw"], now=now, dry_run=dry_run)
+            results.append(stats)
+            print(f"[INFO] Retention columnar: cutoff={stats['cutoff']} "
+                  f"{'would delete' if dry_run else 'deleted'}={stats['deleted']}")
+        except Exception as e:
+            print(f"[ERROR] Retention failed for the columnar store: {e}")
+    if partitioning_enabled():
+        return results + apply_partition_policies(policies, now=now, dry_run=dry_run)
+
+    for source, keep_for in policies.items():
+        try:
+            stats = apply_policy(source, keep_for, now=now, dry_run=dry_run)
+            results.append(stats)
+            print(f"[INFO] Retention {source}: cutoff={stats['cutoff']} "
+                  f"buckets={stats['buckets']} {'would delete' if dry_run else 'deleted'}={stats['deleted']}")
+        except Exception as e:
+            print(f"[ERROR] Retention failed for {source}: {e}")
+    if not dry_run:
+        reclaim_space()
+    return results
+
+
+_scheduler_lock_file = None
+
+
+def start_retention_scheduler(interval_seconds=RUN_INTERVAL_SECONDS):
+    """
+    Run the retention job in a daemon thread every interval_seconds.
+
+    Only one process per machine gets the scheduler: the first to take an flock
+    on SCHEDULER_LOCK_PATH keeps it for its lifetime; others return None.
+    """
+    global _scheduler_lock_file
+    if _scheduler_lock_file is not None:
+        return None
+    lock_file = open(SCHEDULER_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        print("[INFO] Retention scheduler already running in another process.")
+        return None
+    _scheduler_lock_file = lock_file
+
+    def loop():
+        while True:
+            try:
+                run_retention()
+            except Exception as e:
+                print(f"[ERROR] Retention run failed: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=loop, name="retention", daemon=True)
+    thread.start()
+    return thread
+
+
+# ──────────────────────────── CLI ────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll up and delete sensor history past its retention period.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be deleted")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Switch the DB to incremental auto_vacuum (runs one full VACUUM)")
+    args = parser.parse_args(argv)
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+        print("✅ auto_vacuum set to INCREMENTAL.")
+    run_retention(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import fcntl
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from database_setup import engine
+from data_utils.partitions import partitioning_enabled, list_partitions
+from network_utils.constants import SNAPSHOT_PATH, SNAPSHOT_INTERVAL_SECONDS, SNAPSHOT_MAX_AGE_SECONDS
+
+# Point-in-time copies of greenhouse.db for analytics.
+#
+# A snapshot is taken with SQLite's online backup API inside one read
+# transaction. The live DB runs in WAL mode, so that read neither blocks nor
+# waits for the /receive writers, and the copy is consistent as of its start.
+# The copy is written to a temp file and renamed over SNAPSHOT_PATH; readers
+# that still have the previous snapshot open keep reading their old file.
+#
+# Snapshots are opened read-only and immutable, so SQLite skips all locking.
+# With DB partitioning on, the partition files are backed up too, into
+# <snapshot>.partitions/; only files that changed since their last copy are
+# copied, so closed days cost nothing. Analytics queries still read the
+# partitions in place: the copies are the backup, not a read path.
+#
+# Every process that imports app.py starts the scheduler, but only the first to
+# take an flock on SCHEDULER_LOCK_PATH runs it (as for retention).
+
+BACKUP_PAGES = -1       # Copy every page in one step = one consistent read transaction
+SCHEDULER_LOCK_PATH = os.path.join(tempfile.gettempdir(), "greenhouse_snapshot.lock")
+
+
+# ──────────────────────────── Taking snapshots ────────────────────────────
+def live_db_path():
+    return engine.url.database
+
+
+def _backup(source_path, path):
+    """Online-backup one SQLite file to path via a temp file + rename."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(tmp)
+    try:
+        source.backup(target, pages=BACKUP_PAGES)
+        # The copy inherits WAL mode from page 1; switch it back so it can be opened immutable
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp, path)
+
+
+def partition_snapshot_dir(path=SNAPSHOT_PATH):
+    return f"{path}.partitions"
+
+
+def _modified_ns(db_path):
+    """Last write to a SQLite file, counting its WAL."""
+    return max(os.stat(p).st_mtime_ns for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def snapshot_partitions(path=SNAPSHOT_PATH):
+    """
+    Mirror the partition files into partition_snapshot_dir(path): copy the ones
+    written since their last copy, remove copies of dropped partitions.
+    Returns the number of files copied.
+    """
+    directory = partition_snapshot_dir(path)
+    sources = {os.path.basename(source): source for *_, source in list_partitions()}
+    os.makedirs(directory, exist_ok=True)
+    copied = 0
+    for name, source in sources.items():
+        target = os.path.join(directory, name)
+        modified = _modified_ns(source)
+        if os.path.exists(target) and os.stat(target).st_mtime_ns == modified:
+            continue
+        _backup(source, target)
+        os.utime(target, ns=(modified, modified))      # Writes during the copy show up as a newer source
+        copied += 1
+    for name in os.listdir(directory):
+        if name not in sources and not name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+    return copied
+
+
+def take_snapshot(path=SNAPSHOT_PATH):
+    """Copy the live DB (and, with partitioning on, changed partitions) to path atomically; returns the path."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    started = time.perf_counter()
+    _backup(live_db_path(), path)
+    copied = snapshot_partitions(path) if partitioning_enabled() else 0
+
+    print(f"[INFO] Snapshot written to {path} in {(time.perf_counter() - started) * 1000:.0f} ms"
+          f"{f' ({copied} partition file(s) copied)' if copied else ''}.")
+    return path
+
+
+def snapshot_age(path=SNAPSHOT_PATH):
+    """Seconds since the snapshot was taken, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    return time.time() - os.path.getmtime(path)
+
+
+def ensure_snapshot(max_age=SNAPSHOT_MAX_AGE_SECONDS, path=SNAPSHOT_PATH):
+    """Return a snapshot path no older than max_age seconds, taking a new one if needed."""
+    age = snapshot_age(path)
+    if age is None or age > max_age:
+        take_snapshot(path)
+    return path
+
+
+# ──────────────────────────── Reading snapshots ────────────────────────────
+def snapshot_uri(path=SNAPSHOT_PATH):
+    """sqlite3 URI for a read-only, lock-free connection to a snapshot."""
+    return f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+
+
+_snapshot_engines = {}
+
+
+def snapshot_engine(path=SNAPSHOT_PATH):
+    """
+    Engine on the snapshot file. NullPool makes every connect() open the file
+    afresh, so a refreshed snapshot is picked up by the next connection.
+    """
+    snap_engine = _snapshot_engines.get(path)
+    if snap_engine is None:
+        snap_engine = create_engine(
+            "sqlite://",
+            creator=lambda: sqlite3.connect(snapshot_uri(path), uri=True, check_same_thread=False),
+            poolclass=NullPool
+        )
+        _snapshot_engines[path] = snap_engine
+    return snap_engine
+
+
+@contextmanager
+def snapshot_connect(max_age=SNAPSHOT_MAX_AGE_SECONDS, path=SNAPSHOT_PATH):
+    """
+    Core connection on a snapshot at most max_age seconds old.
+
+        with snapshot_connect() as conn:
+            rows = fetch_series_rows(conn, "kalman")
+    """
+    ensure_snapshot(max_age, path)
+    with snapshot_engine(path).connect() as conn:
+        yield conn
+
+
+# ──────────────────────────── Scheduling ────────────────────────────
+_scheduler_lock_file = None
+
+
+def start_snapshot_scheduler(interval_seconds=SNAPSHOT_INTERVAL_SECONDS, path=SNAPSHOT_PATH):
+    """
+    Refresh the snapshot in a daemon thread every interval_seconds.
+
+    Only one process per machine gets the scheduler: the first to take an flock
+    on SCHEDULER_LOCK_PATH keeps it for its lifetime; others return None.
+    """
+    global _scheduler_lock_file
+    if _scheduler_lock_file is not None:
+        return None
+    lock_file = open(SCHEDULER_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        print("[INFO] Snapshot scheduler already running in another process.")
+        return None
+    _scheduler_lock_file = lock_file
+
+    def loop():
+        while True:
+            try:
+                take_snapshot(path)
+            except Exception as e:
+                print(f"[ERROR] Snapshot failed: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=loop, name="snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+# ──────────────────────────── CLI ────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Take a point-in-time snapshot of greenhouse.db for analytics.")
+    parser.add_argument("--path", default=SNAPSHOT_PATH)
+    parser.add_argument("--max-age", type=float, help="Only refresh if the snapshot is older than this (seconds)")
+    args = parser.parse_args(argv)
+
+    if args.max_age is None:
+        take_snapshot(args.path)
+    else:
+        ensure_snapshot(args.max_age, args.path)
+    print(f"✅ Snapshot at {args.path} ({snapshot_age(args.path):.0f} s old).")
+
+
+if __name__ == "__main__":
+    main()
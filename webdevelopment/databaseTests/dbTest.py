@@ -1,7 +1,14 @@
+import os
 import sqlite3
+import sys
 
-# Connect to the database
-conn = sqlite3.connect("greenhouse.db")
+# Run as 'python databaseTests/dbTest.py' from webdevelopment/: make the project packages importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils.snapshot import ensure_snapshot, snapshot_uri
+
+# Connect to a read-only snapshot of the database (refreshed if older than 15 min)
+conn = sqlite3.connect(snapshot_uri(ensure_snapshot()), uri=True)
 cursor = conn.cursor()
 
 # Function to print column details for a given table
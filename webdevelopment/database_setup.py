@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, Float, String, DateTime,
-    ForeignKey, Boolean, Index
+    create_engine, event, Column, Integer, Float, String, DateTime,
+    ForeignKey, Boolean, Index, UniqueConstraint
 )
 from sqlalchemy.orm import relationship, sessionmaker, declarative_base
 from datetime import datetime
@@ -15,6 +15,20 @@ engine = create_engine(
     pool_recycle=1800           # 🔁 Recycle connection every 30 minutes
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    # WAL lets readers (snapshots, dashboards) run alongside the /receive writers
+    # instead of waiting on the database lock; busy_timeout absorbs short write overlaps.
+    # auto_vacuum only takes effect on a new (empty) file, so it must come first; existing
+    # databases are switched once with 'python -m data_utils.retention --enable-incremental-vacuum'.
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=True)  # ✅ Forces fresh reads
 
 # ──────────────────────────── Base ────────────────────────────
@@ -92,6 +106,9 @@ class SensorData(Base):
 
 class KalmanFilterFusionData(Base):
     __tablename__ = "kalman_filter_fusion"
+    __table_args__ = (
+        Index("ix_kalman_filter_fusion_sensorid_timestamp", "SensorID", "Timestamp"),
+    )
 
     FusionID = Column(Integer, primary_key=True)
     SensorID = Column(Integer, ForeignKey("sensors.SensorID"), nullable=False)
@@ -106,6 +123,9 @@ class KalmanFilterFusionData(Base):
 
 class WeightedAverageFusionData(Base):
     __tablename__ = "weighted_average_fusion"
+    __table_args__ = (
+        Index("ix_weighted_average_fusion_sensortype_timestamp", "SensorType", "Timestamp"),
+    )
 
     FusionID = Column(Integer, primary_key=True)
     SensorType = Column(String(50), nullable=False)
@@ -116,6 +136,61 @@ class WeightedAverageFusionData(Base):
         return f"<WeightedFusion(SensorType={self.SensorType}, Value={self.FusedValue})>"
 
 
+class SensorRollup(Base):
+    """Per-bucket aggregates kept after the retention job deletes the underlying raw rows."""
+    __tablename__ = "sensor_rollups"
+    __table_args__ = (
+        UniqueConstraint("Source", "SeriesKey", "BucketSeconds", "BucketStart", name="uq_sensor_rollups_bucket"),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    Source = Column(String(20), nullable=False)         # raw | kalman | weighted
+    SeriesKey = Column(String(50), nullable=False)      # SensorID or fused SensorType
+    BucketStart = Column(DateTime, nullable=False)
+    BucketSeconds = Column(Integer, nullable=False)
+    Count = Column(Integer, nullable=False)
+    SumValue = Column(Float, nullable=False)
+    MinValue = Column(Float, nullable=False)
+    MaxValue = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<SensorRollup(Source={self.Source}, Key={self.SeriesKey}, Bucket={self.BucketStart})>"
+
+
+class RetentionWatermark(Base):
+    """Per source, the time up to which expired rows have been added to sensor_rollups."""
+    __tablename__ = "retention_watermarks"
+
+    Source = Column(String(20), primary_key=True)
+    RolledUpTo = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<RetentionWatermark(Source={self.Source}, RolledUpTo={self.RolledUpTo})>"
+
+
+class PlantDetection(Base):
+    """One classified image from the inspection car or a /run batch, with every box found in it."""
+    __tablename__ = "plant_detections"
+    __table_args__ = (
+        Index("ix_plant_detections_cycleid_stop", "CycleID", "StopNumber"),
+        Index("ix_plant_detections_detectedat", "DetectedAt"),
+        Index("ix_plant_detections_classname_detectedat", "ClassName", "DetectedAt"),
+    )
+
+    DetectionID = Column(Integer, primary_key=True)
+    CycleID = Column(String(40))                        # cycle-YYYYmmdd-HHMMSS / run-YYYYmmdd-HHMMSS
+    StopNumber = Column(Integer)                        # 1-based stop in a cycle; None for /run batches
+    ImagePath = Column(String(255))                     # Relative to ./static; None once the file is cleared
+    ClassName = Column(String(50), nullable=False)      # The class the cycle acted on, or "No detection"
+    Confidence = Column(Float, nullable=False, default=0)
+    BoxCount = Column(Integer, nullable=False, default=0)
+    Boxes = Column(String, nullable=False, default="[]")  # JSON [{"class", "confidence", "box": [x1, y1, x2, y2]}]
+    DetectedAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PlantDetection(Cycle={self.CycleID}, Stop={self.StopNumber}, Class={self.ClassName})>"
+
+
 class Actuator(Base):
     __tablename__ = "actuators"
 
@@ -152,4 +227,21 @@ class UserInteraction(Base):
         return f"<UserInteraction(UserID={self.UserID}, DeviceID={self.DeviceID}, Action={self.Action})>"
 
 # ──────────────────────────── Create All Tables ────────────────────────────
+def ensure_indexes(bind=engine):
+    """create_all() skips tables that already exist, so add any newly declared indexes to them."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
 Base.metadata.create_all(engine)
+ensure_indexes()
+
+
+# Time-series tables may live in day/week partition files (data_utils/partitions.py);
+# every connection of this engine, whichever process or script made it, sees the
+# hot partitions under the usual table names.
+@event.listens_for(engine, "checkout")
+def _sync_hot_partitions(dbapi_conn, connection_record, connection_proxy):
+    from data_utils.partitions import sync_hot_views     # partitions imports this module
+    sync_hot_views(dbapi_conn, connection_record)
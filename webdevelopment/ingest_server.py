@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+
+from database_setup import SessionLocal
+from network import iter_payload_readings, update_actuator_state, control_response, READING_TYPES
+from network_utils.constants import credentials, INGEST_SERVER_HOST, INGEST_SERVER_PORT, INGEST_MAX_PENDING
+from network_utils.dedup import parse_sequence, check_sequence, release_sequence, remember_response, cached_response, ACCEPTED
+from network_utils.sensor_storage import store_sensor_data
+
+# Asyncio front end for /receive, for fleets of boards that keep connections open.
+#
+# `app` is a plain ASGI application (runs under uvicorn/hypercorn too), and
+# `serve` is a small stdlib HTTP/1.1 keep-alive server for it, so one process
+# holds thousands of idle device connections without a thread per socket.
+# Handlers only authenticate, parse and validate; accepted payloads go to
+# IngestBatcher, which stores everything waiting in one DB transaction on a
+# single writer thread and runs the control step once per batch. The reply
+# has the same shape as Flask's /receive (minus the 5 s sleep).
+#
+#   python ingest_server.py --port 5001
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_PAYLOADS = 500
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT_SECONDS = 75
+
+
+# ──────────────────────────── Validation ────────────────────────────
+def check_credentials(authorization):
+    """Validate an HTTP Basic Authorization header against the device credentials."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "basic":
+        return False
+    try:
+        username, _, password = base64.b64decode(token).decode().partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    return credentials.get(username) == password
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_payload(data):
+    """Error message for a malformed /receive payload, or None if it is usable."""
+    if not isinstance(data, dict) or not data:
+        return "Invalid or missing JSON payload"
+    if not isinstance(data.get("DeviceID"), int):
+        return "DeviceID must be an integer"
+    sensor_ids = data.get("SensorID", [])
+    if not isinstance(sensor_ids, list) or not all(isinstance(s, int) for s in sensor_ids):
+        return "SensorID must be a list of integers"
+    for reading_type in READING_TYPES:
+        for field in (reading_type, f"filtered_{reading_type}"):
+            values = data.get(field, [])
+            if not isinstance(values, list) or not all(_is_number(v) for v in values):
+                return f"{field} must be a list of numbers"
+    return None
+
+
+# ──────────────────────────── Batched writer ────────────────────────────
+def write_payloads(payloads):
+    """Store a batch of validated payloads in one transaction, then run control once for all of them."""
+    time = datetime.utcnow()
+    with SessionLocal() as session:
+        for data in payloads:
+            device_id = data["DeviceID"]
+            for sensor_id, reading_type, value, filtered_value in iter_payload_readings(data):
+                store_sensor_data(session, device_id, data.get("DeviceName"), sensor_id,
+                                  **{reading_type: value, f"filtered_{reading_type}": filtered_value},
+                                  timestamp=time, commit=False)
+        session.commit()
+
+        for data in payloads:
+            if data.get("ActuatorID") is not None and data.get("ActuatorState") is not None:
+                update_actuator_state(session, data["DeviceID"], data["ActuatorID"], data["ActuatorState"], time)
+
+        response, _ = control_response(session)
+    return response
+
+
+class IngestBatcher:
+    """Collects payloads from concurrent handlers and writes them in group commits."""
+
+    def __init__(self):
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+        self.avg_batch_seconds = 0.0
+        self._task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.executor.shutdown(wait=True)
+
+    def pending(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def retry_after(self):
+        batches_ahead = self.pending() / BATCH_MAX_PAYLOADS + 1
+        return max(1, math.ceil(batches_ahead * self.avg_batch_seconds))
+
+    async def submit(self, payload):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((payload, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Whatever queued up while the previous batch was being written goes in this one
+            batch = [await self.queue.get()]
+            while len(batch) < BATCH_MAX_PAYLOADS and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            started = loop.time()
+            try:
+                response = await loop.run_in_executor(self.executor, write_payloads, [p for p, _ in batch])
+            except Exception as e:
+                logger.error(f"Failed to store batch of {len(batch)} payloads: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            elapsed = loop.time() - started
+            self.avg_batch_seconds = elapsed if self.avg_batch_seconds == 0 else \
+                0.8 * self.avg_batch_seconds + 0.2 * elapsed
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(response)
+
+
+batcher = IngestBatcher()
+
+
+# ──────────────────────────── ASGI app ────────────────────────────
+async def handle_receive(headers, body):
+    """(status, JSON body, extra headers) for one /receive request."""
+    if not check_credentials(headers.get("authorization")):
+        return 401, {"error": "Unauthorized"}, []
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return 400, {"error": "Invalid or missing JSON payload"}, []
+    error = validate_payload(data)
+    if error:
+        return 400, {"error": error}, []
+
+    device_id = data["DeviceID"]
+    sequence = parse_sequence(data)
+    if sequence is not None:
+        verdict = check_sequence(device_id, *sequence)
+        if verdict != ACCEPTED:
+            return 200, cached_response(device_id, *sequence) or {"status": verdict}, []
+
+    if batcher.pending() >= INGEST_MAX_PENDING:
+        if sequence is not None:
+            release_sequence(device_id, *sequence)
+        retry_after = batcher.retry_after()
+        return 503, {"error": "ingest overloaded", "retry_after": retry_after}, [("retry-after", str(retry_after))]
+
+    try:
+        response = await batcher.submit(data)
+    except Exception:
+        if sequence is not None:
+            release_sequence(device_id, *sequence)
+        return 500, {"error": "Internal Server Error"}, []
+    if sequence is not None:
+        remember_response(device_id, *sequence, response)
+    return 200, response, []
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    headers += [(k.encode(), v.encode()) for k, v in extra_headers]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await batcher.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await batcher.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: POST /receive only."""
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    if scope["path"] != "/receive":
+        return await _send_json(send, 404, {"error": "Not found"})
+    if scope["method"] != "POST":
+        return await _send_json(send, 405, {"error": "Method not allowed"}, [("allow", "POST")])
+
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return await _send_json(send, 413, {"error": "Payload too large"})
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+    status, payload, extra_headers = await handle_receive(headers, b"".join(chunks))
+    await _send_json(send, status, payload, extra_headers)
+
+
+# ──────────────────────────── Minimal HTTP/1.1 server ────────────────────────────
+async def _write_response(writer, status, headers, body, keep_alive):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{k.decode('latin-1')}: {v.decode('latin-1')}" for k, v in headers]
+    lines.append(f"connection: {'keep-alive' if keep_alive else 'close'}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _handle_connection(asgi_app, reader, writer):
+    client = writer.get_extra_info("peername")
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT_SECONDS)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                return
+
+            request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ", 2)
+            except ValueError:
+                return
+            headers = []
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            header_map = dict(headers)
+
+            connection = header_map.get(b"connection", b"").lower()
+            keep_alive = connection != b"close" if version == "HTTP/1.1" else connection == b"keep-alive"
+            if b"chunked" in header_map.get(b"transfer-encoding", b"").lower():
+                await _write_response(writer, 411, [], b"", keep_alive=False)
+                return
+            raw_length = header_map.get(b"content-length", b"0")
+            if not raw_length.isdigit():            # Non-numeric or negative
+                await _write_response(writer, 400, [], b"", keep_alive=False)
+                return
+            length = int(raw_length)
+            if length > MAX_BODY_BYTES:
+                await _write_response(writer, 413, [], b"", keep_alive=False)
+                return
+            body = await reader.readexactly(length)
+
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": version.split("/")[-1],
+                "method": method.upper(), "scheme": "http", "path": path, "raw_path": path.encode(),
+                "query_string": query.encode(), "headers": headers, "client": client, "server": None,
+            }
+            response = {"status": 500, "headers": [], "body": []}
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = message.get("headers", [])
+                elif message["type"] == "http.response.body":
+                    response["body"].append(message.get("body", b""))
+
+            try:
+                await asgi_app(scope, receive, send)
+            except Exception as e:
+                logger.error(f"Unhandled error for {method} {path}: {e}")
+                response = {"status": 500, "headers": [], "body": []}
+            await _write_response(writer, response["status"], response["headers"], b"".join(response["body"]), keep_alive)
+            if not keep_alive:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def serve(host=INGEST_SERVER_HOST, port=INGEST_SERVER_PORT, asgi_app=app):
+    await batcher.start()
+    server = await asyncio.start_server(
+        lambda r, w: _handle_connection(asgi_app, r, w), host, port, limit=MAX_HEADER_BYTES
+    )
+    print(f"[INFO] Async ingest server listening on {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio /receive front end with batched DB writes.")
+    parser.add_argument("--host", default=INGEST_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=INGEST_SERVER_PORT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,31 @@
-from sqlalchemy.orm import Session
 from datetime import timedelta
-import pandas as pd
-from database_setup import SessionLocal, KalmanFilterFusionData
-
-# Start DB session
-session: Session = SessionLocal()
-
-# Step 1: Get latest timestamp
-latest_entry = session.query(KalmanFilterFusionData).order_by(
-    KalmanFilterFusionData.Timestamp.desc()
-).first()
-
-if latest_entry:
-    latest_timestamp = latest_entry.Timestamp
-    start_timestamp = latest_timestamp - timedelta(minutes=20)
-
-    # Step 2: Query data within the latest 20-minute window
-    results = session.query(KalmanFilterFusionData).filter(
-        KalmanFilterFusionData.Timestamp.between(start_timestamp, latest_timestamp)
-    ).order_by(KalmanFilterFusionData.Timestamp.asc()).all()
-
-    # Step 3: Convert to DataFrame
-    df = pd.DataFrame([{
-        "Timestamp": r.Timestamp,
-        f"{r.SensorID}": r.FusedValue
-    } for r in results])
-
-    # Step 4: Pivot based on SensorID (aggregated on Timestamp)
-    df_pivoted = df.pivot_table(
-        index="Timestamp",
-        aggfunc="first"  # If multiple values exist per sensor & timestamp, take the first
-    )
-
-    # Optional: sort columns by SensorID
-    df_pivoted = df_pivoted[sorted(df_pivoted.columns, key=int)]
-
-    # Step 5: Save to CSV
-    df_pivoted.to_csv("kalman_latest_20min_pivoted.csv")
-    print("✅ Pivoted CSV 'kalman_latest_20min_pivoted.csv' saved.")
-else:
-    print("⚠️ No data found in KalmanFilterFusionData.")
-
-# Step 6: Close DB session
-session.close()
+from data_utils.snapshot import snapshot_connect
+from data_utils.queries import fetch_latest_timestamp
+from data_utils.alignment import align_source, as_dataframe
+
+GRID_STEP_MS = 30_000       # Boards post every ~30 s
+TOLERANCE_MS = 30_000       # Carry a reading forward for at most one step
+
+# Analysis runs against a point-in-time snapshot so it never holds up /receive
+with snapshot_connect() as conn:
+    # Step 1: Get latest timestamp
+    latest_timestamp = fetch_latest_timestamp(conn, "kalman")
+
+    if latest_timestamp:
+        start_timestamp = latest_timestamp - timedelta(minutes=20)
+
+        # Step 2: Align every sensor in the latest 20-minute window onto one 30 s grid.
+        # Boards post a few ms apart, so pivoting on exact timestamps left NaN-filled rows.
+        grid, sensor_ids, matrix = align_source(
+            conn, "kalman", start_timestamp, latest_timestamp, GRID_STEP_MS,
+            method="ffill", tolerance_ms=TOLERANCE_MS
+        )
+
+        # Step 3: Convert to DataFrame, one column per SensorID
+        df_pivoted = as_dataframe(grid, sensor_ids, matrix)
+
+        # Step 4: Save to CSV
+        df_pivoted.to_csv("kalman_latest_20min_pivoted.csv")
+        print("✅ Pivoted CSV 'kalman_latest_20min_pivoted.csv' saved.")
+    else:
+        print("⚠️ No data found in KalmanFilterFusionData.")
@@ -10,6 +10,10 @@ from network_utils.sensor_storage import store_sensor_data
 from network_utils.fusion_utils import get_latest_fused_temperature_humidity, get_fused_values_by_sensors
 from network_utils.actions import action_based_on_sensor
 from network_utils.constants import soil_sensor_1id, soil_sensor_2id
+from network_utils.shared_board import publish_actuator_state, publish_after_commit
+from network_utils.dedup import (
+    parse_sequence, check_sequence, release_sequence, remember_response, cached_response, ACCEPTED
+)
 from database_setup import SessionLocal, Actuator
 from network_utils.user_control import handle_manual_control
 # Configure logging
@@ -33,10 +37,100 @@ def load_manual_control_state():
         }
 ### ⬛⬛⬛ END NEW ⬛⬛⬛
 
+# ──────────────────────────── Payload ────────────────────────────
+READING_TYPES = ("temperature", "humidity", "soil_moisture")
+
+
+def iter_payload_readings(data):
+    """
+    Yield (sensor_id, reading_type, value, filtered_value) for every usable reading.
+
+    The payload carries parallel lists: SensorID[i] pairs with temperature[i] /
+    filtered_temperature[i] etc. Readings that are missing or not > 0 are skipped.
+    """
+    for reading_type in READING_TYPES:
+        values = data.get(reading_type, [])
+        filtered_values = data.get(f"filtered_{reading_type}", [])
+        for i, sensor_id in enumerate(data.get("SensorID", [])):
+            if i < len(values) and i < len(filtered_values):
+                if values[i] > 0 and filtered_values[i] > 0:
+                    yield sensor_id, reading_type, values[i], filtered_values[i]
+
+
+def update_actuator_state(session, device_id, actuator_id, actuator_status, time):
+    actuator = session.query(Actuator).filter(Actuator.ActuatorID == actuator_id).first()
+    if actuator:
+        actuator.Status = actuator_status
+        actuator.LastUpdated = time
+        logger.info(f"Updated Actuator {actuator_id} to {actuator_status}")
+        session.commit()
+        publish_actuator_state(actuator_id, actuator_status, time)
+    else:
+        try:
+            new_actuator = Actuator(
+                ActuatorID=actuator_id,
+                ActuatorName=f"Auto_Actuator_{actuator_id}",
+                Status=actuator_status,
+                UserID=5000,  # Automatic control
+                DeviceID=device_id,
+                LastUpdated=time
+            )
+            session.add(new_actuator)
+            publish_after_commit(session, publish_actuator_state, actuator_id, actuator_status, time)
+            logger.info(f"Created new Actuator with ID {actuator_id} and status {actuator_status}")
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Failed to insert new actuator — error: {e}")
+
+
+def control_response(session):
+    """
+    Run manual or automatic control and build the reply sent back to the boards.
+
+    Returns (response, manual_mode).
+    """
+    manual_state = load_manual_control_state()
+
+    latest = get_latest_fused_temperature_humidity(session)
+    soil_data = get_fused_values_by_sensors(session, soil_sensor_1id, soil_sensor_2id)
+    avg_soil = sum(soil_data.values()) / len(soil_data) if soil_data else None
+
+    session.commit()
+    manual = manual_state.get("manual_mode") is True
+    if manual:
+        handle_manual_control()
+        actions = []
+        if manual_state.get("ventilation_actuator_state", "off") == "off":
+            actions.append("Ventilation_OFF")
+        if manual_state.get("ventilation_actuator_state", "on") == "on":
+            actions.append("Ventilation_ON")
+        if manual_state.get("irrigation_actuator_state", "on") == "on":
+            actions.append("Irrigation_ON")
+        if manual_state.get("irrigation_actuator_state", "off") == "off":
+            actions.append("Irrigation_OFF")
+        logger.info("[MODE] Manual mode active. Sending manual actuator states.")
+        action_result = ", ".join(actions)
+    else:
+        # Else: Automatic control
+        action_result = action_based_on_sensor()
+
+    response = {
+        "status": "success",
+        "action": action_result,
+        "temperature": latest.get("temperature"),
+        "humidity": latest.get("humidity"),
+        "soil_moisture": avg_soil
+    }
+    if manual:
+        print(response)
+    return response, manual
+
+
 def receive_sensor_data(request):
     if not authenticate_request(request):
         return jsonify({"error": "Unauthorized"}), 401
 
+    sequence = None
     try:
         data = request.get_json()
         print(f"Recived paylaod: {data}")
@@ -45,120 +139,42 @@ def receive_sensor_data(request):
 
         time = datetime.utcnow()
         device_id = data.get('DeviceID')
+
+        # Retried upload (same BootID/Seq)? Answer it again without touching the DB
+        sequence = parse_sequence(data)
+        if sequence is not None:
+            verdict = check_sequence(device_id, *sequence)
+            if verdict != ACCEPTED:
+                logger.info(f"Dropped {verdict} upload from DeviceID {device_id} (boot {sequence[0]}, seq {sequence[1]})")
+                cached = cached_response(device_id, *sequence)
+                return jsonify(cached or {"status": verdict}), 200
+
         device_name = data.get('DeviceName')
         actuator_id = data.get('ActuatorID')
         actuator_status = data.get('ActuatorState')
-        sensor_ids = data.get("SensorID", [])
-
-        temperatures = data.get("temperature", [])
-        filtered_temperatures = data.get("filtered_temperature", [])
-        humidities = data.get("humidity", [])
-        filtered_humidities = data.get("filtered_humidity", [])
-        soil_moistures = data.get("soil_moisture", [])
-        filtered_soil_moistures = data.get("filtered_soil_moisture", [])
 
         with SessionLocal() as session:
-            for i, sensor_id in enumerate(sensor_ids):
-                if i < len(temperatures) and i < len(filtered_temperatures):
-                    if temperatures[i] > 0 and filtered_temperatures[i] > 0:
-                        store_sensor_data(session, device_id, device_name, sensor_id,
-                                          temperature=temperatures[i],
-                                          filtered_temperature=filtered_temperatures[i],
-                                          timestamp=time)
-
-                if i < len(humidities) and i < len(filtered_humidities):
-                    if humidities[i] > 0 and filtered_humidities[i] > 0:
-                        store_sensor_data(session, device_id, device_name, sensor_id,
-                                          humidity=humidities[i],
-                                          filtered_humidity=filtered_humidities[i],
-                                          timestamp=time)
-
-                if i < len(soil_moistures) and i < len(filtered_soil_moistures):
-                    if soil_moistures[i] > 0 and filtered_soil_moistures[i] > 0:
-                        store_sensor_data(session, device_id, device_name, sensor_id,
-                                          soil_moisture=soil_moistures[i],
-                                          filtered_soil_moisture=filtered_soil_moistures[i],
-                                          timestamp=time)
-
+            for sensor_id, reading_type, value, filtered_value in iter_payload_readings(data):
+                store_sensor_data(session, device_id, device_name, sensor_id,
+                                  **{reading_type: value, f"filtered_{reading_type}": filtered_value},
+                                  timestamp=time)
                 logger.info(f"Received data from DeviceID: {device_id}, SensorID: {sensor_id}")
 
             # Handle actuator state
             if actuator_id is not None and actuator_status is not None:
-                actuator = session.query(Actuator).filter(Actuator.ActuatorID == actuator_id).first()
-                if actuator:
-                    actuator.Status = actuator_status
-                    actuator.LastUpdated = time
-                    logger.info(f"Updated Actuator {actuator_id} to {actuator_status}")
-                    session.commit()
-                else:
-                    try:
-                        new_actuator = Actuator(
-                            ActuatorID=actuator_id,
-                            ActuatorName=f"Auto_Actuator_{actuator_id}",
-                            Status=actuator_status,
-                            UserID=5000,  # Automatic control
-                            DeviceID=device_id,
-                            LastUpdated=time
-                        )
-                        session.add(new_actuator)
-                        logger.info(f"Created new Actuator with ID {actuator_id} and status {actuator_status}")
-                    except Exception as e:
-                        session.rollback()
-                        logger.warning(f"Failed to insert new actuator — error: {e}")
-
-            ### ⬛⬛⬛ START NEW ⬛⬛⬛
-            manual_state = load_manual_control_state()
-
-            latest = get_latest_fused_temperature_humidity(session)
-            soil_data = get_fused_values_by_sensors(session, soil_sensor_1id, soil_sensor_2id)
-            avg_soil = sum(soil_data.values()) / len(soil_data) if soil_data else None
-
-            session.commit()            
-            if manual_state.get("manual_mode") is True:
-                handle_manual_control()
-                actions = []
-                if manual_state.get("ventilation_actuator_state", "off") == "off":
-                    actions.append("Ventilation_OFF")
-                if manual_state.get("ventilation_actuator_state", "on") == "on":
-                    actions.append("Ventilation_ON")
-                if manual_state.get("irrigation_actuator_state", "on") == "on":
-                    actions.append("Irrigation_ON")
-                if manual_state.get("irrigation_actuator_state", "off") == "off":
-                    actions.append("Irrigation_OFF")
-                
-
-                logger.info("[MODE] Manual mode active. Sending manual actuator states.")
-                print("Belo")
-                print({
-                    "status": "success",
-                    "action": ", ".join(actions),
-                    "temperature": latest.get("temperature"),
-                    "humidity": latest.get("humidity"),
-                    "soil_moisture": avg_soil
-                })
-                return jsonify({
-                    "status": "success",
-                    "action": ", ".join(actions),
-                    "temperature": latest.get("temperature"),
-                    "humidity": latest.get("humidity"),
-                    "soil_moisture": avg_soil
-                }), 200
-            ### ⬛⬛⬛ END NEW ⬛⬛⬛
-
-            # Else: Automatic control
-            action_result = action_based_on_sensor()
-
-
-        sleep(5)  # Optional delay
-
-        return jsonify({
-            "status": "success",
-            "action": action_result,
-            "temperature": latest.get("temperature"),
-            "humidity": latest.get("humidity"),
-            "soil_moisture": avg_soil
-        }), 200
+                update_actuator_state(session, device_id, actuator_id, actuator_status, time)
+
+            response, manual = control_response(session)
+
+        if sequence is not None:
+            remember_response(device_id, *sequence, response)
+        if not manual:
+            sleep(5)  # Optional delay
+
+        return jsonify(response), 200
 
     except Exception as e:
         logger.error(f"Failed to receive/process sensor data: {e}")
+        if sequence is not None:
+            release_sequence(device_id, *sequence)
         return jsonify({"error": "Internal Server Error"}), 500
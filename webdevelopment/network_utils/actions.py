@@ -1,8 +1,8 @@
-from .fusion_utils import get_fused_values_by_sensors
+from .fusion_utils import get_fused_values_by_sensors, get_latest_weighted_value
 from .actuator_control import control_actuator
 from .config_handler import load_config
 from weightedAverage import process_weighted_fusion
-from database_setup import SessionLocal, WeightedAverageFusionData
+from database_setup import SessionLocal
 from .constants import *
 
 
@@ -37,21 +37,13 @@ def action_based_on_sensor(user_id=DEFAULT_USER_ID):
         process_weighted_fusion(sensor_ids=TEMP_SENSOR_IDS, weights=WEIGHTS, sensor_type="temperature")
         process_weighted_fusion(sensor_ids=HUM_SENSOR_IDS, weights=WEIGHTS, sensor_type="humidity")
 
-        # Get latest temperature
-        temperature_record = session.query(WeightedAverageFusionData) \
-            .filter(WeightedAverageFusionData.SensorType == "temperature") \
-            .order_by(WeightedAverageFusionData.Timestamp.desc()) \
-            .first()
-        temperature = temperature_record.FusedValue if temperature_record else None
+        # Get latest temperature (shared board, DB fallback)
+        temperature = get_latest_weighted_value(session, "temperature")
         if temperature is None:
             print("[WARNING] No temperature data found.")
 
-        # Get latest humidity
-        humidity_record = session.query(WeightedAverageFusionData) \
-            .filter(WeightedAverageFusionData.SensorType == "humidity") \
-            .order_by(WeightedAverageFusionData.Timestamp.desc()) \
-            .first()
-        humidity = humidity_record.FusedValue if humidity_record else None
+        # Get latest humidity (shared board, DB fallback)
+        humidity = get_latest_weighted_value(session, "humidity")
         if humidity is None:
             print("[WARNING] No humidity data found.")
 
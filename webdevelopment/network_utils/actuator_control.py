@@ -1,5 +1,6 @@
 from datetime import datetime
 from database_setup import Actuator, UserInteraction
+from .shared_board import publish_actuator_state
 
 def log_user_action(session, device_id, action, user_id, actuator_id):
     print("[DEBUG] actuator_control.py/log_user_action loaded successfully.")
@@ -24,5 +25,6 @@ def control_actuator(session, actuator_name, status, user_id):
             actuator.UserID = user_id
             log_user_action(session, actuator.ActuatorID, f"{actuator_name}_{status.lower()}", user_id, actuator.ActuatorID)
     session.commit()
+    publish_actuator_state(actuator.ActuatorID, actuator.Status, actuator.LastUpdated)
     print("[DEBUG] actuator_control.py/control_actuator loaded successfully [WORKED].")
     return actuator
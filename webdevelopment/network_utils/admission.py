@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from .constants import (
+    INGEST_MAX_CONCURRENT, INGEST_MAX_QUEUE, INGEST_QUEUE_TIMEOUT_SECONDS,
+    UI_MAX_CONCURRENT, UI_MAX_QUEUE, UI_QUEUE_TIMEOUT_SECONDS
+)
+
+# Admission control: each class of traffic gets a gate with a fixed number of
+# request slots and a bounded waiting line. When the line is full the request
+# is turned away at once with 429; when it waits longer than the queue timeout
+# it gets 503. Both carry a Retry-After estimated from the current line length
+# and the recent average service time. /receive and the UI have separate gates,
+# so a stalled DB backs up device uploads without taking the dashboard down.
+
+EWMA_ALPHA = 0.2        # Weight of the newest sample in the service-time average
+
+
+class Rejected(Exception):
+    def __init__(self, status, retry_after, reason):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionGate:
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.avg_service = 0.0
+        self.rejected = {429: 0, 503: 0}
+
+    def retry_after(self):
+        """Seconds until a new arrival would likely get a slot: line length × service time ÷ slots."""
+        estimate = (self.waiting + 1) * self.avg_service / self.max_concurrent
+        return max(1, math.ceil(estimate))
+
+    def _reject(self, status, reason):
+        self.rejected[status] += 1
+        return Rejected(status, self.retry_after(), reason)
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                return time.monotonic()
+            if self.waiting >= self.max_queue:
+                raise self._reject(429, f"{self.name} queue full")
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(503, f"{self.name} overloaded")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return time.monotonic()
+
+    def release(self, started):
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self.active -= 1
+            self.avg_service = elapsed if self.avg_service == 0 else \
+                (1 - EWMA_ALPHA) * self.avg_service + EWMA_ALPHA * elapsed
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "avg_service_ms": round(self.avg_service * 1000, 1),
+                "rejected": dict(self.rejected),
+            }
+
+
+ingest_gate = AdmissionGate("ingest", INGEST_MAX_CONCURRENT, INGEST_MAX_QUEUE, INGEST_QUEUE_TIMEOUT_SECONDS)
+ui_gate = AdmissionGate("ui", UI_MAX_CONCURRENT, UI_MAX_QUEUE, UI_QUEUE_TIMEOUT_SECONDS)
+
+INGEST_ENDPOINTS = {"receive_data"}
+UNGATED_ENDPOINTS = {"static"}
+
+
+def _gate_for(endpoint):
+    if endpoint in UNGATED_ENDPOINTS or endpoint is None:
+        return None
+    return ingest_gate if endpoint in INGEST_ENDPOINTS else ui_gate
+
+
+def install_admission_control(app):
+    """Put every request through the ingest or UI gate (static files skip both)."""
+
+    @app.before_request
+    def _admit():
+        gate = _gate_for(request.endpoint)
+        if gate is None:
+            return None
+        try:
+            g.admission = (gate, gate.acquire())
+        except Rejected as e:
+            print(f"[WARNING] {e.reason}: {e.status}, retry after {e.retry_after}s")
+            response = jsonify({"error": e.reason, "retry_after": e.retry_after})
+            response.status_code = e.status
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+        return None
+
+    @app.teardown_request
+    def _release(_exc):
+        admission = g.pop("admission", None)
+        if admission is not None:
+            gate, started = admission
+            gate.release(started)
+
+    @app.route("/api/admission")
+    def admission_stats():
+        return jsonify({"ingest": ingest_gate.stats(), "ui": ui_gate.stats()})
@@ -22,4 +22,55 @@ Irrigation_System_ESP_ID = 3000
 soil_sensor_1id = 2005
 soil_sensor_2id = 3005
 
+# Where raw readings go: "sqlite" (sensor_data table), "columnar" (append-only
+# segment files, see data_utils/columnar_store.py) or "both"
+SENSOR_STORAGE_BACKEND = "sqlite"
+COLUMNAR_STORE_DIR = "./columnar_store"
+
+# None keeps all time-series rows in greenhouse.db; "day" or "week" writes them to
+# per-period SQLite files under PARTITION_DIR (see data_utils/partitions.py)
+DB_PARTITION_MODE = None
+PARTITION_DIR = "./partitions"
+
+# Compressed per-sensor, per-day blocks of history past retention (see data_utils/archive.py)
+COLD_ARCHIVE_DIR = "./cold_archive"
+
+# Read-only point-in-time copy of greenhouse.db for analytics (see data_utils/snapshot.py)
+SNAPSHOT_PATH = "./snapshots/greenhouse_snapshot.db"
+SNAPSHOT_INTERVAL_SECONDS = 600
+SNAPSHOT_MAX_AGE_SECONDS = 900
+
+# Shared-memory board of latest readings/actuator states read by every worker (see shared_board.py)
+SHARED_BOARD_ENABLED = True
+SHARED_BOARD_NAME = "greenhouse_board"
+SHARED_BOARD_SLOTS = 256
+
+# "direct": every process writes to SQLite itself; "service": time-series rows go to the
+# single writer process (python -m data_utils.db_writer) over DB_WRITER_SOCKET
+DB_WRITER_MODE = "direct"
+DB_WRITER_SOCKET = "/tmp/greenhouse_writer.sock"
+
+# Admission control (see network_utils/admission.py): request slots, waiting-line length and
+# max wait for /receive, and a separate budget reserved for the UI/API endpoints
+INGEST_MAX_CONCURRENT = 8
+INGEST_MAX_QUEUE = 32
+INGEST_QUEUE_TIMEOUT_SECONDS = 2.0
+UI_MAX_CONCURRENT = 8
+UI_MAX_QUEUE = 32
+UI_QUEUE_TIMEOUT_SECONDS = 5.0
+
+# Asyncio ingest front end (ingest_server.py); beyond INGEST_MAX_PENDING queued payloads it answers 503
+INGEST_SERVER_HOST = "0.0.0.0"
+INGEST_SERVER_PORT = 5001
+INGEST_MAX_PENDING = 5000
+
+# Load + warm the YOLO model on a background thread at startup (True) or on first use (False)
+MODEL_PRELOAD = False
+
+# Background jobs for /start-cycle and /run (see network_utils/jobs.py): both share the car and
+# ./input, so one worker runs them in turn; more than JOB_MAX_QUEUED waiting jobs are refused
+JOB_WORKERS = 1
+JOB_MAX_QUEUED = 4
+JOB_HISTORY = 50
+
 print("[DEBUG] constants.py loaded successfully.")
@@ -0,0 +1,90 @@
+import threading
+
+# Duplicate-upload suppression for /receive.
+#
+# Boards that send "BootID" (random per power-up) and "Seq" (counting up from 0
+# each boot) get a sliding-window bitmap per device, as in IPsec/DTLS anti-replay:
+# bit i of `window` is set when sequence `highest - i` has been seen. Checking
+# and recording a sequence is a shift and a mask on one int, so retries are
+# dropped before any DB work. Payloads without the fields are always accepted.
+#
+# State lives in this process; with several workers a retry that lands on a
+# different worker is not caught.
+
+WINDOW_BITS = 1024
+_WINDOW_MASK = (1 << WINDOW_BITS) - 1
+
+ACCEPTED, DUPLICATE, TOO_OLD = "accepted", "duplicate", "too_old"
+
+
+class _DeviceWindow:
+    __slots__ = ("boot_id", "highest", "window", "last_response")
+
+    def __init__(self, boot_id, seq):
+        self.boot_id = boot_id
+        self.highest = seq
+        self.window = 1
+        self.last_response = None
+
+
+_windows = {}
+_lock = threading.Lock()
+
+
+def check_sequence(device_id, boot_id, seq):
+    """Record (boot_id, seq) for a device and say whether it is new, a duplicate, or outside the window."""
+    with _lock:
+        state = _windows.get(device_id)
+        if state is None or state.boot_id != boot_id:
+            _windows[device_id] = _DeviceWindow(boot_id, seq)
+            return ACCEPTED
+
+        if seq > state.highest:
+            state.window = ((state.window << (seq - state.highest)) | 1) & _WINDOW_MASK
+            state.highest = seq
+            return ACCEPTED
+
+        offset = state.highest - seq
+        if offset >= WINDOW_BITS:
+            return TOO_OLD
+        bit = 1 << offset
+        if state.window & bit:
+            return DUPLICATE
+        state.window |= bit
+        return ACCEPTED
+
+
+def release_sequence(device_id, boot_id, seq):
+    """Forget a sequence whose request failed, so the board's retry is processed."""
+    with _lock:
+        state = _windows.get(device_id)
+        if state is not None and state.boot_id == boot_id and 0 <= state.highest - seq < WINDOW_BITS:
+            state.window &= ~(1 << (state.highest - seq))
+
+
+def remember_response(device_id, boot_id, seq, response):
+    """Keep the reply to a device's newest sequence so a retry of it gets the same answer."""
+    with _lock:
+        state = _windows.get(device_id)
+        if state is not None and state.boot_id == boot_id and state.highest == seq:
+            state.last_response = (seq, response)
+
+
+def cached_response(device_id, boot_id, seq):
+    with _lock:
+        state = _windows.get(device_id)
+        if state is None or state.boot_id != boot_id or state.last_response is None:
+            return None
+        cached_seq, response = state.last_response
+        return response if cached_seq == seq else None
+
+
+def parse_sequence(data):
+    """(boot_id, seq) from a payload, or None when the board doesn't send them."""
+    boot_id, seq = data.get("BootID"), data.get("Seq")
+    if boot_id is None or seq is None:
+        return None
+    try:
+        return str(boot_id), int(seq)
+    except (TypeError, ValueError):
+        return None
@@ -1,14 +1,16 @@
 from database_setup import Device, Sensor
 from sqlalchemy.orm import Session
 
+# Both helpers only flush: the caller's commit (store_sensor_data, or a batching
+# caller such as ingest_server.write_payloads) decides when the rows become durable.
+
 def get_or_create_device(session: Session, device_id, device_name):
     print("[DEBUG] device_utils.py/get_or_create_device loaded successfully.")
     device = session.query(Device).filter_by(DeviceID=device_id).first()
     if not device:
         device = Device(DeviceID=device_id, DeviceName=device_name, Location="Unknown", Status="Active")
         session.add(device)
-        session.commit()
-        session.refresh(device)
+        session.flush()
     print("[DEBUG] device_utils.py/get_or_create_device[WORKED].")
     return device
 
@@ -20,14 +22,11 @@ def get_or_create_sensor(session: Session, sensor_id, device_id, sensor_type):
         # Create new sensor if none exists with this SensorID
         sensor = Sensor(SensorID=sensor_id, DeviceID=device_id, SensorType=sensor_type, Location="Unknown", Status="Active")
         session.add(sensor)
-        session.commit()
-        session.refresh(sensor)
-    else:
-        # Optionally update sensor_type or other fields if different
-        if sensor.SensorType != sensor_type:
-            sensor.SensorType = sensor_type
-            session.commit()
-    
+        session.flush()
+    # An existing sensor keeps its type: one SensorID carries several reading types
+    # (temperature, humidity, their filtered values), and rewriting it on every
+    # reading would turn each one into an UPDATE.
+
     print("[DEBUG] device_utils.py/get_or_create_sensor[WORKED].")
     return sensor
 
@@ -1,23 +1,38 @@
 from sqlalchemy import desc
 from database_setup import KalmanFilterFusionData, WeightedAverageFusionData
+from .shared_board import read_value, KIND_FUSED, KIND_WEIGHTED
+
+# Both lookups try the shared-memory board first and only query SQLite for
+# values no process has published yet (e.g. right after a restart).
 
 def get_fused_values_by_sensors(session, *sensor_ids):
     print("[DEBUG] fusion_utils.py/get_fused_values_by_sensors loaded successfully.")
     print(f"[DEBUG] fusion_utils.py/get_fused_values_by_sensors called with sensor_ids: {sensor_ids}")
     fused = {}
     for sensor_id in sensor_ids:
+        value = read_value(KIND_FUSED, sensor_id)
+        if value is not None:
+            fused[sensor_id] = value
+            continue
         fusion = session.query(KalmanFilterFusionData).filter_by(SensorID=sensor_id).order_by(desc(KalmanFilterFusionData.Timestamp)).first()
         if fusion:
             fused[sensor_id] = fusion.FusedValue
     print("[DEBUG] fusion_utils.py/get_fused_values_by_sensors [WORKED].")
     return fused
 
+def get_latest_weighted_value(session, sensor_type):
+    value = read_value(KIND_WEIGHTED, sensor_type)
+    if value is not None:
+        return value
+    record = session.query(WeightedAverageFusionData).filter_by(SensorType=sensor_type).order_by(desc(WeightedAverageFusionData.Timestamp)).first()
+    return record.FusedValue if record else None
+
 def get_latest_fused_temperature_humidity(session):
     print("[DEBUG] fusion_utils.py/get_latest_fused_temperature_humidity loaded successfully.")
-    temp = session.query(WeightedAverageFusionData).filter_by(SensorType="temperature").order_by(desc(WeightedAverageFusionData.Timestamp)).first()
-    hum = session.query(WeightedAverageFusionData).filter_by(SensorType="humidity").order_by(desc(WeightedAverageFusionData.Timestamp)).first()
+    temp = get_latest_weighted_value(session, "temperature")
+    hum = get_latest_weighted_value(session, "humidity")
     print("[DEBUG] fusion_utils.py/get_latest_fused_temperature_humidity [WORKED].")
     return {
-        "temperature": temp.FusedValue if temp else None,
-        "humidity": hum.FusedValue if hum else None
+        "temperature": temp,
+        "humidity": hum
     }
@@ -0,0 +1,178 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, jsonify
+
+from .constants import JOB_WORKERS, JOB_MAX_QUEUED, JOB_HISTORY
+
+# Managed background jobs for the long vision tasks (/start-cycle, /run).
+#
+# Jobs run on a small bounded pool instead of a bare thread per click. Each job
+# has a key; submitting a key that is already queued or running returns that
+# job instead of starting a second one (single-flight), so a double click can't
+# launch two cycles fighting over the car and ./input. Job functions receive
+# the Job and use job.progress(done, total) and job.cancel_requested() to
+# report progress and stop early; /api/jobs shows status, progress and timings.
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, func, args, kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.state = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def progress(self, done, total=None, message=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def cancel_event(self):
+        return self._cancel
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            "id": self.id,
+            "key": self.key,
+            "state": self.state,
+            "done": self.done,
+            "total": self.total,
+            "percent": round(100 * self.done / self.total, 1) if self.total else None,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "cancel_requested": self._cancel.is_set(),
+            "queued_seconds": round((self.started_at or now) - self.created_at, 3),
+            "run_seconds": None if self.started_at is None else round((self.finished_at or now) - self.started_at, 3),
+        }
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.max_queued = max_queued
+        self.history = history
+        self._jobs = OrderedDict()          # id -> Job, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        Queue func(job, *args, **kwargs) under `key`. Returns (job, created); when a job
+        with the same key is still queued or running, that job is returned with created=False.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.state in ACTIVE_STATES:
+                    return job, False
+            if sum(job.state == QUEUED for job in self._jobs.values()) >= self.max_queued:
+                raise JobQueueFull(f"{self.max_queued} jobs already waiting")
+            job = Job(key, func, args, kwargs)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        print(f"[INFO] Job {job.id} ({key}) queued.")
+        return job, True
+
+    def _run(self, job):
+        with self._lock:
+            if job.state == CANCELLED:
+                return
+            job.state = RUNNING
+            job.started_at = time.time()
+        try:
+            result = job.func(job, *job.args, **job.kwargs)
+            state = CANCELLED if job.cancel_requested() else SUCCEEDED
+            job.result = result
+        except Exception as e:
+            print(f"[ERROR] Job {job.id} ({job.key}) failed: {e}")
+            state, job.error = FAILED, str(e)
+        with self._lock:
+            job.state = state
+            job.finished_at = time.time()
+        print(f"[INFO] Job {job.id} ({job.key}) {state} in {job.finished_at - job.started_at:.1f}s.")
+
+    def cancel(self, job_id):
+        """Ask a job to stop; a queued job is dropped at once. Returns the job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state in ACTIVE_STATES:
+                job.cancel_event.set()
+            if job.state == QUEUED:
+                job.state = CANCELLED
+                job.finished_at = time.time()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, key=None):
+        with self._lock:
+            return [j for j in self._jobs.values() if j.state in ACTIVE_STATES and (key is None or j.key == key)]
+
+    def jobs(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state not in ACTIVE_STATES]
+        for job_id in itertools.islice(finished, max(0, len(finished) - self.history)):
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
+
+# ──────────────────────────── Status API ────────────────────────────
+jobs_bp = Blueprint('jobs', __name__)
+
+
+@jobs_bp.route("/api/jobs")
+def list_jobs():
+    return jsonify([job.to_dict() for job in job_manager.jobs()])
+
+
+@jobs_bp.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+@jobs_bp.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
@@ -1,21 +1,30 @@
 from datetime import datetime
-from database_setup import SensorData, KalmanFilterFusionData
 from .device_utils import get_or_create_device, get_or_create_sensor
+from .constants import SENSOR_STORAGE_BACKEND
+from .shared_board import publish_after_commit, publish_sensor_value, publish_fused_value
+from data_utils.columnar_store import get_store
+from data_utils.db_writer import add_series_row
 
 def store_sensor_value(session, sensor, value, time):
     print("[DEBUG] sensor_storage.py/store_sensor_value loaded successfully.")
-    session.add(SensorData(SensorID=sensor.SensorID, Value=value, Timestamp=time))
+    if SENSOR_STORAGE_BACKEND in ("columnar", "both"):
+        # Appended once the session commits, like the board updates: the segment files can't be rolled back
+        publish_after_commit(session, get_store().append, sensor.SensorID, time or datetime.utcnow(), value)
+    if SENSOR_STORAGE_BACKEND in ("sqlite", "both"):
+        add_series_row(session, "sensor_data", {"SensorID": sensor.SensorID, "Value": value, "Timestamp": time or datetime.utcnow()})
+    publish_after_commit(session, publish_sensor_value, sensor.SensorID, value, time)
     print("[DEBUG] sensor_storage.py/store_sensor_value [WORKED].")
 
 def store_sensor_fused_value(session, sensor, value, time):
     print("[DEBUG] sensor_storage.py/store_sensor_fused_value loaded successfully.")
-    session.add(KalmanFilterFusionData(SensorID=sensor.SensorID, FusedValue=value, Timestamp=time))
+    add_series_row(session, "kalman_filter_fusion", {"SensorID": sensor.SensorID, "FusedValue": value, "Timestamp": time or datetime.utcnow()})
+    publish_after_commit(session, publish_fused_value, sensor.SensorID, value, time)
     print("[DEBUG] sensor_storage.py/store_sensor_fused_value [WORKED].")
 
 def store_sensor_data(session, device_id, device_name, sensor_id,
                       temperature=None, filtered_temperature=None,
                       humidity=None, filtered_humidity=None,
-                      soil_moisture=None, filtered_soil_moisture=None, timestamp=None):
+                      soil_moisture=None, filtered_soil_moisture=None, timestamp=None, commit=True):
     get_or_create_device(session, device_id, device_name)
     print("[DEBUG] sensor_storage.py/store_sensor_data loaded successfully.")
     if temperature is not None:
@@ -36,5 +45,6 @@ def store_sensor_data(session, device_id, device_name, sensor_id,
     if filtered_soil_moisture is not None:
         sensor = get_or_create_sensor(session, sensor_id, device_id, "soil_moisture_filtered")
         store_sensor_fused_value(session, sensor, filtered_soil_moisture, timestamp)
-    session.commit()
+    if commit:  # Batching callers commit many readings at once
+        session.commit()
     print("[DEBUG] sensor_storage.py/store_sensor_data [WORKED].")
\ No newline at end of file
@@ -0,0 +1,230 @@
+import fcntl
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .constants import SHARED_BOARD_ENABLED, SHARED_BOARD_NAME, SHARED_BOARD_SLOTS
+
+# Cross-process board of the latest readings and actuator states.
+#
+# Every worker process maps the same multiprocessing.shared_memory block, laid
+# out as a NumPy structured array of fixed-size slots. A slot is found by
+# hashing (kind, key) and probing linearly, so no process needs a directory.
+#
+# Each slot is guarded by a seqlock: the writer makes `seq` odd, writes the
+# fields and makes it even again; a reader copies the slot and retries if seq
+# was odd or changed meanwhile. Readers never block and never touch SQLite.
+# Writers from different processes are serialised by an flock on a lock file.
+#
+# The block outlives the processes that use it, so every process holds a shared
+# flock on ATTACH_PATH while it has the board mapped. The first process to map
+# it after all of them have exited (i.e. the app was restarted) can take that
+# lock exclusively, and recreates the block empty so no stale values survive.
+#
+# Values backed by a database row are published with publish_after_commit, so
+# the board never shows a reading or state that was rolled back.
+
+KIND_EMPTY, KIND_RAW, KIND_FUSED, KIND_WEIGHTED, KIND_ACTUATOR = 0, 1, 2, 3, 4
+KIND_NAMES = {KIND_RAW: "raw", KIND_FUSED: "fused", KIND_WEIGHTED: "weighted", KIND_ACTUATOR: "actuators"}
+
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("kind", "<u8"),
+    ("ts_ms", "<i8"),
+    ("value", "<f8"),
+    ("key", "S24"),
+    ("text", "S16"),        # Actuator status ("on", "off", ...)
+])
+READ_RETRIES = 100
+LOCK_PATH = os.path.join(tempfile.gettempdir(), f"{SHARED_BOARD_NAME}.lock")
+ATTACH_PATH = os.path.join(tempfile.gettempdir(), f"{SHARED_BOARD_NAME}.attached")
+
+
+class SharedBoard:
+    def __init__(self, name=SHARED_BOARD_NAME, slots=SHARED_BOARD_SLOTS):
+        size = slots * SLOT_DTYPE.itemsize
+        self._attach_file = open(ATTACH_PATH, "a")
+        try:
+            fcntl.flock(self._attach_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._discard_stale(name)           # Nobody else has it mapped: left over from a previous run
+        except BlockingIOError:
+            pass
+        fcntl.flock(self._attach_file, fcntl.LOCK_SH)  # Held for as long as this process uses the board
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+        # Workers come and go; don't let the resource tracker unlink the block
+        # when the process that happened to create it exits.
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.slots = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=self.shm.buf)
+        self._lock_file = open(LOCK_PATH, "a")
+
+    @staticmethod
+    def _discard_stale(name):
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        stale.close()
+        stale.unlink()
+        print("[INFO] Cleared the shared board left over from a previous run.")
+
+    # ──────────────────────────── Slot lookup ────────────────────────────
+    def _probe(self, kind, key):
+        start = zlib.crc32(b"%d:%s" % (kind, key)) % len(self.slots)
+        for i in range(len(self.slots)):
+            yield (start + i) % len(self.slots)
+
+    def _find(self, kind, key):
+        for index in self._probe(kind, key):
+            slot_kind = int(self.slots["kind"][index])
+            if slot_kind == KIND_EMPTY:
+                return None
+            if slot_kind == kind and self.slots["key"][index] == key:
+                return index
+        return None
+
+    # ──────────────────────────── Writes ────────────────────────────
+    def publish(self, kind, key, value=None, timestamp=None, text=None):
+        """Store the latest value for (kind, key); older timestamps than the current one are ignored."""
+        key = str(key).encode()
+        ts_ms = timestamp if isinstance(timestamp, int) else \
+            int(np.datetime64(timestamp or datetime.utcnow(), "ms").astype(np.int64))
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            index = self._find(kind, key)
+            if index is None:
+                index = next((i for i in self._probe(kind, key) if self.slots["kind"][i] == KIND_EMPTY), None)
+                if index is None:
+                    print(f"[WARNING] Shared board full; dropping {KIND_NAMES[kind]} {key.decode()}")
+                    return False
+            elif self.slots["ts_ms"][index] > ts_ms:
+                return False
+
+            slot = self.slots[index:index + 1]
+            seq = int(slot["seq"][0])
+            slot["seq"] = seq + 1                   # Odd: write in progress
+            slot["ts_ms"] = ts_ms
+            slot["value"] = np.nan if value is None else value
+            slot["key"] = key
+            slot["text"] = (text or "").encode()[:16]
+            slot["kind"] = kind                     # Set last: claims the slot for lookups
+            slot["seq"] = seq + 2
+            return True
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ──────────────────────────── Reads ────────────────────────────
+    def _read_slot(self, index):
+        for _ in range(READ_RETRIES):
+            before = int(self.slots["seq"][index])
+            if before % 2 == 0:
+                copy = self.slots[index].copy()
+                if int(self.slots["seq"][index]) == before:
+                    return copy
+            time.sleep(0)
+        return None
+
+    def read(self, kind, key):
+        """{"value", "ts_ms", "text"} for (kind, key), or None when nothing was published."""
+        index = self._find(kind, str(key).encode())
+        if index is None:
+            return None
+        slot = self._read_slot(index)
+        if slot is None:
+            return None
+        return {
+            "value": None if np.isnan(slot["value"]) else float(slot["value"]),
+            "ts_ms": int(slot["ts_ms"]),
+            "text": slot["text"].decode() or None,
+        }
+
+    def snapshot(self):
+        """Every published entry grouped by kind: {"raw": {key: {...}}, "fused": ..., ...}."""
+        board = {name: {} for name in KIND_NAMES.values()}
+        for index in np.flatnonzero(self.slots["kind"] != KIND_EMPTY):
+            slot = self._read_slot(int(index))
+            if slot is None or int(slot["kind"]) not in KIND_NAMES:
+                continue
+            board[KIND_NAMES[int(slot["kind"])]][slot["key"].decode()] = {
+                "value": None if np.isnan(slot["value"]) else float(slot["value"]),
+                "ts_ms": int(slot["ts_ms"]),
+                "text": slot["text"].decode() or None,
+            }
+        return board
+
+
+_board = None
+
+
+def get_board():
+    """This process's mapping of the board, or None when disabled/unavailable (callers fall back to the DB)."""
+    global _board
+    if not SHARED_BOARD_ENABLED:
+        return None
+    if _board is None:
+        try:
+            _board = SharedBoard()
+        except Exception as e:
+            print(f"[WARNING] Shared board unavailable: {e}")
+            return None
+    return _board
+
+
+# ──────────────────────────── Convenience ────────────────────────────
+def _publish(kind, key, value=None, timestamp=None, text=None):
+    board = get_board()
+    if board is not None:
+        try:
+            board.publish(kind, key, value, timestamp, text)
+        except Exception as e:
+            print(f"[WARNING] Shared board publish failed: {e}")
+
+
+def publish_after_commit(session, publish, *args):
+    """Call publish(*args) once `session` commits; dropped if it rolls back instead."""
+    if not session.in_transaction():
+        session.connection()            # Begin one now, or a rollback() before any query would go unnoticed
+    session.info.setdefault("board_updates", []).append((publish, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for publish, args in session.info.pop("board_updates", ()):
+        publish(*args)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back(session, previous_transaction):
+    session.info.pop("board_updates", None)
+
+
+def publish_sensor_value(sensor_id, value, timestamp=None):
+    _publish(KIND_RAW, sensor_id, value, timestamp)
+
+
+def publish_fused_value(sensor_id, value, timestamp=None):
+    _publish(KIND_FUSED, sensor_id, value, timestamp)
+
+
+def publish_weighted_value(sensor_type, value, timestamp=None):
+    _publish(KIND_WEIGHTED, sensor_type, value, timestamp)
+
+
+def publish_actuator_state(actuator_id, status, timestamp=None):
+    _publish(KIND_ACTUATOR, actuator_id, timestamp=timestamp, text=status)
+
+
+def read_value(kind, key):
+    """Latest published value for (kind, key), or None if the board is off or has none."""
+    board = get_board()
+    entry = board.read(kind, key) if board is not None else None
+    return entry["value"] if entry else None
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, jsonify
-from .fusion_utils import get_fused_values_by_sensors
-from database_setup import SessionLocal, WeightedAverageFusionData
+from .fusion_utils import get_fused_values_by_sensors, get_latest_weighted_value
+from .shared_board import get_board
+from database_setup import SessionLocal
 from .constants import soil_sensor_1id, soil_sensor_2id
 
 status_bp = Blueprint('status', __name__)
@@ -29,25 +30,13 @@ def latest_fused_values():
                 print("[WARNING] No valid soil moisture readings found.")
 
             # --- Latest Temperature ---
-            temp_record = session.query(WeightedAverageFusionData)\
-                .filter(WeightedAverageFusionData.SensorType == "temperature")\
-                .order_by(WeightedAverageFusionData.Timestamp.desc())\
-                .first()
-
-            if temp_record:
-                temperature = temp_record.FusedValue
-            else:
+            temperature = get_latest_weighted_value(session, "temperature")
+            if temperature is None:
                 print("[WARNING] No temperature data found.")
 
             # --- Latest Humidity ---
-            hum_record = session.query(WeightedAverageFusionData)\
-                .filter(WeightedAverageFusionData.SensorType == "humidity")\
-                .order_by(WeightedAverageFusionData.Timestamp.desc())\
-                .first()
-
-            if hum_record:
-                humidity = hum_record.FusedValue
-            else:
+            humidity = get_latest_weighted_value(session, "humidity")
+            if humidity is None:
                 print("[WARNING] No humidity data found.")
 
     except Exception as e:
@@ -58,3 +47,12 @@ def latest_fused_values():
         "humidity": humidity,
         "soil_moisture": soil_moisture
     })
+
+
+@status_bp.route("/api/live-state")
+def live_state():
+    """Everything on the shared-memory board: latest raw/fused/weighted values and actuator states."""
+    board = get_board()
+    if board is None:
+        return jsonify({"error": "Shared board disabled"}), 503
+    return jsonify(board.snapshot())
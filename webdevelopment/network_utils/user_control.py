@@ -1,5 +1,6 @@
 from datetime import datetime
 from database_setup import UserInteraction, SessionLocal, Actuator
+from .shared_board import publish_actuator_state
 
 ### ⬛⬛⬛ START NEW IMPORTS ⬛⬛⬛
 import os
@@ -58,6 +59,8 @@ def handle_manual_control(_=None):  # Payload ignored now
                 ))
 
             session.commit()
+            for update in actuator_updates:
+                publish_actuator_state(update["actuator_id"], update["action"], time)
             return {"status": "success", "message": "Manual actuator states synced from JSON."}
 
     except Exception as e:
@@ -0,0 +1,128 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The app resolves greenhouse.db, ./columnar_store, ./cold_archive etc. relative
+# to the working directory, so the whole test session runs in a scratch
+# directory: importing database_setup creates an empty greenhouse.db there
+# instead of touching the real one.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(tempfile.mkdtemp(prefix="greenhouse_tests_"))
+
+
+@pytest.fixture
+def db():
+    """The app's engine over an emptied test database (and no archived or columnar samples)."""
+    from database_setup import Base, engine
+    from network_utils.constants import COLD_ARCHIVE_DIR, COLUMNAR_STORE_DIR
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    for directory in (COLD_ARCHIVE_DIR, COLUMNAR_STORE_DIR):
+        shutil.rmtree(directory, ignore_errors=True)
+    return engine
+
+
+@pytest.fixture
+def add_rows(db):
+    """add_rows(source, [(key, timestamp, value), ...]) inserts readings into that source's table."""
+    from data_utils.queries import SOURCES
+
+    def add(source, rows):
+        table, key_col, value_col = SOURCES[source]
+        with db.begin() as conn:
+            conn.execute(table.insert(), [
+                {key_col.name: key, "Timestamp": timestamp, value_col.name: value}
+                for key, timestamp, value in rows
+            ])
+
+    return add
+
+
+@pytest.fixture
+def day_partitions(db, monkeypatch, tmp_path):
+    """Daily partitions under tmp_path (at most two attached at once, to exercise batching)."""
+    from data_utils import partitions
+
+    monkeypatch.setattr(partitions, "DB_PARTITION_MODE", "day")
+    monkeypatch.setattr(partitions, "PARTITION_DIR", str(tmp_path / "partitions"))
+    monkeypatch.setattr(partitions, "MAX_ATTACHED", 2)      # Force several attach batches
+    monkeypatch.setattr(partitions, "_engines", {})
+    yield
+    for key in list(partitions._engines):
+        partitions._engines.pop(key).dispose()
+
+
+@pytest.fixture
+def fake_yolo(monkeypatch, tmp_path):
+    """
+    A ModelManager whose weights load through a stand-in `ultralytics` module.
+
+    The stand-in "detects" leaf_blight (conf 0.9) on bright frames and nothing on
+    dark ones; `manager.yolo_calls` lists the batch size of every model call.
+    """
+    import types
+    from RC_Plant_desiease.model_manager import ModelManager
+
+    calls = []
+
+    class Value:
+        def __init__(self, value):
+            self.value = value
+
+        def item(self):
+            return self.value
+
+    class Box:
+        def __init__(self):
+            self.xyxy = [[1, 2, 30, 40]]
+            self.conf = [Value(0.9)]
+            self.cls = [Value(1)]
+
+    class Result:
+        def __init__(self, frame):
+            self.boxes = [Box()] if frame.mean() > 127 else []
+
+    class YOLO:
+        names = {0: "healthy", 1: "leaf_blight"}
+
+        def __init__(self, path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+
+        def __call__(self, frames, verbose=True):
+            batch = frames if isinstance(frames, list) else [frames]
+            calls.append(len(batch))
+            return [Result(frame) for frame in batch]
+
+    monkeypatch.setitem(sys.modules, "ultralytics", types.SimpleNamespace(YOLO=YOLO))
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights v1")
+    manager = ModelManager(str(weights))
+    manager.yolo_calls = calls
+    return manager
+
+
+@pytest.fixture
+def ai_model(monkeypatch, tmp_path, fake_yolo, db):
+    """
+    RC_Plant_desiease.AI_model wired to fake_yolo, a fresh inference cache under
+    tmp_path and a fresh frame deduplicator. Thumbnails are not rendered;
+    `module.thumbnails` lists the paths that would have been queued.
+    """
+    from RC_Plant_desiease import AI_model
+    from RC_Plant_desiease.frame_dedup import FrameDeduplicator
+    from RC_Plant_desiease.inference_cache import InferenceCache
+
+    thumbnails = []
+    monkeypatch.setattr(AI_model, "model_manager", fake_yolo)
+    monkeypatch.setattr(AI_model, "inference_cache", InferenceCache(str(tmp_path / "inference_cache")))
+    monkeypatch.setattr(AI_model, "frame_deduplicator", FrameDeduplicator())
+    monkeypatch.setattr(AI_model, "queue_thumbnail", thumbnails.append)
+    monkeypatch.setattr(AI_model, "thumbnails", thumbnails, raising=False)
+    return AI_model
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from network_utils import admission
+from network_utils.admission import AdmissionGate, Rejected, install_admission_control
+
+
+def test_admits_up_to_the_slot_count():
+    gate = AdmissionGate("test", max_concurrent=2, max_queue=0, queue_timeout=1)
+    first, second = gate.acquire(), gate.acquire()
+    with pytest.raises(Rejected) as rejected:
+        gate.acquire()
+    assert rejected.value.status == 429 and rejected.value.retry_after >= 1
+    gate.release(first)
+    gate.release(second)
+    assert gate.stats()["active"] == 0 and gate.stats()["rejected"] == {429: 1, 503: 0}
+
+
+def test_waiting_request_times_out_with_503():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    started = gate.acquire()
+    with pytest.raises(Rejected) as rejected:
+        gate.acquire()
+    assert rejected.value.status == 503
+    assert gate.waiting == 0
+    gate.release(started)
+
+
+def test_waiting_request_gets_the_released_slot():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+    started = gate.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(gate.acquire()))
+    waiter.start()
+    while gate.waiting == 0:
+        time.sleep(0.001)
+    with pytest.raises(Rejected):                   # The line (of one) is full
+        gate.acquire()
+    gate.release(started)
+    waiter.join(timeout=5)
+    assert admitted and gate.active == 1
+    gate.release(admitted[0])
+
+
+def test_retry_after_follows_the_line_and_service_time():
+    gate = AdmissionGate("test", max_concurrent=2, max_queue=10, queue_timeout=1)
+    gate.avg_service = 4.0
+    gate.waiting = 3
+    assert gate.retry_after() == 8                  # (3 + 1) × 4 s ÷ 2 slots
+    gate.release(time.monotonic() - 2.0)            # EWMA moves toward the new 2 s sample
+    assert gate.avg_service == pytest.approx(0.8 * 4.0 + 0.2 * 2.0, abs=0.01)
+
+
+def test_ui_stays_available_while_ingest_is_saturated(monkeypatch):
+    monkeypatch.setattr(admission, "ingest_gate", AdmissionGate("ingest", 1, 0, 0.05))
+    monkeypatch.setattr(admission, "ui_gate", AdmissionGate("ui", 1, 0, 0.05))
+    app = Flask(__name__)
+    install_admission_control(app)
+
+    @app.route("/receive", methods=["POST"])
+    def receive_data():
+        return "ok"
+
+    @app.route("/dashboard")
+    def dashboard():
+        return "ok"
+
+    client = app.test_client()
+    held = admission.ingest_gate.acquire()         # A stalled upload holds the only ingest slot
+    response = client.post("/receive")
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert client.get("/dashboard").status_code == 200
+    admission.ingest_gate.release(held)
+    assert client.post("/receive").status_code == 200
+    assert admission.ui_gate.stats()["active"] == 0          # Released on teardown
+    assert client.get("/api/admission").get_json()["ingest"]["rejected"]["429"] == 1
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from data_utils.alignment import (
+    align_many, align_series, align_source, datetime_to_ms, iter_aligned, make_grid, ms_to_datetimes, parse_duration
+)
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+
+
+def test_parse_duration():
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration("30s") == 30
+    assert parse_duration("15m") == 900
+    assert parse_duration("2h") == 7200
+    assert parse_duration("1d") == 86400
+    assert parse_duration("90") == 90
+    assert parse_duration(None, default="1h") == 3600
+    with pytest.raises(ValueError):
+        parse_duration("0s")
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_datetime_ms_round_trip():
+    stamp = T0 + timedelta(milliseconds=123)
+    assert ms_to_datetimes([datetime_to_ms(stamp)]) == [stamp]
+
+
+def test_make_grid_snaps_to_step():
+    assert make_grid(1050, 1400, 100).tolist() == [1000, 1100, 1200, 1300, 1400]
+
+
+def test_ffill_respects_tolerance():
+    grid = np.array([0, 1000, 2000, 3000, 4000])
+    out = align_series(grid, [900, 2500], [1.0, 2.0], method="ffill", tolerance_ms=600)
+    np.testing.assert_array_equal(out, [np.nan, 1.0, np.nan, 2.0, np.nan])
+    np.testing.assert_array_equal(align_series(grid, [900, 2500], [1.0, 2.0]), [np.nan, 1.0, 1.0, 2.0, 2.0])
+
+
+def test_linear_interpolates_between_neighbours():
+    grid = np.array([0, 1000, 1500, 2000, 5000])
+    out = align_series(grid, [1000, 2000, 3000], [10.0, 20.0, 40.0], method="linear", tolerance_ms=1000)
+    np.testing.assert_array_equal(out, [np.nan, 10.0, 15.0, 20.0, np.nan])
+
+
+def test_empty_series_and_unknown_method():
+    grid = np.array([0, 1000])
+    assert np.isnan(align_series(grid, [], [])).all()
+    with pytest.raises(ValueError):
+        align_series(grid, [0], [1.0], method="cubic")
+
+
+def test_align_many_lines_up_drifting_boards():
+    grid = make_grid(0, 3000, 1000)
+    keys, matrix = align_many(grid, [
+        ("a", [0, 1000, 2000, 3000], [1.0, 2.0, 3.0, 4.0]),
+        ("b", [-4, 996, 1997, 2995], [5.0, 6.0, 7.0, 8.0]),       # A few ms ahead of the grid
+    ], tolerance_ms=50)
+    assert keys == ["a", "b"]
+    np.testing.assert_array_equal(matrix[:, 0], [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(matrix[:, 1], [5.0, 6.0, 7.0, 8.0])
+
+
+def test_align_source_windows_match_one_pass(db, add_rows):
+    add_rows("kalman", [(2001, T0 + timedelta(seconds=s, milliseconds=7), float(s)) for s in range(0, 60, 5)]
+             + [(2003, T0 + timedelta(seconds=s), 100.0 + s) for s in range(0, 60, 10)])
+    end = T0 + timedelta(minutes=1)
+    with db.connect() as conn:
+        grid, keys, matrix = align_source(conn, "kalman", T0, end, 5000, tolerance_ms=5000)
+        windows = list(iter_aligned(conn, "kalman", T0, end, 5000, tolerance_ms=5000, window_points=4))
+    assert keys == [2001, 2003]
+    assert len(grid) == 13 and grid[0] == datetime_to_ms(T0)
+    assert matrix[1].tolist() == [0.0, 100.0]                   # 10:00:05 ← 10:00:00.007 / 10:00:00
+    assert matrix[2].tolist() == [5.0, 110.0]
+    assert len(windows) == 4
+    np.testing.assert_array_equal(np.concatenate([w[0] for w in windows]), grid)
+    np.testing.assert_array_equal(np.vstack([w[2] for w in windows]), matrix)
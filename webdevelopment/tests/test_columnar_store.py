@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from data_utils import columnar_store, queries
+from data_utils.columnar_store import ColumnarStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ColumnarStore(str(tmp_path / "store"))
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    ts = np.arange(1_000_000, 1_010_000, 10, dtype=np.int64)
+    for t, v in zip(ts.tolist(), np.linspace(0, 1, len(ts)).tolist()):
+        store.append(2001, t, v)
+    store.append(2001, datetime(1970, 1, 1, 0, 16, 50), 2.5)      # datetimes are stored as epoch-ms
+
+    got_ts, got_vals = store.read_range(2001)
+    assert got_ts.tolist() == ts.tolist() + [1_010_000]
+    np.testing.assert_array_equal(got_vals[:-1], np.linspace(0, 1, len(ts)).astype(np.float32))
+    assert got_vals[-1] == 2.5
+
+    part_ts, part_vals = store.read_range(2001, 1_000_500, 1_000_530)
+    assert part_ts.tolist() == [1_000_500, 1_000_510, 1_000_520, 1_000_530]
+    assert isinstance(part_ts.base, np.memmap)              # A view on the mapped file, no copy
+    assert store.read_range(2001, 0, 10)[0].size == 0
+    assert store.read_range(9999)[0].size == 0
+    assert store.sensor_ids() == [2001]
+
+
+def test_out_of_order_and_full_segments_roll_over(store, monkeypatch):
+    monkeypatch.setattr(columnar_store, "SEGMENT_ROWS", 4)
+    for t in (10, 20, 30, 40, 50, 5, 60):
+        store.append(1, t, float(t))
+    segments = store._segments(1)
+    assert [(s.first_ts, s.rows) for s in segments] == [(5, 2), (10, 4), (50, 1)]  # 60 follows 5
+    ts, vals = store.read_range(1)
+    assert ts.tolist() == [5, 10, 20, 30, 40, 50, 60]
+    assert vals.tolist() == [5.0, 10.0, 20.0, 30.0, 40.0, 50.0, 60.0]
+
+
+def test_reopen_drops_half_written_tail(store):
+    for t in range(5):
+        store.append(1, t, float(t))
+    store.close()
+    base = store._segments(1)[-1].base
+    with open(base + ".val", "ab") as f:
+        f.write(b"\0\0\0\0\0\0")                          # A crash between the .val and .ts writes
+
+    reopened = ColumnarStore(store.root)
+    reopened.append(1, 5, 5.0)
+    ts, vals = reopened.read_range(1)
+    reopened.close()
+    assert ts.tolist() == [0, 1, 2, 3, 4, 5]
+    assert vals.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def _append_from_process(root, offset):
+    columnar_store.SEGMENT_ROWS = 50
+    store = ColumnarStore(root)
+    for i in range(300):
+        store.append(7, 1_000 + 2 * i + offset, float(offset))
+    store.close()
+
+
+def test_appends_from_several_processes(store):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_from_process, args=(store.root, k)) for k in (0, 1)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    ts, vals = store.read_range(7)
+    assert ts.tolist() == list(range(1_000, 1_600))
+    for segment in store._segments(7):
+        seg_ts = segment._map(".ts", columnar_store.TS_DTYPE, segment.rows)
+        assert np.all(seg_ts[1:] >= seg_ts[:-1])            # Every segment stays sorted
+        assert os.path.getsize(segment.base + ".val") == segment.rows * 4
+
+
+def test_raw_series_read_from_store(db, monkeypatch):
+    monkeypatch.setattr(queries, "SENSOR_STORAGE_BACKEND", "columnar")
+    store = columnar_store.get_store()
+    store.append(2001, 1_000, 21.5)
+    store.append(2002, 1_000, 60.0)
+    store.append(2001, 2_000, 22.0)
+    try:
+        with db.connect() as conn:
+            series = queries.fetch_series_arrays(conn, "raw", keys=[2001], include_archive=False)
+    finally:
+        store.close()
+    (key, ts, vals), = series
+    assert key == 2001 and ts.tolist() == [1_000, 2_000] and vals.tolist() == [21.5, 22.0]
+
+
+def test_drop_before_removes_only_expired_segments(store, monkeypatch):
+    monkeypatch.setattr(columnar_store, "SEGMENT_ROWS", 4)
+    for t in range(10, 130, 10):                            # Segments [10..40], [50..80], [90..120]
+        store.append(2001, t, float(t))
+    archived = []
+    assert store.expired_rows(2001, 85) == 8
+    assert store.drop_before(2001, 85, lambda ts, vals: archived.append(ts.tolist())) == 8
+    assert archived == [[10, 20, 30, 40], [50, 60, 70, 80]]
+    assert store.read_range(2001)[0].tolist() == [90, 100, 110, 120]
+
+    store.append(2001, 130, 1.0)
+    assert store.drop_before(2001, 10_000) == 5             # Including the segment being written to
+    store.append(2001, 140, 2.0)                            # The writer starts a new segment
+    assert store.read_range(2001)[0].tolist() == [140]
+
+
+def test_samples_are_stored_only_when_the_session_commits(db, monkeypatch):
+    from database_setup import SessionLocal
+    from network_utils import sensor_storage
+
+    monkeypatch.setattr(sensor_storage, "SENSOR_STORAGE_BACKEND", "columnar")
+    store = columnar_store.get_store()
+    try:
+        with SessionLocal() as session:
+            sensor_storage.store_sensor_data(session, 2000, "Ventilation_System_ESP", 2001,
+                                             humidity=55.0, timestamp=datetime(2025, 7, 3), commit=False)
+            session.rollback()
+            assert store.read_range(2001)[0].size == 0
+            sensor_storage.store_sensor_data(session, 2000, "Ventilation_System_ESP", 2001,
+                                             humidity=56.0, timestamp=datetime(2025, 7, 3))
+        assert store.read_range(2001)[1].tolist() == [56.0]
+    finally:
+        store.close()
@@ -0,0 +1,175 @@
+import socket
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from data_utils import db_writer, partitions
+from data_utils.db_writer import WriterClient, WriterService, WriterUnavailable, add_series_row
+from database_setup import SensorData, SessionLocal
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+
+
+def _row(value, sensor_id=2001):
+    return {"SensorID": sensor_id, "Timestamp": T0, "Value": value}
+
+
+def _count(db):
+    with db.connect() as conn:
+        return conn.execute(select(func.count()).select_from(SensorData.__table__)).scalar()
+
+
+@pytest.fixture
+def service(db, tmp_path):
+    service = WriterService(str(tmp_path / "writer.sock"))
+    threading.Thread(target=service.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "writer.sock").exists():
+        assert time.monotonic() < deadline, "writer service did not start"
+        time.sleep(0.01)
+    return service
+
+
+def test_framing_round_trip():
+    left, right = socket.socketpair()
+    try:
+        message = {"id": "abc", "rows": {"sensor_data": [_row(1.5)] * 2000}, "ack": True}
+        sender = threading.Thread(target=db_writer._send, args=(left, message))
+        sender.start()                                  # Larger than one socket buffer
+        received = db_writer._recv(right)
+        sender.join()
+        assert received["id"] == "abc" and len(received["rows"]["sensor_data"]) == 2000
+        row = db_writer._decode_rows("sensor_data", received["rows"]["sensor_data"])[0]
+        assert row == _row(1.5)                         # Datetimes survive the JSON trip
+
+        left.close()
+        with pytest.raises(ConnectionError):
+            db_writer._recv(right)
+    finally:
+        right.close()
+
+
+def test_submit_commits_rows(db, service):
+    WriterClient(service.path).submit({"sensor_data": [_row(1.0), _row(2.0)], "not_a_table": [{"x": 1}]})
+    assert _count(db) == 2
+    assert service.stats["requests"] == 1 and service.stats["rows"] == 2
+
+
+def test_resent_request_is_written_once(db, service):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(service.path)
+    try:
+        for _ in range(2):
+            db_writer._send(sock, {"id": "same", "rows": {"sensor_data": [_row(1.0)]}, "ack": True})
+            assert db_writer._recv(sock) == {"id": "same", "ok": True, "error": None}
+    finally:
+        sock.close()
+    assert _count(db) == 1
+    assert service.stats["duplicates"] == 1
+
+
+def test_lost_ack_is_retried_with_the_same_id(db, service, monkeypatch):
+    recv, caller = db_writer._recv, threading.current_thread()
+    lost = []
+
+    def lose_first_ack(sock):
+        if threading.current_thread() is caller and not lost:
+            lost.append(recv(sock))                     # The service did commit, but the ack never arrives
+            raise socket.timeout("timed out")
+        return recv(sock)
+
+    monkeypatch.setattr(db_writer, "_recv", lose_first_ack)
+    WriterClient(service.path).submit({"sensor_data": [_row(1.0)]})
+    assert lost and _count(db) == 1
+    assert service.stats["duplicates"] == 1
+
+
+def test_failing_request_does_not_fail_its_batch(db, service, monkeypatch):
+    monkeypatch.setattr(db_writer, "BATCH_WAIT_SECONDS", 0.5)     # Gather all three into one group commit
+    bad = {"SensorID": 2001, "Timestamp": T0, "Value": None}        # Value is NOT NULL
+    messages = [{"id": "a", "rows": {"sensor_data": [_row(1.0)]}, "ack": True},
+                {"id": "b", "rows": {"sensor_data": [bad]}, "ack": True},
+                {"id": "c", "rows": {"sensor_data": [_row(3.0)]}, "ack": True}]
+    clients = [socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) for _ in messages]
+    try:
+        for sock, message in zip(clients, messages):
+            sock.connect(service.path)
+            db_writer._send(sock, message)
+        replies = {reply["id"]: reply for reply in (db_writer._recv(sock) for sock in clients)}
+    finally:
+        for sock in clients:
+            sock.close()
+    assert replies["a"]["ok"] and replies["c"]["ok"]
+    assert not replies["b"]["ok"] and replies["b"]["error"]
+    assert _count(db) == 2
+    assert service.stats["failed"] == 1
+
+
+def test_malformed_rows_are_rejected(db, service):
+    with pytest.raises(RuntimeError):
+        WriterClient(service.path).submit({"sensor_data": [{"SensorID": 1, "Timestamp": "not a date", "Value": 1.0}]})
+    assert _count(db) == 0
+
+
+def test_unreachable_writer(tmp_path):
+    with pytest.raises(WriterUnavailable):
+        WriterClient(str(tmp_path / "missing.sock")).submit({"sensor_data": [_row(1.0)]})
+
+
+def test_session_rows_go_through_the_writer(db, service, monkeypatch):
+    monkeypatch.setattr(db_writer, "DB_WRITER_MODE", "service")
+    monkeypatch.setattr(db_writer, "_client", WriterClient(service.path))
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(1.0))
+        add_series_row(session, "sensor_data", _row(2.0))
+        assert _count(db) == 0
+        session.commit()
+    assert _count(db) == 2 and service.stats["requests"] == 1
+
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(3.0))
+        session.rollback()
+        session.commit()
+    assert _count(db) == 2
+
+
+def test_session_falls_back_only_when_nothing_was_sent(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(db_writer, "DB_WRITER_MODE", "service")
+    monkeypatch.setattr(db_writer, "_client", WriterClient(str(tmp_path / "missing.sock")))
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(1.0))
+        session.commit()
+    assert _count(db) == 1
+
+    class AckLost(WriterClient):
+        def submit(self, rows_by_table, wait=True):
+            raise ConnectionError("No ack from DB writer")
+
+    monkeypatch.setattr(db_writer, "_client", AckLost())
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(2.0))
+        with pytest.raises(ConnectionError):
+            session.commit()
+    assert _count(db) == 1
+
+
+def test_partitioned_rows_follow_the_session(db, day_partitions):
+    def partition_count():
+        with partitions.partition_engine(partitions.partition_key(T0)).connect() as conn:
+            return conn.execute(select(func.count()).select_from(partitions.PARTITIONED_TABLES["sensor_data"])).scalar()
+
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(1.0))
+        assert partition_count() == 0                   # Held until commit
+        session.rollback()
+        session.commit()
+    assert partition_count() == 0
+
+    with SessionLocal() as session:
+        add_series_row(session, "sensor_data", _row(1.0))
+        add_series_row(session, "sensor_data", _row(2.0))
+        session.commit()
+    assert partition_count() == 2 and _count(db) == 0
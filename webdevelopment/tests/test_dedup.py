@@ -0,0 +1,66 @@
+import pytest
+
+from network_utils import dedup
+from network_utils.dedup import (
+    ACCEPTED, DUPLICATE, TOO_OLD, WINDOW_BITS,
+    cached_response, check_sequence, parse_sequence, release_sequence, remember_response
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_windows(monkeypatch):
+    monkeypatch.setattr(dedup, "_windows", {})
+
+
+def test_sequences_inside_the_window():
+    assert check_sequence(1, "boot", 0) == ACCEPTED
+    assert check_sequence(1, "boot", 3) == ACCEPTED
+    assert check_sequence(1, "boot", 3) == DUPLICATE
+    assert check_sequence(1, "boot", 1) == ACCEPTED        # Late but never seen
+    assert check_sequence(1, "boot", 1) == DUPLICATE
+    assert check_sequence(1, "boot", 0) == DUPLICATE
+    assert check_sequence(2, "boot", 3) == ACCEPTED        # Windows are per device
+
+
+def test_window_edges():
+    check_sequence(1, "boot", 0)
+    assert check_sequence(1, "boot", WINDOW_BITS - 1) == ACCEPTED
+    assert check_sequence(1, "boot", 0) == DUPLICATE       # Oldest slot still tracked
+    assert check_sequence(1, "boot", WINDOW_BITS) == ACCEPTED
+    assert check_sequence(1, "boot", 0) == TOO_OLD
+    assert check_sequence(1, "boot", 1) == ACCEPTED        # Oldest slot left in the window, never seen
+    assert check_sequence(1, "boot", WINDOW_BITS - 1) == DUPLICATE
+    assert check_sequence(1, "boot", 5 * WINDOW_BITS) == ACCEPTED      # A jump clears the whole window
+    assert check_sequence(1, "boot", 4 * WINDOW_BITS + 1) == ACCEPTED
+
+
+def test_reboot_starts_a_new_window():
+    check_sequence(1, "old", 10)
+    assert check_sequence(1, "new", 0) == ACCEPTED
+    assert check_sequence(1, "new", 10) == ACCEPTED
+    assert check_sequence(1, "old", 10) == ACCEPTED        # Another boot id again: fresh window
+
+
+def test_released_sequence_is_accepted_again():
+    check_sequence(1, "boot", 5)
+    check_sequence(1, "boot", 6)
+    release_sequence(1, "boot", 5)
+    assert check_sequence(1, "boot", 5) == ACCEPTED
+    release_sequence(1, "other", 6)                         # Wrong boot: no effect
+    assert check_sequence(1, "boot", 6) == DUPLICATE
+
+
+def test_retry_gets_the_same_response():
+    check_sequence(1, "boot", 7)
+    remember_response(1, "boot", 7, {"action": "Irrigation_ON"})
+    assert cached_response(1, "boot", 7) == {"action": "Irrigation_ON"}
+    assert cached_response(1, "boot", 6) is None
+    assert cached_response(1, "other", 7) is None
+    remember_response(1, "boot", 6, {"action": "stale"})   # Not the newest sequence: ignored
+    assert cached_response(1, "boot", 7) == {"action": "Irrigation_ON"}
+
+
+def test_parse_sequence():
+    assert parse_sequence({"BootID": 1234, "Seq": "5"}) == ("1234", 5)
+    assert parse_sequence({"Seq": 5}) is None
+    assert parse_sequence({"BootID": "a", "Seq": "five"}) is None
@@ -0,0 +1,106 @@
+import os
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+from data_utils import detections
+from data_utils.detections import (backfill_detections, cycle_summaries, detection_row, forget_images_under,
+                                   parse_page_args, query_detections, record_detections)
+from database_setup import PlantDetection, SessionLocal
+
+BOXES = [{"class": "leaf_blight", "confidence": 0.9, "box": [1, 2, 30, 40]}]
+
+
+@pytest.fixture
+def static_dir(db, tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    (static / "predictions").mkdir(parents=True)
+    monkeypatch.setattr(detections, "STATIC_DIR", str(static))
+    return static
+
+
+def _rows():
+    with SessionLocal() as session:
+        return session.scalars(select(PlantDetection).order_by(PlantDetection.DetectionID)).all()
+
+
+def test_paths_are_stored_relative_to_static(static_dir):
+    row = detection_row(str(static_dir / "predictions" / "a.jpg"), "leaf_blight", 0.9, BOXES, 3, "cycle-1")
+    assert row["ImagePath"] == "predictions/a.jpg" and row["BoxCount"] == 1 and row["StopNumber"] == 3
+    assert detection_row("/elsewhere/b.jpg", "x", None, [])["ImagePath"] == "/elsewhere/b.jpg"
+
+
+def test_backfill_indexes_old_images_once(static_dir):
+    predictions = static_dir / "predictions"
+    (predictions / "prediction_1720000000_stop4.jpg").write_bytes(b"x")
+    (predictions / "manual.png").write_bytes(b"x")
+    os.utime(predictions / "manual.png", (1710000000, 1710000000))
+    (predictions / "notes.txt").write_text("not an image")
+    record_detections([detection_row(str(predictions / "live.jpg"), "healthy", 0.8, [], cycle_id="cycle-1")])
+    (predictions / "live.jpg").write_bytes(b"x")
+
+    assert backfill_detections(str(predictions)) == 2
+    assert backfill_detections(str(predictions)) == 0                   # Idempotent
+    assert backfill_detections(str(static_dir / "missing")) == 0
+
+    rows = {row.ImagePath: row for row in _rows()}
+    assert len(rows) == 3
+    named = rows["predictions/prediction_1720000000_stop4.jpg"]
+    assert (named.ClassName, named.CycleID, named.StopNumber) == ("Unknown", "backfill", 4)
+    assert named.DetectedAt == datetime.utcfromtimestamp(1720000000)
+    assert rows["predictions/manual.png"].DetectedAt == datetime.utcfromtimestamp(1710000000)
+
+
+def test_cleared_folder_keeps_history(static_dir):
+    predictions = static_dir / "predictions"
+    record_detections([
+        detection_row(str(predictions / "a.jpg"), "leaf_blight", 0.9, BOXES, cycle_id="run-1"),
+        detection_row(str(static_dir / "predictions_old" / "b.jpg"), "healthy", 0.7, [], cycle_id="run-1"),
+    ])
+    forget_images_under(str(predictions))
+    paths = [row.ImagePath for row in _rows()]
+    assert paths == [None, "predictions_old/b.jpg"]                     # A sibling with the same prefix is kept
+
+
+def test_pages_and_cycle_summaries(static_dir):
+    rows = [detection_row(str(static_dir / "predictions" / f"{i}.jpg"), "leaf_blight" if i % 2 else "healthy",
+                          0.5 + i / 100, [], cycle_id=f"cycle-{i // 3}", detected_at=datetime(2025, 7, 1, 10, i))
+            for i in range(6)]
+    rows[5]["ImagePath"] = None
+    record_detections(rows)
+
+    with SessionLocal() as session:
+        page, total = query_detections(session, page=1, per_page=4)
+        assert total == 6 and [row.DetectedAt.minute for row in page] == [5, 4, 3, 2]
+        page, total = query_detections(session, page=2, per_page=4, with_image=True)
+        assert total == 5 and [row.DetectedAt.minute for row in page] == [0]
+        _, total = query_detections(session, cycle_id="cycle-0", class_name="healthy")
+        assert total == 2
+
+        cycles = cycle_summaries(session)
+    assert [cycle["cycle_id"] for cycle in cycles] == ["cycle-1", "cycle-0"]
+    assert cycles[1]["images"] == 3 and cycles[1]["classes"]["healthy"]["count"] == 2
+    assert cycles[1]["started_at"] == "2025-07-01T10:00:00" and cycles[1]["finished_at"] == "2025-07-01T10:02:00"
+
+
+def test_page_args_are_clamped():
+    assert parse_page_args({"page": "0", "per_page": "100000"}) == (1, detections.MAX_PER_PAGE)
+    assert parse_page_args({"page": "x"}) == (1, detections.DEFAULT_PER_PAGE)
+
+
+def test_detections_api(static_dir):
+    record_detections([detection_row(str(static_dir / "predictions" / "a.jpg"), "leaf_blight", 0.91234, BOXES,
+                                     stop_number=2, cycle_id="cycle-1")])
+    app = Flask(__name__)
+    app.register_blueprint(detections.detections_bp)
+    client = app.test_client()
+
+    body = client.get("/api/detections?per_page=10").get_json()
+    assert (body["total"], body["pages"], body["per_page"]) == (1, 1, 10)
+    item = body["items"][0]
+    assert item["image_url"] == "/static/predictions/a.jpg" and item["boxes"] == BOXES
+    assert (item["confidence"], item["stop"], item["cycle_id"]) == (0.9123, 2, "cycle-1")
+    assert client.get("/api/detections?class_name=healthy").get_json()["total"] == 0
+    assert client.get("/api/detections/cycles").get_json()[0]["classes"]["leaf_blight"]["count"] == 1
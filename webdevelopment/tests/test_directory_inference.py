@@ -0,0 +1,97 @@
+import threading
+
+import cv2
+import numpy as np
+from sqlalchemy import select
+
+from database_setup import PlantDetection, SessionLocal
+
+
+def _write_images(directory, brightness):
+    directory.mkdir(exist_ok=True)
+    for i, level in enumerate(brightness):
+        frame = np.full((48, 64, 3), level, dtype=np.uint8)
+        frame[i % 48, :] = 0                            # Distinct content per file
+        cv2.imwrite(str(directory / f"img_{i:02d}.jpg"), frame)
+
+
+def _detections():
+    with SessionLocal() as session:
+        return session.scalars(select(PlantDetection).order_by(PlantDetection.ImagePath)).all()
+
+
+def test_images_are_inferred_in_batches(ai_model, tmp_path):
+    _write_images(tmp_path / "input", [200, 30] * 5)
+    (tmp_path / "input" / "notes.txt").write_text("not an image")
+    progress = []
+
+    summary = ai_model.process_images_in_directory(
+        str(tmp_path / "input"), str(tmp_path / "output"), batch_size=4,
+        progress=lambda done, total: progress.append((done, total)), cycle_id="run-test")
+
+    assert (summary["total"], summary["processed"], summary["skipped"]) == (10, 10, 0)
+    assert summary["batches"] == 3 and not summary["cancelled"]
+    assert ai_model.model_manager.yolo_calls == [1, 4, 4, 2]        # Warm-up, then full batches
+    assert sorted(p.name for p in (tmp_path / "output").iterdir()) == [f"img_{i:02d}.jpg" for i in range(10)]
+    assert len(ai_model.thumbnails) == 10
+    assert progress[-1] == (10, 10) and len(progress) == 10
+
+    rows = _detections()
+    assert len(rows) == 10 and {row.CycleID for row in rows} == {"run-test"}
+    assert [row.ClassName for row in rows] == ["leaf_blight", "No detection"] * 5
+    assert rows[0].BoxCount == 1 and rows[1].BoxCount == 0
+
+
+def test_unreadable_image_is_skipped(ai_model, tmp_path):
+    _write_images(tmp_path / "input", [200, 200])
+    (tmp_path / "input" / "broken.jpg").write_bytes(b"not a jpeg")
+    (tmp_path / "input" / "empty.png").write_bytes(b"")
+
+    summary = ai_model.process_images_in_directory(str(tmp_path / "input"), str(tmp_path / "output"), batch_size=8)
+
+    assert (summary["total"], summary["processed"], summary["skipped"]) == (4, 2, 2)
+    assert ai_model.model_manager.yolo_calls == [1, 2]
+    assert len(_detections()) == 2
+
+
+def test_output_directory_is_cleared_and_old_rows_unlinked(ai_model, tmp_path):
+    _write_images(tmp_path / "input", [200])
+    output = tmp_path / "output"
+    output.mkdir()
+    (output / "stale.jpg").write_bytes(b"old")
+    ai_model.process_images_in_directory(str(tmp_path / "input"), str(output), cycle_id="first")
+    ai_model.process_images_in_directory(str(tmp_path / "input"), str(output), cycle_id="second")
+
+    assert [p.name for p in output.iterdir()] == ["img_00.jpg"]
+    rows = {row.CycleID: row for row in _detections()}
+    assert rows["first"].ImagePath is None                          # History kept, file gone
+    assert rows["second"].ImagePath is not None
+
+
+def test_cancel_stops_before_the_next_batch(ai_model, tmp_path, monkeypatch):
+    _write_images(tmp_path / "input", [200] * 6)
+    cancel = threading.Event()
+    predict = ai_model.model_manager.predict
+
+    def predict_then_cancel(frames):
+        cancel.set()
+        return predict(frames)
+
+    monkeypatch.setattr(ai_model.model_manager, "predict", predict_then_cancel)
+    summary = ai_model.process_images_in_directory(str(tmp_path / "input"), str(tmp_path / "output"),
+                                                   batch_size=2, cancel_event=cancel)
+
+    assert summary["cancelled"]
+    assert (summary["batches"], summary["processed"]) == (1, 2)    # The started batch is still written
+    assert len(_detections()) == 2
+
+    summary = ai_model.process_images_in_directory(str(tmp_path / "input"), str(tmp_path / "output"),
+                                                   cancel_event=cancel)
+    assert summary["cancelled"] and summary["processed"] == 0
+
+
+def test_empty_directory(ai_model, tmp_path):
+    (tmp_path / "input").mkdir()
+    summary = ai_model.process_images_in_directory(str(tmp_path / "input"), str(tmp_path / "output"))
+    assert (summary["total"], summary["processed"], summary["batches"]) == (0, 0, 0)
+    assert summary["images_per_second"] in (0, None)
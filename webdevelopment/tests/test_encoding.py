@@ -0,0 +1,118 @@
+import gzip
+import json
+import struct
+
+import numpy as np
+
+from data_utils.encoding import (
+    BINARY_MAGIC, MIN_COMPRESS_BYTES, build_response, columnar_series, encode_binary, negotiate_encoding
+)
+
+
+def _decode_binary(blob):
+    assert blob[:4] == BINARY_MAGIC
+    (header_len,) = struct.unpack("<I", blob[4:8])
+    header = json.loads(blob[8:8 + header_len])
+    sections = {}
+    for section, entries in header.items():
+        sections[section] = []
+        for entry in entries:
+            count = entry["count"]
+            ts = np.frombuffer(blob, dtype="<i8", count=count, offset=entry["ts_offset"])
+            vals = np.frombuffer(blob, dtype="<f4", count=count, offset=entry["value_offset"])
+            sections[section].append((entry, ts, vals))
+    return sections
+
+
+def test_binary_round_trip():
+    ts = np.array([1751536800000, 1751536805000, 1751536810123], dtype=np.int64)
+    vals = np.array([21.5, 21.75, -3.25], dtype=np.float32)
+    odd_ts = np.array([1, 2, 3], dtype=np.int64)
+    odd_vals = np.array([0.5, 1.5, 2.5], dtype=np.float32)       # 12 bytes: next block needs padding
+    blob = encode_binary({
+        "raw": [({"sensor_id": 2001, "label": "Temperature"}, ts, vals), ({"sensor_id": 2002}, odd_ts, odd_vals)],
+        "weighted": [({"sensor_type": "humidity"}, ts, vals)],
+        "kalman": [],
+    })
+
+    decoded = _decode_binary(blob)
+    assert decoded["kalman"] == []
+    (meta, got_ts, got_vals), (_, got_odd_ts, got_odd_vals) = decoded["raw"]
+    assert meta["sensor_id"] == 2001 and meta["label"] == "Temperature" and meta["count"] == 3
+    np.testing.assert_array_equal(got_ts, ts)
+    np.testing.assert_array_equal(got_vals, vals)
+    np.testing.assert_array_equal(got_odd_ts, odd_ts)
+    np.testing.assert_array_equal(got_odd_vals, odd_vals)
+    (meta, got_ts, got_vals), = decoded["weighted"]
+    assert meta["sensor_type"] == "humidity"
+    np.testing.assert_array_equal(got_ts, ts)
+    np.testing.assert_array_equal(got_vals, vals)
+
+
+def test_binary_blocks_are_aligned():
+    vals = np.zeros(3, dtype=np.float32)
+    blob = encode_binary({"raw": [({"sensor_id": i}, np.arange(3, dtype=np.int64), vals) for i in range(5)]})
+    for _, entries in json.loads(blob[8:8 + struct.unpack("<I", blob[4:8])[0]]).items():
+        for entry in entries:
+            assert entry["ts_offset"] % 8 == 0
+
+
+def test_columnar_series_round_trip():
+    ts = np.array([1751536800000, 1751536805000], dtype=np.int64)
+    vals = np.array([21.1, 55.7], dtype=np.float32)
+    series = json.loads(json.dumps(columnar_series((ts, vals), sensor_id=2001)))
+    assert series["sensor_id"] == 2001
+    assert series["timestamps"] == ts.tolist()
+    assert series["values"] == [21.1, 55.7]        # No float32 noise digits
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*") in ("br", "gzip")
+
+
+def test_build_response_compresses_large_bodies():
+    body = b"x" * (MIN_COMPRESS_BYTES * 2)
+    response = build_response(body, "application/json", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == body
+
+    small = build_response(b"{}", "application/json", "gzip")
+    assert "Content-Encoding" not in small.headers
+    assert small.get_data() == b"{}"
+
+
+def test_dashboard_formats_agree(db):
+    from datetime import datetime
+    from flask import Flask
+    from database_setup import SensorData, WeightedAverageFusionData
+    from dashboard import dashboard_bp
+
+    stamps = [datetime(2025, 7, 3, 10, 0, 0), datetime(2025, 7, 3, 10, 0, 5, 250000)]
+    with db.begin() as conn:
+        conn.execute(SensorData.__table__.insert(), [
+            {"SensorID": 2001, "Timestamp": ts, "Value": 20.5 + i} for i, ts in enumerate(stamps)
+        ])
+        conn.execute(WeightedAverageFusionData.__table__.insert(), [
+            {"SensorType": "Temperature", "Timestamp": stamps[0], "FusedValue": 21.25}
+        ])
+    app = Flask(__name__)
+    app.register_blueprint(dashboard_bp)
+    client = app.test_client()
+
+    legacy = client.get("/api/dashboard-data").get_json()
+    columnar = client.get("/api/dashboard-data?format=columnar").get_json()
+    binary = _decode_binary(client.get("/api/dashboard-data?format=binary").get_data())
+
+    assert legacy["raw"][0]["timestamps"] == [ts.isoformat() for ts in stamps]
+    # Epoch-ms of the same naive UTC times
+    expected_ms = [int((ts - datetime(1970, 1, 1)).total_seconds() * 1000) for ts in stamps]
+    assert columnar["raw"][0]["timestamps"] == expected_ms
+    assert columnar["raw"][0]["values"] == legacy["raw"][0]["values"] == [20.5, 21.5]
+    assert columnar["weighted"][0]["sensor_type"] == "Temperature"
+    (meta, ts, vals), = binary["raw"]
+    assert meta["sensor_id"] == 2001
+    assert ts.tolist() == expected_ms and vals.tolist() == [20.5, 21.5]
+    assert client.get("/api/dashboard-data?format=xml").status_code == 400
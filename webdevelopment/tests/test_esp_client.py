@@ -0,0 +1,91 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from RC_Plant_desiease import esp_client
+from RC_Plant_desiease.esp_client import EspClient
+
+
+@pytest.fixture
+def esp(monkeypatch):
+    """A local stand-in ESP; set `server.replies[command]` to a status code or "hang"."""
+    monkeypatch.setattr(esp_client, "RETRY_BACKOFF_SECONDS", 0)
+    release = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"           # Keep-alive, like the ESP's web server
+
+        def do_POST(self):
+            command = self.path.strip("/")
+            server.requests.append((command, self.client_address[1]))
+            reply = server.replies.get(command, 200)
+            if reply == "hang":
+                release.wait(5)
+                reply = 200
+            self.send_response(reply)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests, server.replies = [], {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_commands_share_one_connection(esp):
+    client = EspClient(esp.url)
+    acks = [client.send(command) for command in ("move", "stop", "spray", "move", "stop")]
+    client.close()
+    assert all(ack.ok and ack.status == 200 and ack.attempts == 1 for ack in acks)
+    assert [command for command, _ in esp.requests] == ["move", "stop", "spray", "move", "stop"]
+    assert len({port for _, port in esp.requests}) == 1
+    assert acks[0].sent_at <= acks[0].acked_at and acks[0].latency_ms >= 0
+    assert client.stats() == {"base_url": esp.url, "sent": 5, "failed": 0, "retries": 0}
+
+
+def test_server_error_is_retried_only_for_stop(esp):
+    esp.replies.update(spray=500, stop=503)
+    client = EspClient(esp.url + "/")
+    spray, stop = client.send("spray"), client.send("stop")
+    assert (spray.ok, spray.attempts, spray.error) == (False, 1, "HTTP 500")
+    assert (stop.ok, stop.attempts, stop.status) == (False, 3, 503)
+    assert [command for command, _ in esp.requests] == ["spray", "stop", "stop", "stop"]
+    assert client.stats()["failed"] == 2 and client.stats()["retries"] == 2
+
+
+def test_client_error_is_not_retried(esp):
+    esp.replies["stop"] = 404
+    assert EspClient(esp.url).send("stop").attempts == 1
+
+
+def test_read_timeout_fails_the_command(esp):
+    esp.replies.update(move="hang", stop="hang")
+    client = EspClient(esp.url, read_timeout=0.2)
+    started = time.monotonic()
+    move = client.send("move")
+    assert not move.ok and move.attempts == 1 and move.status is None     # The ESP may have moved: don't resend
+    assert time.monotonic() - started < 2
+    assert client.send("stop").attempts == 3
+
+
+def test_unreachable_esp_is_retried_and_never_raises(monkeypatch):
+    monkeypatch.setattr(esp_client, "RETRY_BACKOFF_SECONDS", 0)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]                   # Nothing listens here once closed
+    client = EspClient(f"http://127.0.0.1:{port}")
+    ack = client.send("move")
+    assert not ack.ok and ack.attempts == 3 and ack.error
+    assert client.stats()["failed"] == 1
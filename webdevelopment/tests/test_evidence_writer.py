@@ -0,0 +1,95 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from database_setup import PlantDetection, SessionLocal
+from RC_Plant_desiease import evidence_writer as evidence_module
+from RC_Plant_desiease.evidence_writer import EvidenceWriter
+
+FRAME = np.full((24, 32, 3), 200, dtype=np.uint8)
+
+
+def test_frames_and_jpegs_are_saved(tmp_path):
+    writer = EvidenceWriter()
+    saved = []
+    jpeg = cv2.imencode(".jpg", FRAME)[1].tobytes()
+
+    writer.save(str(tmp_path / "cycle" / "encoded.jpg"), frame=FRAME, on_saved=saved.append)
+    writer.save(str(tmp_path / "cycle" / "raw.jpg"), jpeg=jpeg, on_saved=saved.append)
+    assert writer.flush(timeout=5)
+
+    assert (tmp_path / "cycle" / "raw.jpg").read_bytes() == jpeg          # Written without re-encoding
+    decoded = cv2.imread(str(tmp_path / "cycle" / "encoded.jpg"))
+    assert decoded.shape == FRAME.shape
+    assert saved == [str(tmp_path / "cycle" / "encoded.jpg"), str(tmp_path / "cycle" / "raw.jpg")]
+    assert not list((tmp_path / "cycle").glob("*.tmp"))
+    assert writer.stats()["written"] == 2
+
+
+def test_exactly_one_payload(tmp_path):
+    writer = EvidenceWriter()
+    with pytest.raises(ValueError):
+        writer.save(str(tmp_path / "x.jpg"))
+    with pytest.raises(ValueError):
+        writer.save(str(tmp_path / "x.jpg"), frame=FRAME, jpeg=b"\xff\xd8")
+
+
+def test_failed_write_does_not_stop_the_writer(tmp_path):
+    writer = EvidenceWriter()
+    (tmp_path / "taken").write_text("a file, not a directory")
+    writer.save(str(tmp_path / "taken" / "x.jpg"), jpeg=b"\xff\xd8\xff\xd9")
+    writer.save(str(tmp_path / "ok.jpg"), jpeg=b"\xff\xd8\xff\xd9")
+    assert writer.flush(timeout=5)
+    assert (writer.failed, writer.written) == (1, 1)
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    monkeypatch.setattr(evidence_module, "QUEUE_PUT_TIMEOUT_SECONDS", 0.05)
+    writer = EvidenceWriter(queue_size=1)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold(path):
+        holding.set()
+        release.wait(5)
+
+    writer.save(str(tmp_path / "a.jpg"), jpeg=b"a", on_saved=hold)
+    assert holding.wait(5)                          # The writer thread is busy with "a"
+    assert writer.save(str(tmp_path / "b.jpg"), jpeg=b"b")
+    assert not writer.save(str(tmp_path / "c.jpg"), jpeg=b"c")
+    release.set()
+    assert writer.flush(timeout=5)
+    assert writer.stats()["dropped"] == 1 and writer.written == 2
+    assert not (tmp_path / "c.jpg").exists()
+
+
+def test_live_frame_is_annotated_in_memory_and_saved_in_background(ai_model, tmp_path, monkeypatch):
+    writer = EvidenceWriter()
+    monkeypatch.setattr(ai_model, "evidence_writer", writer)
+
+    processed, class_name, conf = ai_model.live_processing(FRAME.copy(), str(tmp_path / "predictions"),
+                                                           "stop_1.jpg", stop_number=1, cycle_id="cycle-1")
+    assert (class_name, conf) == ("leaf_blight", 0.9)
+    assert not np.array_equal(processed, FRAME)                 # Boxes drawn on the returned frame
+    assert writer.flush(timeout=5)
+
+    path = str(tmp_path / "predictions" / "stop_1.jpg")
+    assert cv2.imread(path).shape == FRAME.shape
+    assert ai_model.thumbnails == [path]
+    with SessionLocal() as session:
+        row = session.scalars(select(PlantDetection)).one()
+    assert (row.CycleID, row.StopNumber, row.ClassName) == ("cycle-1", 1, "leaf_blight")
+
+
+def test_live_frame_that_is_not_saved_leaves_no_row(ai_model, tmp_path, monkeypatch):
+    writer = EvidenceWriter()
+    monkeypatch.setattr(ai_model, "evidence_writer", writer)
+    (tmp_path / "predictions").write_text("a file where the output directory should be")
+
+    ai_model.live_processing(FRAME.copy(), str(tmp_path / "predictions"), "stop_1.jpg", stop_number=1)
+    assert writer.flush(timeout=5) and writer.failed == 1
+    assert ai_model.thumbnails == []
+    with SessionLocal() as session:
+        assert session.scalars(select(PlantDetection)).all() == []
@@ -0,0 +1,56 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from data_utils.export import export_bp, generate_export, iter_pivoted, parse_keys
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+
+
+def _csv(chunks):
+    return list(csv.reader(io.StringIO("".join(chunks))))
+
+
+def test_iter_pivoted_groups_rows_by_timestamp():
+    rows = [(2001, T0, 1.0), (2003, T0, 2.0), (2001, T0, 9.0), (2003, T0 + timedelta(seconds=5), 3.0)]
+    assert list(iter_pivoted(iter(rows), [2001, 2003])) == [
+        (T0, [1.0, 2.0]),                               # First value per cell wins
+        (T0 + timedelta(seconds=5), [None, 3.0]),
+    ]
+
+
+def test_parse_keys():
+    assert parse_keys("raw", "2001, 2003") == [2001, 2003]
+    assert parse_keys("weighted", "Temperature,Humidity") == ["Temperature", "Humidity"]
+    assert parse_keys("raw", "") is None
+
+
+def test_csv_export_streams_in_chunks(add_rows):
+    add_rows("kalman", [(2001, T0 + timedelta(seconds=i), 20.0 + i) for i in range(7)]
+             + [(2003, T0 + timedelta(seconds=i), 30.0 + i) for i in range(0, 7, 2)])
+
+    chunks = list(generate_export("kalman", T0, T0 + timedelta(minutes=1), fmt="csv", chunk_size=3))
+    assert len(chunks) == 3
+    rows = _csv(chunks)
+    assert rows[0] == ["Timestamp", "2001", "2003"]
+    assert rows[1] == ["2025-07-03 10:00:00", "20.0", "30.0"]
+    assert rows[2] == ["2025-07-03 10:00:01", "21.0", ""]
+    assert len(rows) == 8
+
+
+def test_export_endpoint(add_rows):
+    add_rows("weighted", [("Temperature", T0, 21.5), ("Humidity", T0, 60.0)])
+    app = Flask(__name__)
+    app.register_blueprint(export_bp)
+    client = app.test_client()
+
+    response = client.get("/api/export?source=weighted&start=2025-07-03T09:00&end=2025-07-03T11:00&sensors=Temperature")
+    assert response.status_code == 200
+    assert "attachment; filename=weighted_20250703T090000_20250703T110000.csv" == response.headers["Content-Disposition"]
+    assert _csv([response.get_data(as_text=True)]) == [["Timestamp", "Temperature"], ["2025-07-03 10:00:00", "21.5"]]
+
+    assert client.get("/api/export?source=nope").status_code == 400
+    assert client.get("/api/export?format=xlsx").status_code == 400
+    assert client.get("/api/export?grid=5s&method=cubic").status_code == 400
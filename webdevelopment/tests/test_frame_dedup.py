@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from database_setup import PlantDetection, SessionLocal
+from RC_Plant_desiease import frame_dedup
+from RC_Plant_desiease.frame_dedup import FrameDeduplicator, signature
+
+RESULT = ("leaf_blight", 0.9, [{"class": "leaf_blight", "confidence": 0.9, "box": [1, 2, 30, 40]}])
+
+
+def _plant(seed=0):
+    """A textured 'plant' frame; the same seed gives the same picture."""
+    rng = np.random.default_rng(seed)
+    return np.kron(rng.integers(60, 220, (12, 16, 3)), np.ones((10, 10, 1))).astype(np.uint8)
+
+
+def _remembered(dedup, frame, stop):
+    _, frame_signature = dedup.check(frame, stop)
+    dedup.remember(stop, frame_signature, *RESULT)
+
+
+def test_signature_ignores_exposure_but_not_content():
+    frame = _plant()
+    brighter = np.clip(frame.astype(int) + 15, 0, 255).astype(np.uint8)
+    (hash_a, small_a), (hash_b, small_b) = signature(frame), signature(brighter)
+    assert bin(hash_a ^ hash_b).count("1") <= frame_dedup.HASH_THRESHOLD
+    assert np.abs(small_a - small_b).mean() <= frame_dedup.DIFF_THRESHOLD
+
+    hash_c, small_c = signature(_plant(seed=1))
+    assert bin(hash_a ^ hash_c).count("1") > frame_dedup.HASH_THRESHOLD
+    assert signature(frame[:, :, 0])[0] == signature(np.dstack([frame[:, :, 0]] * 3))[0]   # Grayscale input
+
+
+def test_unchanged_frame_reuses_the_stops_result():
+    dedup = FrameDeduplicator()
+    assert dedup.check(_plant(), 1)[0] is None                      # Nothing inferred at this stop yet
+    _remembered(dedup, _plant(), 1)
+
+    noisy = np.clip(_plant().astype(int) + np.random.default_rng(7).integers(-3, 4, _plant().shape), 0, 255)
+    assert dedup.check(noisy.astype(np.uint8), 1)[0] == RESULT
+    assert dedup.check(_plant(seed=1), 1)[0] is None                # Something changed
+    assert dedup.check(_plant(), 2)[0] is None                      # Another stop
+    assert dedup.stats() == {"enabled": True, "checked": 5, "skipped": 1, "skip_rate": 0.2, "stops": 1}
+
+    dedup.reset()
+    assert dedup.check(_plant(), 1)[0] is None
+
+
+def test_old_or_disabled_references_are_not_reused(monkeypatch):
+    dedup = FrameDeduplicator()
+    _remembered(dedup, _plant(), 1)
+    monkeypatch.setattr(frame_dedup, "ENABLED", False)
+    assert dedup.check(_plant(), 1)[0] is None
+
+    monkeypatch.setattr(frame_dedup, "ENABLED", True)
+    monkeypatch.setattr(frame_dedup, "MAX_AGE_SECONDS", -1)
+    assert dedup.check(_plant(), 1)[0] is None
+
+
+@pytest.mark.parametrize("bright", [True, False])
+def test_process_frame_skips_the_model_for_a_repeated_frame(ai_model, bright):
+    frame = _plant() if bright else _plant() // 4
+    first = ai_model.process_frame(frame.copy(), "stop_3_a.jpg", stop_number=3, cycle_id="cycle-1")
+    calls = list(ai_model.model_manager.yolo_calls)
+    second = ai_model.process_frame(frame.copy(), "stop_3_b.jpg", stop_number=3, cycle_id="cycle-1")
+
+    assert ai_model.model_manager.yolo_calls == calls
+    assert second[1:] == first[1:] == (("leaf_blight", 0.9) if bright else ("No detection", 0))
+    assert np.array_equal(second[0], first[0])                      # Reused boxes are drawn too
+    with SessionLocal() as session:
+        rows = session.scalars(select(PlantDetection).order_by(PlantDetection.DetectionID)).all()
+    assert [(row.ImagePath, row.ClassName) for row in rows] == [("stop_3_a.jpg", first[1]),
+                                                                ("stop_3_b.jpg", first[1])]
+
+    ai_model.process_frame(_plant(seed=5), stop_number=3)
+    assert len(ai_model.model_manager.yolo_calls) == len(calls) + 1
+
+
+def test_frames_without_a_stop_are_always_inferred(ai_model):
+    ai_model.model_manager.get()
+    calls = len(ai_model.model_manager.yolo_calls)
+    ai_model.process_frame(_plant())
+    ai_model.process_frame(_plant())                                # Same picture, but no stop to compare within
+    ai_model.process_frame(_plant(), stop_number=None)
+    assert len(ai_model.model_manager.yolo_calls) == calls + 3
+    assert ai_model.frame_deduplicator.stats()["checked"] == 0
@@ -0,0 +1,107 @@
+import os
+
+import cv2
+import numpy as np
+from sqlalchemy import select
+
+from database_setup import PlantDetection, SessionLocal
+from RC_Plant_desiease import inference_cache as cache_module
+from RC_Plant_desiease.inference_cache import InferenceCache, content_key
+
+BOXES = [{"class": "leaf_blight", "confidence": 0.9, "box": [1, 2, 30, 40]}]
+
+
+def _write_images(directory, count):
+    directory.mkdir(exist_ok=True)
+    for i in range(count):
+        frame = np.full((48, 64, 3), 200, dtype=np.uint8)
+        frame[i, :] = 0
+        cv2.imwrite(str(directory / f"img_{i}.jpg"), frame)
+
+
+def _run(ai_model, tmp_path, **kwargs):
+    return ai_model.process_images_in_directory(str(tmp_path / "input"), str(tmp_path / "output"), **kwargs)
+
+
+def _row_count():
+    with SessionLocal() as session:
+        return len(session.scalars(select(PlantDetection)).all())
+
+
+def test_round_trip(tmp_path):
+    cache = InferenceCache(str(tmp_path / "cache"))
+    key = content_key(b"image bytes", "f" * 40)
+    assert key != content_key(b"image bytes", "e" * 40)                 # New weights, new key
+    assert cache.get(key) is None
+
+    cache.put(key, "leaf_blight", 0.9, BOXES, annotated=b"jpeg", ext="jpg")
+    entry = cache.get(key, "jpg")
+    assert (entry["class_name"], entry["confidence"], entry["boxes"]) == ("leaf_blight", 0.9, BOXES)
+    assert entry["annotated"] == b"jpeg"
+    assert cache.get(key, "png")["annotated"] is None                    # Result still reusable
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_annotated_output_can_be_left_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "STORE_ANNOTATED", False)
+    cache = InferenceCache(str(tmp_path / "cache"))
+    cache.put("ab-1", "healthy", 0.5, [], annotated=b"jpeg", ext="jpg")
+    assert cache.get("ab-1", "jpg")["annotated"] is None
+    assert not os.path.exists(cache._path("ab-1", "jpg"))
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = InferenceCache(str(tmp_path / "cache"), max_bytes=3000)
+    for i in range(3):
+        cache.put(f"k{i}", "healthy", 0.5, [], annotated=b"x" * 900, ext="jpg")
+        for suffix in ("json", "jpg"):
+            os.utime(cache._path(f"k{i}", suffix), (1000 + i, 1000 + i))
+    cache.get("k0", "jpg")                                               # Refreshes k0
+    cache.put("k3", "healthy", 0.5, [], annotated=b"x" * 900, ext="jpg")
+
+    assert cache.evicted > 0 and cache.stats()["bytes"] <= 3000 * cache_module.LOW_WATER
+    assert cache.get("k1") is None
+    assert cache.get("k0", "jpg")["annotated"] and cache.get("k3", "jpg")["annotated"]
+
+
+def test_unchanged_images_skip_the_model(ai_model, tmp_path):
+    _write_images(tmp_path / "input", 3)
+    first = _run(ai_model, tmp_path)
+    outputs = {p.name: p.read_bytes() for p in (tmp_path / "output").iterdir()}
+    calls = list(ai_model.model_manager.yolo_calls)
+
+    second = _run(ai_model, tmp_path)
+    assert (first["cache_hits"], second["cache_hits"], second["processed"]) == (0, 3, 3)
+    assert ai_model.model_manager.yolo_calls == calls and second["batches"] == 0
+    assert {p.name: p.read_bytes() for p in (tmp_path / "output").iterdir()} == outputs
+    assert _row_count() == 6
+
+    (tmp_path / "best.pt").write_bytes(b"retrained weights")            # fake_yolo's weights file
+    third = _run(ai_model, tmp_path, batch_size=4)
+    assert third["cache_hits"] == 0 and third["batches"] == 1
+
+
+def test_hit_without_annotated_output_is_redrawn(ai_model, tmp_path, monkeypatch):
+    _write_images(tmp_path / "input", 2)
+    monkeypatch.setattr(cache_module, "STORE_ANNOTATED", False)
+    _run(ai_model, tmp_path)
+    calls = list(ai_model.model_manager.yolo_calls)
+
+    summary = _run(ai_model, tmp_path)
+    assert (summary["cache_hits"], summary["processed"], summary["skipped"]) == (2, 2, 0)
+    assert ai_model.model_manager.yolo_calls == calls
+    redrawn = cv2.imread(str(tmp_path / "output" / "img_0.jpg"))
+    assert redrawn[20, 1].tolist() != [200, 200, 200]                    # The cached box is drawn again
+
+
+def test_undecodable_image_with_a_cached_result_is_skipped(ai_model, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "STORE_ANNOTATED", False)
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "broken.jpg").write_bytes(b"not a jpeg")
+    key = content_key(b"not a jpeg", ai_model.model_manager.fingerprint())
+    ai_model.inference_cache.put(key, "leaf_blight", 0.9, BOXES)
+
+    summary = _run(ai_model, tmp_path)
+    assert (summary["cache_hits"], summary["processed"], summary["skipped"]) == (0, 0, 1)
+    assert _row_count() == 0                                             # No row pointing at a missing file
+    assert not (tmp_path / "output" / "broken.jpg").exists()
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from sqlalchemy import event, func, select
+
+import ingest_server
+from database_setup import Device, KalmanFilterFusionData, Sensor, SensorData, SessionLocal
+from network_utils import dedup
+
+AUTH = "Basic " + base64.b64encode(b"Ventilation_System_ESP:password").decode()
+PAYLOAD = {"DeviceID": 2000, "DeviceName": "Ventilation_System_ESP", "SensorID": [2001, 2002],
+           "temperature": [21.5, 0], "filtered_temperature": [21.4, 0],
+           "humidity": [55.0, 56.0], "filtered_humidity": [54.9, 55.9]}
+
+
+def test_check_credentials():
+    assert ingest_server.check_credentials(AUTH)
+    assert not ingest_server.check_credentials("Basic " + base64.b64encode(b"Ventilation_System_ESP:nope").decode())
+    assert not ingest_server.check_credentials("Bearer abc")
+    assert not ingest_server.check_credentials("Basic !!!")
+    assert not ingest_server.check_credentials(None)
+
+
+@pytest.mark.parametrize("payload, error", [
+    ({}, "Invalid or missing JSON payload"),
+    ({"DeviceID": "2000"}, "DeviceID must be an integer"),
+    ({"DeviceID": 2000, "SensorID": ["2001"]}, "SensorID must be a list of integers"),
+    ({"DeviceID": 2000, "humidity": [True]}, "humidity must be a list of numbers"),
+    (PAYLOAD, None),
+])
+def test_validate_payload(payload, error):
+    assert ingest_server.validate_payload(payload) == error
+
+
+# ──────────────────────────── HTTP server ────────────────────────────
+async def _echo_app(scope, receive, send):
+    body = (await receive())["body"]
+    await ingest_server._send_json(send, 200, {"path": scope["path"], "length": len(body)})
+
+
+async def _exchange(raw_requests):
+    """Send raw request bytes on one connection; returns (responses, closed by server)."""
+    server = await asyncio.start_server(lambda r, w: ingest_server._handle_connection(_echo_app, r, w), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"".join(raw_requests))
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), 5)          # Until the server closes the connection
+        writer.close()
+        await writer.wait_closed()
+    finally:
+        server.close()
+        await server.wait_closed()
+    return [part.split(b" ", 1)[0].decode() for part in data.split(b"HTTP/1.1 ")[1:]], data
+
+
+def _request(body=b"", length=None, connection="keep-alive"):
+    length = len(body) if length is None else length
+    return (f"POST /receive HTTP/1.1\r\nhost: x\r\ncontent-length: {length}\r\n"
+            f"connection: {connection}\r\n\r\n").encode() + body
+
+
+def test_keep_alive_serves_several_requests():
+    statuses, data = asyncio.run(_exchange([_request(b"{}"), _request(b"abc", connection="close")]))
+    assert statuses == ["200", "200"]
+    assert b'"length": 3' in data
+
+
+@pytest.mark.parametrize("length, status", [("abc", "400"), ("-5", "400"), ("1e3", "400"),
+                                            (str(ingest_server.MAX_BODY_BYTES + 1), "413")])
+def test_bad_content_length_is_refused(length, status):
+    raw = f"POST /receive HTTP/1.1\r\ncontent-length: {length}\r\n\r\n".encode()
+    statuses, _ = asyncio.run(_exchange([raw, _request(b"{}")]))
+    assert statuses == [status]                     # And the connection is closed
+
+
+def test_chunked_bodies_are_refused():
+    raw = b"POST /receive HTTP/1.1\r\ntransfer-encoding: chunked\r\n\r\n0\r\n\r\n"
+    assert asyncio.run(_exchange([raw]))[0] == ["411"]
+
+
+# ──────────────────────────── /receive ────────────────────────────
+async def _call(payload, auth=AUTH, method="POST", path="/receive"):
+    body = json.dumps(payload).encode()
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"authorization", auth.encode())] if auth else []
+    await ingest_server.app({"type": "http", "method": method, "path": path, "headers": headers}, receive, send)
+    return messages[0]["status"], json.loads(messages[1]["body"])
+
+
+@pytest.fixture
+def batcher(db, monkeypatch):
+    monkeypatch.setattr(dedup, "_windows", {})
+    monkeypatch.setattr(ingest_server, "control_response", lambda session: ({"status": "success", "action": ""}, False))
+    batcher = ingest_server.IngestBatcher()
+    monkeypatch.setattr(ingest_server, "batcher", batcher)
+    return batcher
+
+
+def _count(db, model):
+    with db.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+def test_receive_stores_concurrent_payloads_in_one_batch(db, batcher, monkeypatch):
+    batches = []
+    write_payloads = ingest_server.write_payloads
+    monkeypatch.setattr(ingest_server, "write_payloads", lambda payloads: batches.append(len(payloads)) or write_payloads(payloads))
+
+    async def run():
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(_call(PAYLOAD) for _ in range(5)))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert all(status == 200 and body["status"] == "success" for status, body in results)
+    assert batches == [5]
+    assert _count(db, SensorData) == 5 * 3           # temperature for 2001, humidity for both
+    assert _count(db, KalmanFilterFusionData) == 5 * 3
+
+
+def test_receive_rejects_and_dedups(db, batcher):
+    async def run():
+        await batcher.start()
+        try:
+            return [
+                await _call(PAYLOAD, auth=None),
+                await _call({"DeviceID": "x"}),
+                await _call(PAYLOAD, method="GET"),
+                await _call(PAYLOAD, path="/other"),
+                await _call({**PAYLOAD, "BootID": "b1", "Seq": 1}),
+                await _call({**PAYLOAD, "BootID": "b1", "Seq": 1}),         # Retry: answered from cache
+            ]
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert [status for status, _ in results] == [401, 400, 405, 404, 200, 200]
+    assert results[4][1] == results[5][1]
+    assert _count(db, SensorData) == 3
+
+
+def test_receive_sheds_load_when_the_queue_is_full(db, batcher, monkeypatch):
+    monkeypatch.setattr(ingest_server, "INGEST_MAX_PENDING", 0)
+
+    async def run():
+        await batcher.start()
+        try:
+            return await _call({**PAYLOAD, "BootID": "b1", "Seq": 1})
+        finally:
+            await batcher.stop()
+
+    status, body = asyncio.run(run())
+    assert status == 503 and body["retry_after"] >= 1
+    assert dedup.check_sequence(2000, "b1", 1) == dedup.ACCEPTED     # Released, so the retry is processed
+
+
+def test_batch_is_one_transaction(db, batcher):
+    commits = []
+    listener = lambda session: commits.append(session)
+    event.listen(SessionLocal, "after_commit", listener)
+    try:
+        payloads = [{**PAYLOAD, "DeviceID": 2000 + i, "SensorID": [3000 + 2 * i, 3001 + 2 * i]} for i in range(10)]
+        ingest_server.write_payloads(payloads)
+        assert len(commits) == 1                        # New devices and sensors are only flushed
+        assert _count(db, SensorData) == 10 * 3
+        ingest_server.write_payloads(payloads)          # Existing sensors: no type rewrites either
+        assert len(commits) == 2
+    finally:
+        event.remove(SessionLocal, "after_commit", listener)
+
+
+def test_failed_batch_leaves_no_rows(db, batcher, monkeypatch):
+    store_sensor_data = ingest_server.store_sensor_data
+    stored = []
+
+    def fail_on_the_third_payload(session, device_id, *args, **kwargs):
+        stored.append(device_id)
+        if len(set(stored)) == 3:
+            raise RuntimeError("disk full")
+        return store_sensor_data(session, device_id, *args, **kwargs)
+
+    monkeypatch.setattr(ingest_server, "store_sensor_data", fail_on_the_third_payload)
+    payloads = [{**PAYLOAD, "DeviceID": 2000 + i, "SensorID": [3000 + 2 * i, 3001 + 2 * i]} for i in range(5)]
+    with pytest.raises(RuntimeError):
+        ingest_server.write_payloads(payloads)
+    for model in (SensorData, KalmanFilterFusionData, Sensor, Device):
+        assert _count(db, model) == 0
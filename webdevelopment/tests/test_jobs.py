@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from network_utils import jobs
+from network_utils.jobs import JobManager, JobQueueFull
+
+
+def _wait(job, *states):
+    deadline = time.monotonic() + 5
+    while job.state not in states:
+        assert time.monotonic() < deadline, f"job stuck in {job.state}"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager():
+    return JobManager(workers=1, max_queued=2, history=3)
+
+
+def _blocking(release):
+    def func(job, value=None):
+        job.progress(1, 4, "started")
+        release.wait(5)
+        return value
+    return func
+
+
+def test_same_key_is_single_flight(manager):
+    release = threading.Event()
+    first, created = manager.submit("cycle", _blocking(release), value="done")
+    again, created_again = manager.submit("cycle", _blocking(release))
+    assert created and not created_again and again is first
+    _wait(first, jobs.RUNNING)
+    assert manager.active("cycle") == [first]
+
+    release.set()
+    _wait(first, jobs.SUCCEEDED)
+    assert first.result == "done" and first.to_dict()["percent"] == 25.0
+    second, created = manager.submit("cycle", _blocking(release))
+    assert created and second is not first              # A finished job no longer blocks its key
+    _wait(second, jobs.SUCCEEDED)
+
+
+def test_full_queue_is_refused(manager):
+    release = threading.Event()
+    running, _ = manager.submit("cycle", _blocking(release))
+    _wait(running, jobs.RUNNING)
+    manager.submit("run", _blocking(release))
+    manager.submit("other", _blocking(release))
+    with pytest.raises(JobQueueFull):
+        manager.submit("one-more", _blocking(release))
+    release.set()
+    for job in manager.jobs():
+        _wait(job, jobs.SUCCEEDED)
+
+
+def test_cancel(manager):
+    release = threading.Event()
+
+    def cancellable(job):
+        while not job.cancel_requested():
+            time.sleep(0.01)
+        return "stopped early"
+
+    running, _ = manager.submit("cycle", cancellable)
+    queued, _ = manager.submit("run", _blocking(release))
+    _wait(running, jobs.RUNNING)
+    assert manager.cancel(queued.id).state == jobs.CANCELLED       # Dropped before it starts
+    manager.cancel(running.id)
+    _wait(running, jobs.CANCELLED)
+    assert running.result == "stopped early" and running.to_dict()["cancel_requested"]
+    assert manager.cancel("unknown") is None
+    time.sleep(0.05)
+    assert queued.started_at is None
+
+
+def test_failure_is_recorded(manager):
+    def broken(job):
+        raise RuntimeError("camera offline")
+
+    job, _ = manager.submit("cycle", broken)
+    _wait(job, jobs.FAILED)
+    assert job.error == "camera offline" and job.to_dict()["run_seconds"] is not None
+
+
+def test_history_is_trimmed(manager):
+    done = []
+    for i in range(6):
+        job, _ = manager.submit(f"job-{i}", lambda job: None)
+        _wait(job, jobs.SUCCEEDED)
+        done.append(job)
+    kept = manager.jobs()
+    assert len(kept) <= 4 and kept[0] is done[-1]
+    assert manager.get(done[0].id) is None
+
+
+def test_status_api(manager, monkeypatch):
+    monkeypatch.setattr(jobs, "job_manager", manager)
+    app = Flask(__name__)
+    app.register_blueprint(jobs.jobs_bp)
+    client = app.test_client()
+    release = threading.Event()
+    job, _ = manager.submit("cycle", _blocking(release))
+    _wait(job, jobs.RUNNING)
+
+    assert [j["id"] for j in client.get("/api/jobs").get_json()] == [job.id]
+    status = client.get(f"/api/jobs/{job.id}").get_json()
+    assert (status["state"], status["done"], status["total"], status["message"]) == ("running", 1, 4, "started")
+    assert client.post(f"/api/jobs/{job.id}/cancel").get_json()["cancel_requested"]
+    assert client.get("/api/jobs/nope").status_code == 404
+    assert client.post("/api/jobs/nope/cancel").status_code == 404
+    release.set()
+    _wait(job, jobs.CANCELLED)
@@ -0,0 +1,59 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from RC_Plant_desiease.model_manager import ModelManager
+
+BRIGHT = np.full((48, 48, 3), 200, dtype=np.uint8)
+
+
+def test_model_loads_on_first_use_with_warm_up(fake_yolo):
+    assert not fake_yolo.loaded and fake_yolo.stats()["load_seconds"] is None
+    assert fake_yolo.names == {0: "healthy", 1: "leaf_blight"}
+    assert fake_yolo.loaded and fake_yolo.yolo_calls == [1]            # The warm-up inference
+    assert fake_yolo.stats()["warmup_seconds"] is not None
+
+
+def test_concurrent_first_use_loads_once(fake_yolo):
+    threads = [threading.Thread(target=fake_yolo.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_yolo.yolo_calls == [1]
+
+
+def test_predict_counts_frames(fake_yolo):
+    fake_yolo.get()
+    results = fake_yolo.predict([BRIGHT, BRIGHT, BRIGHT])
+    assert len(results) == 3 and len(results[0].boxes) == 1
+    fake_yolo.predict(BRIGHT)
+    stats = fake_yolo.stats()
+    assert (stats["inferences"], stats["frames"]) == (2, 4)
+    assert fake_yolo.yolo_calls == [1, 3, 1]
+
+
+def test_load_failure_is_reported_and_retried(fake_yolo, tmp_path):
+    manager = ModelManager(str(tmp_path / "missing.pt"))
+    with pytest.raises(FileNotFoundError):
+        manager.get()
+    assert not manager.loaded and "missing.pt" in manager.stats()["load_error"]
+
+    os.replace(fake_yolo.model_path, manager.model_path)
+    manager.get()
+    assert manager.loaded and manager.load_error is None
+
+
+def test_preload_runs_in_the_background(fake_yolo):
+    fake_yolo.preload().join(timeout=5)
+    assert fake_yolo.loaded
+
+
+def test_fingerprint_follows_the_weights_file(fake_yolo):
+    first = fake_yolo.fingerprint()
+    assert first == fake_yolo.fingerprint()
+    with open(fake_yolo.model_path, "wb") as f:
+        f.write(b"weights v2, retrained")
+    assert fake_yolo.fingerprint() != first
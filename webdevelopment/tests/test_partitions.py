@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from data_utils import partitions
+from data_utils.queries import fetch_buckets, fetch_keys, fetch_series_rows, iter_series_chunks
+
+T0 = datetime(2025, 7, 3, 22, 0, 0)
+DAY_MS = 86400 * 1000
+
+
+def test_keys_and_bounds():
+    assert partitions.partition_key(T0, "day") == "2025-07-03"
+    assert partitions.partition_key(T0, "week") == "2025-W27"
+    assert partitions.partition_bounds("2025-07-03") == (datetime(2025, 7, 3), datetime(2025, 7, 4))
+    assert partitions.partition_bounds("2025-W27") == (datetime(2025, 6, 30), datetime(2025, 7, 7))
+
+
+def test_rows_go_to_their_day_and_read_back_transparently(db, day_partitions):
+    rows = [{"SensorID": key, "Timestamp": T0 + timedelta(hours=h), "Value": float(h)}
+            for h in range(0, 60, 6) for key in (2003, 2001)]
+    partitions.insert_rows("sensor_data", rows)
+
+    assert [key for key, *_ in partitions.list_partitions()] == ["2025-07-03", "2025-07-04", "2025-07-05", "2025-07-06"]
+    with db.connect() as conn:
+        by_key = fetch_series_rows(conn, "raw", epoch=False)
+        assert [row[0] for row in by_key] == [2001] * 10 + [2003] * 10     # Re-grouped across attach batches
+        assert [row[1] for row in by_key[:10]] == [T0 + timedelta(hours=h) for h in range(0, 60, 6)]
+        assert fetch_keys(conn, "raw", start=datetime(2025, 7, 5)) == [2001, 2003]
+        assert len(fetch_series_rows(conn, "raw", start=datetime(2025, 7, 5), end=datetime(2025, 7, 5, 23))) == 8
+        streamed = [row for chunk in iter_series_chunks(conn, "raw", 3, epoch=False) for row in chunk]
+        assert streamed == by_key
+
+
+def test_buckets_straddling_partitions_are_merged(db, day_partitions):
+    partitions.insert_rows("weighted_average_fusion", [
+        {"SensorType": "Temperature", "Timestamp": T0, "FusedValue": 10.0},
+        {"SensorType": "Temperature", "Timestamp": T0 + timedelta(hours=4), "FusedValue": 30.0},
+    ])
+    with db.connect() as conn:
+        buckets = fetch_buckets(conn, "weighted", 2 * DAY_MS)
+    assert buckets["Temperature"]["count"] == [2]
+    assert buckets["Temperature"]["avg"] == [20.0]
+    assert (buckets["Temperature"]["min"], buckets["Temperature"]["max"]) == ([10.0], [30.0])
+
+
+def test_drop_partitions_before_keeps_hot_ones(day_partitions):
+    now = datetime.utcnow()
+    for days_ago in (0, 1, 5, 6):
+        partitions.insert_rows("sensor_data", [{"SensorID": 1, "Timestamp": now - timedelta(days=days_ago), "Value": 1.0}])
+    dropped = partitions.drop_partitions_before(now + timedelta(days=1))
+    assert sorted(dropped) == sorted(partitions.partition_key(now - timedelta(days=d)) for d in (5, 6))
+    assert [key for key, *_ in partitions.list_partitions()] == partitions.hot_keys()
+
+
+def test_orm_reads_see_the_hot_partitions_outside_the_app(db, day_partitions, monkeypatch):
+    import ingest_server
+    from database_setup import SensorData, SessionLocal
+    from network_utils import fusion_utils
+
+    monkeypatch.setattr(fusion_utils, "read_value", lambda kind, key: None)        # Force the SQLite lookup
+    monkeypatch.setattr(ingest_server, "control_response",
+                        lambda session: (fusion_utils.get_fused_values_by_sensors(session, 2001, 2002), False))
+    fused = ingest_server.write_payloads([{"DeviceID": 2000, "DeviceName": "Ventilation_System_ESP",
+                                           "SensorID": [2001, 2002], "humidity": [55.0, 56.0],
+                                           "filtered_humidity": [54.9, 55.9]}])
+
+    assert fused == {2001: 54.9, 2002: 55.9}
+    assert [key for key, *_ in partitions.list_partitions()] == partitions.hot_keys()
+    with SessionLocal() as session:
+        assert session.query(SensorData).count() == 2
+
+
+def test_migration_reads_the_main_tables(db, add_rows, request):
+    add_rows("raw", [(2001, T0, 1.0), (2001, T0 + timedelta(days=1), 2.0)])
+    request.getfixturevalue("day_partitions")          # Switched on after the rows reached greenhouse.db
+    partitions.migrate_existing()
+    assert [key for key, *_ in partitions.list_partitions()][:2] == ["2025-07-03", "2025-07-04"]
+    with db.connect() as conn:
+        assert [row[2] for row in fetch_series_rows(conn, "raw", epoch=False)] == [1.0, 2.0]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from data_utils.queries import (
+    fetch_keys, fetch_latest_timestamp, fetch_series_arrays, fetch_series_rows, iter_series_chunks
+)
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+T0_MS = int((T0 - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def test_fetch_series_rows_orders_and_filters(db, add_rows):
+    add_rows("raw", [(2003, T0, 3.0), (2001, T0 + timedelta(seconds=1), 1.5), (2001, T0, 1.0),
+                     (2001, T0 + timedelta(hours=2), 9.0)])
+    with db.connect() as conn:
+        assert fetch_series_rows(conn, "raw", end=T0 + timedelta(minutes=1), epoch=False) == [
+            (2001, T0, 1.0), (2001, T0 + timedelta(seconds=1), 1.5), (2003, T0, 3.0)
+        ]
+        assert fetch_series_rows(conn, "raw", keys=[2003]) == [(2003, T0_MS, 3.0)]
+        assert [row[0] for row in fetch_series_rows(conn, "raw", order_by="time")] == [2001, 2003, 2001, 2001]
+        assert fetch_keys(conn, "raw", start=T0 + timedelta(hours=1)) == [2001]
+        assert fetch_latest_timestamp(conn, "raw") == T0 + timedelta(hours=2)
+
+
+def test_epoch_ms_keeps_milliseconds(db, add_rows):
+    add_rows("weighted", [("Humidity", T0 + timedelta(milliseconds=1), 50.0),
+                          ("Humidity", T0 + timedelta(microseconds=999000), 51.0)])
+    with db.connect() as conn:
+        assert [row[1] for row in fetch_series_rows(conn, "weighted")] == [T0_MS + 1, T0_MS + 999]
+
+
+def test_fetch_series_arrays_splits_per_key(db, add_rows):
+    add_rows("kalman", [(2001, T0 + timedelta(seconds=i), 20.0 + i) for i in range(3)]
+             + [(2002, T0, 55.5)])
+    with db.connect() as conn:
+        (key_a, ts_a, vals_a), (key_b, ts_b, vals_b) = fetch_series_arrays(conn, "kalman", include_archive=False)
+        wide = fetch_series_arrays(conn, "kalman", keys=[2002], value_dtype=np.float64, include_archive=False)
+    assert (key_a, key_b) == (2001, 2002)
+    assert ts_a.dtype == np.int64 and vals_a.dtype == np.float32
+    assert ts_a.tolist() == [T0_MS, T0_MS + 1000, T0_MS + 2000]
+    assert vals_a.tolist() == [20.0, 21.0, 22.0]
+    assert ts_b.tolist() == [T0_MS] and vals_b.tolist() == [55.5]
+    assert len(wide) == 1 and wide[0][2].dtype == np.float64
+
+
+def test_iter_series_chunks_matches_fetch(db, add_rows):
+    add_rows("raw", [(key, T0 + timedelta(seconds=i), float(i)) for key in (2001, 2002) for i in range(5)])
+    with db.connect() as conn:
+        chunks = list(iter_series_chunks(conn, "raw", 3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+        assert [row for chunk in chunks for row in chunk] == fetch_series_rows(conn, "raw")
+        by_time = [row for chunk in iter_series_chunks(conn, "raw", 4, order_by="time") for row in chunk]
+        assert by_time == fetch_series_rows(conn, "raw", order_by="time")
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from data_utils import archive, retention
+from data_utils.alignment import datetime_to_ms
+from database_setup import SensorData, SensorRollup
+
+NOW = datetime(2025, 7, 31, 12, 0, 0)
+KEEP = timedelta(days=14)
+OLD = datetime(2025, 7, 3, 9, 0, 0)           # Well past the cutoff
+
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    monkeypatch.setattr(retention, "BATCH_PAUSE_SECONDS", 0)
+
+
+@pytest.fixture
+def history(add_rows):
+    # Two sensors, one sample a minute for 20 hours (several 6h windows), plus recent data
+    rows = [(key, OLD + timedelta(minutes=m), float(m % 60)) for key in (2001, 2003) for m in range(20 * 60)]
+    rows += [(2001, NOW - timedelta(hours=1), 42.0)]
+    add_rows("raw", rows)
+    return rows
+
+
+def _counts(db):
+    with db.connect() as conn:
+        raw = conn.execute(select(func.count()).select_from(SensorData.__table__)).scalar()
+        rolled = conn.execute(select(func.sum(SensorRollup.Count))).scalar() or 0
+        buckets = conn.execute(select(func.count()).select_from(SensorRollup.__table__)).scalar()
+    return raw, rolled, buckets
+
+
+def test_apply_policy_rolls_up_what_it_deletes(db, history):
+    stats = retention.apply_policy("raw", KEEP, now=NOW)
+    assert stats["deleted"] == len(history) - 1
+    assert _counts(db) == (1, len(history) - 1, 2 * 20)
+
+    with db.connect() as conn:
+        row = conn.execute(select(SensorRollup).where(SensorRollup.SeriesKey == "2001",
+                                                      SensorRollup.BucketStart == OLD)).one()
+    assert (row.Count, row.SumValue, row.MinValue, row.MaxValue) == (60, sum(range(60)), 0.0, 59.0)
+
+
+def test_apply_policy_is_idempotent(db, history):
+    retention.apply_policy("raw", KEEP, now=NOW)
+    before = _counts(db)
+    stats = retention.apply_policy("raw", KEEP, now=NOW)
+    assert stats["deleted"] == 0 and stats["buckets"] == 0
+    assert _counts(db) == before
+
+
+def test_watermark_prevents_double_counting_after_a_crash(db, history):
+    # A run that rolled up the first window but died before deleting it
+    window_end = OLD + retention.WINDOW
+    with db.begin() as conn:
+        retention.rollup_window(conn, "raw", OLD, window_end)
+    with db.begin() as conn:
+        assert retention.claim_window(conn, "raw", OLD, window_end) is None
+
+    retention.apply_policy("raw", KEEP, now=NOW)
+    assert _counts(db)[:2] == (1, len(history) - 1)
+
+
+def test_expired_rows_are_archived_before_delete(db, history):
+    retention.apply_policy("raw", KEEP, now=NOW)
+    ts, vals = archive.read_range("raw", 2003)
+    assert len(ts) == 20 * 60
+    assert ts[0] == datetime_to_ms(OLD) and vals[:3].tolist() == [0.0, 1.0, 2.0]
+
+
+def test_dry_run_deletes_nothing(db, history):
+    stats = retention.apply_policy("raw", KEEP, now=NOW, dry_run=True)
+    assert stats["deleted"] == len(history) - 1
+    assert _counts(db) == (len(history), 0, 0)
+
+
+def test_scheduler_runs_in_one_process_only(monkeypatch, tmp_path):
+    monkeypatch.setattr(retention, "SCHEDULER_LOCK_PATH", str(tmp_path / "retention.lock"))
+    monkeypatch.setattr(retention, "run_retention", lambda: None)
+    monkeypatch.setattr(retention, "_scheduler_lock_file", None)
+
+    thread = retention.start_retention_scheduler(interval_seconds=3600)
+    assert thread is not None
+    lock_file = retention._scheduler_lock_file
+    assert retention.start_retention_scheduler() is None
+
+    # A fresh open of the lock file is what another process would see
+    monkeypatch.setattr(retention, "_scheduler_lock_file", None)
+    assert retention.start_retention_scheduler() is None
+    lock_file.close()
+
+
+def test_columnar_segments_past_the_raw_policy_are_archived_and_dropped(db, monkeypatch):
+    from data_utils import columnar_store
+
+    monkeypatch.setattr(retention, "SENSOR_STORAGE_BACKEND", "columnar")
+    monkeypatch.setattr(columnar_store, "SEGMENT_ROWS", 60)
+    store = columnar_store.get_store()
+    try:
+        for m in range(120):                                # Two full segments, both expired
+            store.append(2001, OLD + timedelta(minutes=m), float(m))
+        store.append(2001, NOW - timedelta(hours=1), 42.0)
+
+        assert retention.run_retention({"raw": KEEP}, dry_run=True, now=NOW)[0]["deleted"] == 120
+        stats = retention.run_retention({"raw": KEEP}, now=NOW)[0]
+        assert (stats["source"], stats["deleted"]) == ("columnar", 120)
+        assert store.read_range(2001)[1].tolist() == [42.0]
+        archived = [vals for _, vals in archive.iter_range("raw", 2001)]
+        assert sum(len(vals) for vals in archived) == 120
+    finally:
+        store.close()
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from dashboard import dashboard_bp
+from data_utils.queries import fetch_buckets
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+T0_MS = int((T0 - datetime(1970, 1, 1)).total_seconds() * 1000)
+HOUR_MS = 3600 * 1000
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(dashboard_bp)
+    return app.test_client()
+
+
+def test_fetch_buckets_aggregates_in_sql(db, add_rows):
+    add_rows("kalman", [(2001, T0 + timedelta(minutes=10), 10.0), (2001, T0 + timedelta(minutes=50), 20.0),
+                        (2001, T0 + timedelta(minutes=70), 5.0), (2003, T0, 1.0)])
+    with db.connect() as conn:
+        buckets = fetch_buckets(conn, "kalman", HOUR_MS)
+        only = fetch_buckets(conn, "kalman", HOUR_MS, keys=[2003])
+    assert buckets[2001] == {
+        "timestamps": [T0_MS, T0_MS + HOUR_MS],
+        "avg": [15.0, 5.0], "min": [10.0, 5.0], "max": [20.0, 5.0], "count": [2, 1],
+    }
+    assert list(only) == [2003]
+
+
+def test_series_endpoint(add_rows, client):
+    add_rows("weighted", [("Temperature", T0 + timedelta(minutes=m), float(m)) for m in (0, 15, 30, 45)])
+    body = client.get("/api/series?source=weighted&start=2025-07-03T10:00&end=2025-07-03T11:00&bucket=30m").get_json()
+    assert body["bucket_seconds"] == 1800
+    (series,) = body["series"]
+    assert series["sensor_type"] == "Temperature"
+    assert series["avg"] == [7.5, 37.5] and series["count"] == [2, 2]
+
+
+@pytest.mark.parametrize("query", [
+    "source=nope",
+    "bucket=0s",
+    "bucket=1s&start=2025-01-01T00:00&end=2025-07-01T00:00",     # Too many buckets
+    "source=raw&sensor=abc",
+])
+def test_series_endpoint_rejects_bad_arguments(db, client, query):
+    assert client.get(f"/api/series?{query}").status_code == 400
+
+
+def test_default_window_is_shortened_for_small_buckets(db, client):
+    body = client.get("/api/series?source=raw&bucket=1m&end=2025-07-10T00:00").get_json()
+    assert body["start"] == (datetime(2025, 7, 10) - timedelta(minutes=10000)).isoformat()
+    body = client.get("/api/series?source=raw&end=2025-07-10T00:00").get_json()
+    assert body["start"] == "2025-07-03T00:00:00"                   # 1h buckets keep the 7-day default
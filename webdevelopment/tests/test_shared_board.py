@@ -0,0 +1,111 @@
+import multiprocessing
+import uuid
+from datetime import datetime
+
+import pytest
+
+from database_setup import SessionLocal
+from network_utils import shared_board
+from network_utils.shared_board import KIND_ACTUATOR, KIND_FUSED, KIND_RAW, SharedBoard, publish_after_commit
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+
+
+@pytest.fixture
+def board_name(monkeypatch, tmp_path):
+    # Own segment and lock files, so a running app's board is never touched
+    monkeypatch.setattr(shared_board, "LOCK_PATH", str(tmp_path / "board.lock"))
+    monkeypatch.setattr(shared_board, "ATTACH_PATH", str(tmp_path / "board.attached"))
+    name = f"greenhouse_test_{uuid.uuid4().hex[:12]}"
+    yield name
+    try:
+        from multiprocessing import shared_memory
+        leftover = shared_memory.SharedMemory(name=name)
+        leftover.close()
+        leftover.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _close(board):
+    board.slots = None
+    board.shm.close()
+    board._attach_file.close()          # Releases this process's shared attach lock
+    board._lock_file.close()
+
+
+def test_publish_and_read(board_name):
+    board = SharedBoard(board_name, slots=16)
+    try:
+        assert board.publish(KIND_RAW, 2001, 21.5, T0)
+        assert board.publish(KIND_FUSED, 2001, 21.0, T0)
+        assert board.publish(KIND_ACTUATOR, 7, timestamp=T0, text="on")
+        assert not board.publish(KIND_RAW, 2001, 99.0, datetime(2025, 7, 3, 9, 0))     # Older: ignored
+
+        assert board.read(KIND_RAW, 2001)["value"] == 21.5
+        assert board.read(KIND_FUSED, 2001)["value"] == 21.0
+        assert board.read(KIND_ACTUATOR, 7) == {"value": None, "ts_ms": board.read(KIND_RAW, 2001)["ts_ms"], "text": "on"}
+        assert board.read(KIND_RAW, 2002) is None
+        snapshot = board.snapshot()
+        assert set(snapshot["raw"]) == {"2001"} and snapshot["actuators"]["7"]["text"] == "on"
+    finally:
+        _close(board)
+
+
+def test_full_board_drops_new_keys(board_name):
+    board = SharedBoard(board_name, slots=2)
+    try:
+        assert board.publish(KIND_RAW, 1, 1.0, T0) and board.publish(KIND_RAW, 2, 2.0, T0)
+        assert not board.publish(KIND_RAW, 3, 3.0, T0)
+        assert board.publish(KIND_RAW, 1, 1.5, T0)          # Existing keys still update
+    finally:
+        _close(board)
+
+
+def _read_in_child(name, results):
+    board = SharedBoard(name, slots=16)
+    results.put(board.read(KIND_RAW, 2001)["value"])
+    board.publish(KIND_RAW, 2002, 55.0, T0)
+    _close(board)
+
+
+def test_values_are_shared_between_processes(board_name):
+    board = SharedBoard(board_name, slots=16)
+    try:
+        board.publish(KIND_RAW, 2001, 21.5, T0)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        child = context.Process(target=_read_in_child, args=(board_name, results))
+        child.start()
+        assert results.get(timeout=10) == 21.5
+        child.join(timeout=10)
+        assert child.exitcode == 0
+        assert board.read(KIND_RAW, 2002)["value"] == 55.0      # The child's write, still there after it exited
+    finally:
+        _close(board)
+
+
+def test_restart_clears_stale_values(board_name):
+    board = SharedBoard(board_name, slots=16)
+    board.publish(KIND_RAW, 2001, 21.5, T0)
+    _close(board)                                   # Every user gone, segment left behind
+
+    restarted = SharedBoard(board_name, slots=16)
+    try:
+        assert restarted.read(KIND_RAW, 2001) is None
+    finally:
+        _close(restarted)
+
+
+def test_publish_after_commit_only(db):
+    published = []
+    with SessionLocal() as session:
+        publish_after_commit(session, lambda *args: published.append(args), 2001, 21.5)
+        assert published == []
+        session.commit()
+        assert published == [(2001, 21.5)]
+
+        publish_after_commit(session, lambda *args: published.append(args), 2001, 99.0)
+        session.rollback()
+        session.commit()
+    assert published == [(2001, 21.5)]
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from data_utils import snapshot
+from data_utils.queries import fetch_series_rows
+
+T0 = datetime(2025, 7, 3, 10, 0, 0)
+DB_TEST_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databaseTests", "dbTest.py")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "snapshots" / "snap.db")
+
+
+def test_snapshot_is_a_point_in_time_copy(db, add_rows, path):
+    add_rows("raw", [(2001, T0, 1.0)])
+    with snapshot.snapshot_connect(max_age=60, path=path) as conn:
+        assert len(fetch_series_rows(conn, "raw")) == 1
+
+    add_rows("raw", [(2001, T0, 2.0)])
+    with snapshot.snapshot_connect(max_age=60, path=path) as conn:     # Still fresh: not retaken
+        assert len(fetch_series_rows(conn, "raw")) == 1
+    with snapshot.snapshot_connect(max_age=0, path=path) as conn:
+        assert len(fetch_series_rows(conn, "raw")) == 2
+
+
+def test_snapshot_skips_uncommitted_writes_without_waiting(db, add_rows, path):
+    add_rows("raw", [(2001, T0, 1.0)])
+    with db.connect() as writer:
+        writer.execute(text("INSERT INTO sensor_data (SensorID, Timestamp, Value) VALUES (2001, '2025-07-03 10:00:01', 2.0)"))
+        snapshot.take_snapshot(path)        # The write transaction is still open
+        writer.rollback()
+    with snapshot.snapshot_engine(path).connect() as conn:
+        assert len(fetch_series_rows(conn, "raw")) == 1
+
+
+def test_snapshot_is_read_only(db, path):
+    snapshot.take_snapshot(path)
+    conn = sqlite3.connect(snapshot.snapshot_uri(path), uri=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM sensor_data")
+    finally:
+        conn.close()
+    assert snapshot.snapshot_age(path) < 60
+    assert snapshot.snapshot_age(path + ".missing") is None
+
+
+def test_db_test_script_runs_directly(db, tmp_path):
+    # As a plain script, not on sys.path; it snapshots the test database in the current directory
+    result = subprocess.run([sys.executable, DB_TEST_SCRIPT], cwd=os.getcwd(), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "Structure of 'sensor_data' table" in result.stdout
+
+
+def test_scheduler_runs_in_one_process_only(monkeypatch, tmp_path, path):
+    monkeypatch.setattr(snapshot, "SCHEDULER_LOCK_PATH", str(tmp_path / "snapshot.lock"))
+    monkeypatch.setattr(snapshot, "take_snapshot", lambda path: None)
+    monkeypatch.setattr(snapshot, "_scheduler_lock_file", None)
+
+    assert snapshot.start_snapshot_scheduler(interval_seconds=3600, path=path) is not None
+    lock_file = snapshot._scheduler_lock_file
+    assert snapshot.start_snapshot_scheduler(path=path) is None
+
+    monkeypatch.setattr(snapshot, "_scheduler_lock_file", None)     # As another worker would open it
+    assert snapshot.start_snapshot_scheduler(path=path) is None
+    lock_file.close()
+
+
+def test_partitions_are_backed_up_when_changed(db, day_partitions, path):
+    from data_utils import partitions
+
+    def copied_rows(key):
+        copy = os.path.join(snapshot.partition_snapshot_dir(path), f"greenhouse_{key}.db")
+        with sqlite3.connect(copy) as conn:
+            return conn.execute("SELECT COUNT(*) FROM sensor_data").fetchone()[0]
+
+    partitions.insert_rows("sensor_data", [{"SensorID": 2001, "Timestamp": T0, "Value": 1.0},
+                                           {"SensorID": 2001, "Timestamp": datetime(2025, 7, 4), "Value": 2.0}])
+    snapshot.take_snapshot(path)
+    assert (copied_rows("2025-07-03"), copied_rows("2025-07-04")) == (1, 1)
+    assert snapshot.snapshot_partitions(path) == 0                      # Nothing changed since
+
+    time.sleep(0.02)                                                    # Past a coarse mtime tick
+    partitions.insert_rows("sensor_data", [{"SensorID": 2001, "Timestamp": datetime(2025, 7, 4, 1), "Value": 3.0}])
+    partitions.drop_partition("2025-07-03")
+    assert snapshot.snapshot_partitions(path) == 1
+    assert copied_rows("2025-07-04") == 2
+    assert sorted(os.listdir(snapshot.partition_snapshot_dir(path))) == ["greenhouse_2025-07-04.db"]
@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from RC_Plant_desiease import stream_reader
+from RC_Plant_desiease.stream_reader import StreamReader, serve_test_stream
+
+
+def _jpeg(level):
+    ok, buffer = cv2.imencode(".jpg", np.full((24, 32, 3), level, dtype=np.uint8))
+    assert ok
+    return buffer.tobytes()
+
+
+def _published(chunks):
+    reader = StreamReader("http://camera/video_feed")
+    frames = []
+    reader._publish = frames.append
+    reader._consume(chunks)
+    return frames
+
+
+def _split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_frames_are_cut_at_markers():
+    first, second = _jpeg(50), _jpeg(200)
+    part = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+    stream = part + first + b"\r\n" + part + second + b"\r\n"
+    assert _published([stream]) == [first, second]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+def test_markers_split_across_chunks(size):
+    first, second = _jpeg(50), _jpeg(200)
+    stream = b"\xff" + b"garbage\xff" + first + b"\r\n\xff\r\n" + second + b"\xff"
+    assert _published(_split(stream, size)) == [first, second]
+
+
+def test_garbage_without_a_frame_is_dropped():
+    assert _published(_split(b"\x00\xff" * 5000 + b"no markers here", 100)) == []
+
+
+def test_runaway_buffer_is_dropped(monkeypatch):
+    monkeypatch.setattr(stream_reader, "MAX_BUFFER_BYTES", 1000)
+    good = _jpeg(120)
+    runaway = stream_reader.SOI + b"\x00" * 5000            # Start of an image that never ends
+    assert _published(_split(runaway + good, 256)) == [good]
+
+
+def test_read_waits_for_a_fresh_frame():
+    reader = StreamReader("http://camera/video_feed")
+    assert reader.read(timeout=0.05) is None
+
+    reader._publish(_jpeg(50))
+    requested = time.time()
+    assert reader.read(fresh_after=requested, timeout=0.05) is None    # Only a frame from before
+    threading.Timer(0.05, reader._publish, args=(_jpeg(200),)).start()
+    frame, jpeg = reader.read_with_jpeg(fresh_after=requested, timeout=2)
+    assert jpeg == _jpeg(200) and frame.mean() > 150
+    assert reader.stats()["frames"] == 2
+
+
+def test_decode_is_cached_per_frame(monkeypatch):
+    reader = StreamReader("http://camera/video_feed")
+    reader._publish(_jpeg(80))
+    decodes = []
+    imdecode = cv2.imdecode
+
+    def counting_imdecode(*args):
+        decodes.append(1)
+        return imdecode(*args)
+
+    monkeypatch.setattr(stream_reader.cv2, "imdecode", counting_imdecode)
+    first = reader.read()
+    first[:] = 0                                            # Callers get copies, not the cache
+    assert reader.read().mean() > 50 and len(decodes) == 1
+
+    reader._publish(_jpeg(160))
+    assert reader.read().mean() > 120 and len(decodes) == 2
+
+
+def test_undecodable_frame():
+    reader = StreamReader("http://camera/video_feed")
+    reader._publish(stream_reader.SOI + b"\x00" * 10 + stream_reader.EOI)
+    assert reader.read_with_jpeg(timeout=0.05) == (None, None)
+
+
+def test_reads_a_served_stream(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(_jpeg(40))
+    (tmp_path / "b.jpg").write_bytes(_jpeg(220))
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    threading.Thread(target=serve_test_stream, args=(str(tmp_path),),
+                     kwargs={"port": port, "fps": 50}, daemon=True).start()
+
+    reader = StreamReader(f"http://127.0.0.1:{port}/video_feed").start()
+    try:
+        frame = reader.read(fresh_after=time.time(), timeout=10)
+        assert frame is not None and frame.shape == (24, 32, 3)
+        assert reader.stats()["connected"]
+    finally:
+        reader.stop()
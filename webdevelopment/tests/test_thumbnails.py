@@ -0,0 +1,116 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+from RC_Plant_desiease import thumbnails
+from RC_Plant_desiease.thumbnails import ThumbnailWorker, content_hash, make_thumbnail, prune_cache
+
+
+def _image(path, level=120, size=(900, 1200)):
+    frame = np.full((*size, 3), level, dtype=np.uint8)
+    cv2.imwrite(str(path), frame)
+    return path
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    (static / "predictions").mkdir(parents=True)
+    monkeypatch.setattr(thumbnails, "STATIC_DIR", str(static))
+    monkeypatch.setattr(thumbnails, "THUMB_CACHE_DIR", str(tmp_path / "thumb_cache"))
+    monkeypatch.setattr(thumbnails, "worker", ThumbnailWorker())
+    return static
+
+
+@pytest.fixture
+def client(static_dir):
+    app = Flask(__name__)
+    app.register_blueprint(thumbnails.thumbnails_bp)
+    return app.test_client()
+
+
+def test_thumbnail_is_small_and_keyed_by_content(static_dir):
+    source = _image(static_dir / "predictions" / "a.jpg")
+    target = make_thumbnail(str(source), "jpg")
+    assert max(cv2.imread(target).shape[:2]) == thumbnails.THUMB_MAX_SIZE
+    assert os.path.basename(target).startswith(content_hash(str(source)))
+    assert make_thumbnail(str(source), "jpg") == target                 # Cached
+
+    _image(source, level=30)
+    os.utime(source, ns=(1, 1))                                         # New content, new mtime
+    assert make_thumbnail(str(source), "jpg") != target
+
+
+def test_undecodable_source(static_dir):
+    (static_dir / "predictions" / "bad.jpg").write_bytes(b"not an image")
+    with pytest.raises(ValueError):
+        make_thumbnail(str(static_dir / "predictions" / "bad.jpg"), "jpg")
+
+
+def test_worker_makes_each_thumbnail_once(static_dir):
+    source = str(_image(static_dir / "predictions" / "a.jpg"))
+    worker = thumbnails.worker
+    events = [worker.submit(source, "jpg") for _ in range(3)]
+    assert all(event.wait(5) for event in events)
+    assert worker.failed == 0
+    target = thumbnails.thumb_path(content_hash(source), "jpg")
+    assert os.listdir(thumbnails.THUMB_CACHE_DIR) == [os.path.basename(target)]
+
+
+def test_prune_keeps_the_newest(static_dir):
+    cache = static_dir.parent / "thumb_cache"
+    cache.mkdir()
+    for i in range(5):
+        (cache / f"{i}.jpg").write_bytes(b"x")
+        os.utime(cache / f"{i}.jpg", (1000 + i, 1000 + i))
+    assert prune_cache(max_files=3) == 2
+    assert sorted(p.name for p in cache.iterdir()) == ["2.jpg", "3.jpg", "4.jpg"]
+
+
+def test_versioned_url_is_cached_for_a_year_and_revalidates(client, static_dir):
+    source = str(_image(static_dir / "predictions" / "a.jpg"))
+    version = content_hash(source)[:16]
+    thumbnails.worker.submit(source, "jpg").wait(5)
+
+    response = client.get(f"/thumbs/predictions/a.jpg?v={version}", headers={"Accept": "image/jpeg"})
+    assert response.status_code == 200 and response.mimetype == "image/jpeg"
+    assert response.headers["Cache-Control"] == thumbnails.LONG_CACHE
+    assert response.headers["Vary"] == "Accept"
+    etag = response.headers["ETag"].strip('"')
+    assert etag == f"{version}-{thumbnails.THUMB_MAX_SIZE}-jpg"
+
+    response = client.get("/thumbs/predictions/a.jpg", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304 and not response.data
+    assert response.headers["Cache-Control"] == "no-cache"              # Unversioned URL must revalidate
+
+
+def test_url_carries_the_content_version(client, static_dir):
+    source = str(_image(static_dir / "predictions" / "a.jpg"))
+    with client.application.test_request_context():
+        assert thumbnails.thumbnail_url("predictions/a.jpg") == \
+            f"/thumbs/predictions/a.jpg?v={content_hash(source)[:16]}"
+        assert thumbnails.thumbnail_url("predictions/gone.jpg") == "/thumbs/predictions/gone.jpg"
+
+
+def test_webp_for_browsers_that_accept_it(client, static_dir):
+    if not thumbnails.WEBP_SUPPORTED:
+        pytest.skip("OpenCV built without WebP")
+    _image(static_dir / "predictions" / "a.jpg")
+    response = client.get("/thumbs/predictions/a.jpg", headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200 and response.mimetype == "image/webp"
+
+
+def test_missing_and_unsafe_paths(client, static_dir):
+    assert client.get("/thumbs/predictions/missing.jpg").status_code == 404
+    assert client.get("/thumbs/../secret.jpg").status_code == 404
+
+
+def test_undecodable_image_falls_back_to_the_original(client, static_dir, monkeypatch):
+    monkeypatch.setattr(thumbnails, "MISS_WAIT_SECONDS", 2)
+    (static_dir / "predictions" / "bad.jpg").write_bytes(b"not an image")
+    response = client.get("/thumbs/predictions/bad.jpg")
+    assert response.status_code == 200 and response.data == b"not an image"
+    assert response.headers["Cache-Control"] == "no-store"
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from database_setup import KalmanFilterFusionData, WeightedAverageFusionData, SessionLocal
+from database_setup import KalmanFilterFusionData, SessionLocal
+from data_utils.db_writer import add_series_row
+from network_utils.shared_board import publish_weighted_value
 
 
 def weighted_average_fusion(values, weights):
@@ -59,13 +61,15 @@ def process_weighted_fusion(sensor_ids, weights, sensor_type, fusion_window_seco
         normalized_weights = [w / total_weight for w in available_weights]
 
         fused_value = weighted_average_fusion(available_values, normalized_weights)
+        fused_at = datetime.utcnow()
 
-        session.add(WeightedAverageFusionData(
-            SensorType=sensor_type,
-            Timestamp=datetime.utcnow(),
-            FusedValue=fused_value
-        ))
+        add_series_row(session, "weighted_average_fusion", {
+            "SensorType": sensor_type,
+            "Timestamp": fused_at,
+            "FusedValue": fused_value
+        })
         session.commit()
+        publish_weighted_value(sensor_type, fused_value, fused_at)
         print(f"[{sensor_type.upper()}] Fused value: {fused_value:.2f} from {len(available_values)} sensors.")
     except Exception as e:
         session.rollback()